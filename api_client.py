@@ -1,22 +1,85 @@
+import logging
 import requests
 import time
 from config import RIOT_API_KEY
 from riotwatcher import LolWatcher, ApiError
+from rate_limiter import RiotRateLimiter
+from http_transport import PooledTransport, endpoint_template
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
 
 class RiotAPIClient:
-    def __init__(self, api_key, region='NA1'):
+    def __init__(self, api_key, region='NA1', rate_limiter=None, max_retries=3, cache=None, transport=None,
+                 metrics=REGISTRY):
+        """
+        :param api_key: The Riot API key.
+        :param region: The platform routing value (e.g. 'NA1').
+        :param rate_limiter: A RiotRateLimiter to share with other clients using the same key.
+        :param max_retries: How many times a request answered with 429 is retried.
+        :param cache: An optional ResponseCache that responses are read from and stored in.
+        :param transport: A PooledTransport to share connections with other clients.
+        :param metrics: MetricsRegistry that cache lookups and failed requests are counted in, by
+                        endpoint. Response latencies and statuses are recorded by the transport.
+        """
         self.api_key = api_key
         self.region = region
         self.base_url = f'https://{self.region}.api.riotgames.com/lol/'  # Base URL
-        self.lol_watcher = LolWatcher(self.api_key)
+        self.rate_limiter = rate_limiter or RiotRateLimiter()
+        self.max_retries = max_retries
+        self.cache = cache
+        self.transport = transport or PooledTransport()
+        self.metrics = metrics
+        self.lol_watcher = LolWatcher(self.api_key, timeout=self.transport.timeout, rate_limiter=self.rate_limiter)
+        self.transport.attach(self.lol_watcher)
 
     def _request(self, endpoint, params={}):
+        endpoint = endpoint.lstrip('/')
+        return self._cached(endpoint, params, lambda: self._fetch(endpoint, params))
+
+    def _fetch(self, endpoint, params):
         headers = {'X-Riot-Token': self.api_key}
-        full_url = self.base_url + endpoint.lstrip('/')
-        response = requests.get(full_url, headers=headers, params=params)
+        full_url = self.base_url + endpoint
+        method = '/'.join(endpoint.split('/')[:3])
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(self.region, method)
+            response = self.transport.get(full_url, headers=headers, params=params)
+            self.rate_limiter.update(self.region, method, response.status_code, response.headers)
+            if response.status_code != 429 or attempt == self.max_retries:
+                break
         response.raise_for_status()
         return response.json()
 
+    def _cached(self, endpoint, params, fetch):
+        """Return the cached response for endpoint/params, calling fetch() and storing its result on a miss."""
+        if self.cache is None:
+            return fetch()
+        result = self.cache.get(self.region, endpoint, params)
+        self._count('riot_cache_lookups_total', endpoint, result='miss' if result is None else 'hit')
+        if result is None:
+            result = fetch()
+            if result is not None:
+                self.cache.set(self.region, endpoint, params, result)
+        return result
+
+    def _call_watcher(self, func, *args, **kwargs):
+        """Call a LolWatcher method, retrying once the rate limiter allows it if the API answers 429."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return func(*args, **kwargs)
+            except ApiError as err:
+                if err.response is None or err.response.status_code != 429 or attempt == self.max_retries:
+                    raise
+
+    def _count(self, name, endpoint, **labels):
+        if self.metrics is not None:
+            self.metrics.counter(name, endpoint=endpoint_template(endpoint), **labels).inc()
+
+    def _error(self, endpoint, message, *args):
+        """Log a failed request and count it in riot_client_errors_total."""
+        self._count('riot_client_errors_total', endpoint)
+        logger.warning(message, *args)
+
     def get_league_entries(self, queue, tier, division, page=1):
         endpoint = f'league/v4/entries/{queue}/{tier}/{division}'
         params = {'page': page}
@@ -27,23 +90,6 @@ class RiotAPIClient:
         endpoint = f'champion-mastery/v4/champion-masteries/by-summoner/{summoner_id}'
         return self._request(endpoint)
     
-    def filter_matches_by_division(self, tier='DIAMOND', division='I'):
-        """Filter collected match data to include only matches played by summoners in the specified division."""
-        if self.match_data.empty:
-            print("No match data available to filter.")
-            return
-
-        # Fetch league data for summoners in the specified division
-        summoners_in_division = set()
-        league_entries = self.api_client.get_league_entries(tier=tier, division=division)
-        for entry in league_entries:
-            summoner_id = entry['summonerId']
-            summoners_in_division.add(summoner_id)
-
-        # Filter matches
-        self.match_data = self.match_data[self.match_data['summonerId'].isin(summoners_in_division)]
-        print(f"Filtered matches to include only those played by summoners in {tier} {division}.")
-    
     def get_match_ids_for_puuids(self, puuids, num_matches_per_puuid=20):
         """
         Fetch match IDs for a list of PUUIDs.
@@ -56,13 +102,15 @@ class RiotAPIClient:
         for puuid in puuids:
             try:
                 # Fetch match IDs for the PUUID
-                match_ids = self.lol_watcher.match.matchlist_by_puuid(self.region, puuid, count=num_matches_per_puuid)
+                match_ids = self._cached(
+                    f'match/v5/matches/by-puuid/{puuid}/ids', {'count': num_matches_per_puuid},
+                    lambda: self._call_watcher(self.lol_watcher.match.matchlist_by_puuid, self.region, puuid, count=num_matches_per_puuid))
                 match_ids_per_puuid[puuid] = match_ids
-                print(f"Match IDs fetched for PUUID {puuid}: {len(match_ids)} matches.")
+                logger.debug("Match IDs fetched for PUUID %s: %d matches.", puuid, len(match_ids))
             except ApiError as err:
-                print(f"An error occurred while fetching match IDs for PUUID: {puuid}: {err}")
+                self._error('match/v5/matches/by-puuid/{}/ids', "An error occurred while fetching match IDs for PUUID %s: %s", puuid, err)
             except Exception as e:
-                print(f"An unexpected error occurred: {e}")
+                self._error('match/v5/matches/by-puuid/{}/ids', "An unexpected error occurred: %s", e)
 
         return match_ids_per_puuid
     
@@ -77,10 +125,10 @@ class RiotAPIClient:
             champion_stats = self._request('endpoint/for/champion/statistics')
             return champion_stats
         except ApiError as err:
-            print(f"An error occurred while fetching champion statistics: {err}")
+            self._error('endpoint/for/champion/statistics', "An error occurred while fetching champion statistics: %s", err)
             return None
         except Exception as e:
-            print(f"An unexpected error occurred: {e}")
+            self._error('endpoint/for/champion/statistics', "An unexpected error occurred: %s", e)
             return None
         
     def get_matches_from_division(self, puuids, num_matches_per_summoner):
@@ -122,52 +170,69 @@ class RiotAPIClient:
         params = {'page': page}
         try:
             top_players = self.lol_watcher.league.entries(region, queue, tier, division, page)
-            print(f"Retrieved {len(top_players)} top players from {region}.")
+            logger.debug("Retrieved %d top players from %s.", len(top_players), region)
             return top_players
         except ApiError as err:
-            print(f"An error occurred while fetching top players: {err}")
+            self._error(endpoint, "An error occurred while fetching top players: %s", err)
             return None
         
     
     def get_summoner_puuid(self, summoner_name):
         try:
-            summoner_details = self.lol_watcher.summoner.by_name(self.region, summoner_name)
+            summoner_details = self._cached(
+                f'summoner/v4/summoners/by-name/{summoner_name}', {},
+                lambda: self._call_watcher(self.lol_watcher.summoner.by_name, self.region, summoner_name))
             puuid = summoner_details.get('puuid')
             if puuid:
-                print(f"Extracted PUUID: {puuid}")  # Log the extracted PUUID
+                logger.debug("Extracted PUUID: %s", puuid)
                 return puuid
             else:
-                print(f"PUUID not found for summoner: {summoner_name}")
+                logger.info("PUUID not found for summoner: %s", summoner_name)
                 return None
         except ApiError as err:
             if err.response.status_code == 404:
-                print(f"Summoner '{summoner_name}' not found.")
+                logger.info("Summoner '%s' not found.", summoner_name)
             else:
-                print(f"An error occurred: {err}")
+                self._error('summoner/v4/summoners/by-name/{}', "An error occurred: %s", err)
+
+    def get_summoner_puuid_by_id(self, summoner_id):
+        """Look up the PUUID of an encrypted summoner ID, or return None if it cannot be found."""
+        try:
+            summoner_details = self._cached(
+                f'summoner/v4/summoners/{summoner_id}', {},
+                lambda: self._call_watcher(self.lol_watcher.summoner.by_id, self.region, summoner_id))
+            return summoner_details.get('puuid')
+        except ApiError as err:
+            self._error('summoner/v4/summoners/{}', "An error occurred while fetching summoner %s: %s", summoner_id, err)
+            return None
 
     def get_match_details(self, match_id):
         """Fetch detailed information for a match by its ID."""
         try:
-            match_details = self.lol_watcher.match.by_id(self.region, match_id)
+            match_details = self._cached(
+                f'match/v5/matches/{match_id}', {},
+                lambda: self._call_watcher(self.lol_watcher.match.by_id, self.region, match_id))
             return match_details
         except ApiError as err:
-            print(f"An error occurred while fetching details for match ID {match_id}: {err}")
+            self._error('match/v5/matches/{}', "An error occurred while fetching details for match ID %s: %s", match_id, err)
             return None
         except Exception as e:
-            print(f"An unexpected error occurred: {e}")
+            self._error('match/v5/matches/{}', "An unexpected error occurred: %s", e)
             return None
         
     def get_match_ids(self, puuid, num_matches=10):
         try:
             # Fetch match IDs using the PUUID
-            match_ids = self.lol_watcher.match.matchlist_by_puuid(self.region, puuid, count=num_matches)
+            match_ids = self._cached(
+                f'match/v5/matches/by-puuid/{puuid}/ids', {'count': num_matches},
+                lambda: self._call_watcher(self.lol_watcher.match.matchlist_by_puuid, self.region, puuid, count=num_matches))
             return match_ids
         except ApiError as err:
             # Handle specific API errors (e.g., rate limits, summoner not found, etc.)
-            print(f"An error occurred while fetching match IDs for PUUID: {puuid}: {err}")
+            self._error('match/v5/matches/by-puuid/{}/ids', "An error occurred while fetching match IDs for PUUID %s: %s", puuid, err)
             return []
         except Exception as e:
             # Handle other potential errors (e.g., network issues)
-            print(f"An unexpected error occurred: {e}")
+            self._error('match/v5/matches/by-puuid/{}/ids', "An unexpected error occurred: %s", e)
             return []
 
@@ -0,0 +1,84 @@
+import sqlite3
+import numpy as np
+import pandas as pd
+from match_columns import MatchColumns
+from match_store import MATCH_COLUMNS, ROLES
+
+NUM_CHAMPIONS = 166  # Rows in the Champion table
+
+
+def match_matrix(matches):
+    """
+    Return matches as an N x 11 integer array in minified.csv's column order.
+
+    :param matches: A DataFrame with minified.csv's columns, a MatchColumns, or an array.
+    """
+    if isinstance(matches, pd.DataFrame):
+        return matches[MATCH_COLUMNS].to_numpy()
+    if isinstance(matches, MatchColumns):
+        return np.column_stack([matches['team1_win'], matches['champions']])
+    return np.asarray(matches)
+
+
+def load_match_matrix(db_path='league.db'):
+    """Read the Match table into an N x 11 int16 array."""
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(f"SELECT {', '.join(MATCH_COLUMNS)} FROM Match").fetchall()
+    conn.close()
+    return np.array(rows, dtype=np.int16).reshape(-1, len(MATCH_COLUMNS))
+
+
+class ChampionWinRates:
+    def __init__(self, num_champions=NUM_CHAMPIONS):
+        """Running wins and games per champion and per champion per role."""
+        self.num_champions = num_champions
+        self.wins = np.zeros((len(ROLES), num_champions), dtype=np.int64)
+        self.games = np.zeros((len(ROLES), num_champions), dtype=np.int64)
+
+    @classmethod
+    def from_db(cls, db_path='league.db'):
+        stats = cls()
+        stats.update(load_match_matrix(db_path))
+        return stats
+
+    def _grow(self, num_champions):
+        pad = ((0, 0), (0, num_champions - self.num_champions))
+        self.wins = np.pad(self.wins, pad)
+        self.games = np.pad(self.games, pad)
+        self.num_champions = num_champions
+
+    def update(self, matches):
+        """
+        Add a batch of matches to the totals.
+
+        :param matches: Anything accepted by match_matrix.
+        """
+        matrix = match_matrix(matches)
+        if len(matrix) == 0:
+            return
+        champions = matrix[:, 1:].astype(np.intp)
+        team1_win = matrix[:, 0].astype(np.int64)
+        if champions.max() >= self.num_champions:
+            self._grow(int(champions.max()) + 1)
+        for role in range(len(ROLES)):
+            team1, team2 = champions[:, role], champions[:, role + len(ROLES)]
+            self.games[role] += np.bincount(team1, minlength=self.num_champions)
+            self.games[role] += np.bincount(team2, minlength=self.num_champions)
+            self.wins[role] += np.bincount(team1, weights=team1_win, minlength=self.num_champions).astype(np.int64)
+            self.wins[role] += np.bincount(team2, weights=1 - team1_win, minlength=self.num_champions).astype(np.int64)
+
+    def to_dataframe(self, by_role=False):
+        """
+        Return wins, losses and win rate per champion.
+
+        :param by_role: Index by (champion_id, role) instead of champion_id.
+        """
+        if by_role:
+            wins, games = self.wins.T.ravel(), self.games.T.ravel()
+            index = pd.MultiIndex.from_product([range(self.num_champions), ROLES], names=['champion_id', 'role'])
+        else:
+            wins, games = self.wins.sum(axis=0), self.games.sum(axis=0)
+            index = pd.RangeIndex(self.num_champions, name='champion_id')
+        frame = pd.DataFrame({'wins': wins, 'losses': games - wins}, index=index)
+        frame['winrate'] = np.divide(wins, games, out=np.full(len(games), np.nan), where=games > 0)
+        return frame[games > 0]
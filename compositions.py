@@ -0,0 +1,95 @@
+from itertools import combinations
+import numpy as np
+import pandas as pd
+from champion_stats import load_match_matrix, match_matrix
+from match_store import ROLES
+
+# Bits per Champion ID in a packed key; five IDs below 4096 fit in one uint64
+ID_BITS = 12
+ID_MASK = (1 << ID_BITS) - 1
+
+
+def pack_keys(champions):
+    """
+    Give each group of champions a canonical uint64 key, independent of order.
+
+    :param champions: An N x k array of Champion IDs, k <= 5.
+    :return: N uint64 keys; the sorted IDs are packed ID_BITS apart, smallest first.
+    """
+    champions = np.sort(np.asarray(champions, dtype=np.uint64), axis=1)
+    keys = np.zeros(len(champions), dtype=np.uint64)
+    for k in range(champions.shape[1]):
+        keys = (keys << np.uint64(ID_BITS)) | champions[:, k]
+    return keys
+
+
+def unpack_key(key, size):
+    """Return the sorted Champion IDs packed into key by pack_keys."""
+    key = int(key)
+    return tuple((key >> (ID_BITS * (size - 1 - k))) & ID_MASK for k in range(size))
+
+
+class CompositionStats:
+    def __init__(self, matches, sizes=(2, 3, 5)):
+        """
+        Win and game counts for every team composition and partial composition seen.
+
+        Both teams of every match are counted from their own side. Each group of `size`
+        teammates is reduced to a packed key, and counts are aggregated per key with one
+        np.unique pass per size.
+
+        :param matches: Anything accepted by champion_stats.match_matrix.
+        :param sizes: Group sizes to count: 5 is the full team, 2 duos, 3 trios and so on.
+        """
+        matrix = match_matrix(matches)
+        roles = len(ROLES)
+        champions = matrix[:, 1:].astype(np.int64)
+        if len(champions) and champions.max() > ID_MASK:
+            raise ValueError(f'Champion IDs must be below {ID_MASK + 1} to be packed')
+        teams = np.concatenate([champions[:, :roles], champions[:, roles:]])
+        team_win = np.concatenate([matrix[:, 0], 1 - matrix[:, 0]]).astype(np.int64)
+        self.counts = {}
+        for size in sizes:
+            groups = list(combinations(range(roles), size))
+            keys = np.concatenate([pack_keys(teams[:, list(group)]) for group in groups])
+            unique, inverse = np.unique(keys, return_inverse=True)
+            games = np.bincount(inverse, minlength=len(unique))
+            wins = np.bincount(inverse, weights=np.tile(team_win, len(groups)), minlength=len(unique))
+            self.counts[size] = (unique, wins.astype(np.int64), games)
+
+    @classmethod
+    def from_db(cls, db_path='league.db', **kwargs):
+        return cls(load_match_matrix(db_path), **kwargs)
+
+    def lookup(self, champions):
+        """Return (wins, games) for a group of teammates, in any order."""
+        size = len(champions)
+        keys, wins, games = self.counts[size]
+        key = pack_keys([champions])[0]
+        i = np.searchsorted(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return int(wins[i]), int(games[i])
+        return 0, 0
+
+    def query(self, size=5, min_games=1, containing=()):
+        """
+        Return compositions of `size` champions as a DataFrame, best win rate first.
+
+        :param min_games: Drop groups seen fewer times than this.
+        :param containing: Champion IDs every returned group must include.
+        :return: A DataFrame with champions (sorted ID tuple), wins, games and win_rate.
+        """
+        keys, wins, games = self.counts[size]
+        mask = games >= min_games
+        if containing:
+            unpacked = np.stack([(keys >> np.uint64(ID_BITS * (size - 1 - k))) & np.uint64(ID_MASK)
+                                 for k in range(size)], axis=1)
+            for champion in containing:
+                mask &= (unpacked == champion).any(axis=1)
+        frame = pd.DataFrame({
+            'champions': [unpack_key(key, size) for key in keys[mask]],
+            'wins': wins[mask],
+            'games': games[mask],
+        })
+        frame['win_rate'] = frame['wins'] / frame['games']
+        return frame.sort_values(['win_rate', 'games'], ascending=False, kind='stable').reset_index(drop=True)
@@ -0,0 +1,153 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+import numpy as np
+
+# Distinct (wins, games) pairs per bootstrap block; each block has its own random stream, so
+# results do not depend on how blocks are spread over processes
+BLOCK_SIZE = 4096
+# Resampled rates held in memory at once per worker
+MAX_DRAWS = 4_000_000
+INTERVALS = ['wilson', 'beta', 'bootstrap']
+
+
+def z_score(level):
+    """Return the two-sided normal quantile for a confidence level, e.g. 1.96 for 0.95."""
+    return NormalDist().inv_cdf(0.5 + level / 2)
+
+
+def _rates(wins, games):
+    wins, games = np.asarray(wins, dtype=np.float64), np.asarray(games, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return wins, games, wins / games
+
+
+def wilson_interval(wins, games, level=0.95):
+    """
+    Return the Wilson score interval of wins / games, element-wise.
+
+    :return: (low, high) arrays; NaN where games is 0.
+    """
+    wins, games, p = _rates(wins, games)
+    z = z_score(level)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denominator = 1 + z * z / games
+        center = (p + z * z / (2 * games)) / denominator
+        half = z * np.sqrt(p * (1 - p) / games + z * z / (4 * games * games)) / denominator
+    return center - half, center + half
+
+
+def beta_interval(wins, games, level=0.95, prior=(1.0, 1.0)):
+    """
+    Return the equal-tailed credible interval of the Beta posterior of each win rate (requires scipy).
+
+    :param prior: (alpha, beta) of the Beta prior; the default is uniform.
+    :return: (low, high) arrays; NaN where games is 0.
+    """
+    from scipy.stats import beta
+    wins, games, _ = _rates(wins, games)
+    a, b = wins + prior[0], games - wins + prior[1]
+    tail = (1 - level) / 2
+    low, high = beta.ppf(tail, a, b), beta.ppf(1 - tail, a, b)
+    unseen = games == 0
+    low[unseen], high[unseen] = np.nan, np.nan
+    return low, high
+
+
+def _bootstrap_block(wins, games, total, resamples, level, seed):
+    """
+    Percentile interval of each rate over `resamples` bootstrap resamples of `total` matches.
+
+    Resampling matches with replacement only changes how many of them are won with the
+    champion, lost with it, or played without it, and those counts are multinomial. So each
+    resample is two binomial draws per rate instead of a pass over the matches.
+    """
+    rng = np.random.default_rng(seed)
+    tail = (1 - level) / 2
+    low, high = np.empty(len(wins)), np.empty(len(wins))
+    step = max(1, MAX_DRAWS // resamples)
+    for start in range(0, len(wins), step):
+        w, g = wins[start:start + step], games[start:start + step]
+        won = rng.binomial(total, w / total, size=(resamples, len(w)))
+        # Of the matches not won with the champion, each was lost with it at rate losses / (total - wins)
+        rest = total - w
+        lost = rng.binomial(total - won, np.divide(g - w, rest, out=np.zeros(len(w)), where=rest > 0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # NaN where a rarely played champion is absent from a resample; sorting puts those last
+            rates = np.sort(won / (won + lost), axis=0)
+        valid = (~np.isnan(rates)).sum(axis=0)
+        for bound, q in [(low, tail), (high, 1 - tail)]:
+            rank = np.clip(np.floor(q * (valid - 1)).astype(np.int64), 0, resamples - 1)
+            values = np.take_along_axis(rates, rank[None, :], axis=0)[0]
+            bound[start:start + step] = np.where(valid > 0, values, np.nan)
+    return low, high
+
+
+def bootstrap_interval(wins, games, total, level=0.95, resamples=2000, seed=0, processes=None, cache_dir=None):
+    """
+    Return bootstrap percentile intervals of wins / games, resampling the `total` matches.
+
+    Distinct (wins, games) pairs are split into blocks of BLOCK_SIZE resampled in a process
+    pool. Results are cached in cache_dir under a hash of the counts and settings, so a
+    refresh over an unchanged dataset reads them back instead of resampling.
+
+    :param wins: Wins per champion, role or composition, any shape.
+    :param games: Games for each, the same shape.
+    :param total: The number of matches the counts come from.
+    :param processes: Worker processes; None uses every CPU and 1 runs in this process.
+    :param cache_dir: Where to cache results; None disables caching.
+    :return: (low, high) arrays shaped like wins; NaN where games is 0.
+    """
+    wins = np.asarray(wins, dtype=np.int64)
+    games = np.asarray(games, dtype=np.int64)
+    if total == 0:
+        # No matches to resample; every rate is unseen
+        return np.full(wins.shape, np.nan), np.full(wins.shape, np.nan)
+    path = None
+    if cache_dir is not None:
+        digest = hashlib.sha1(wins.tobytes() + games.tobytes()
+                              + repr((wins.shape, int(total), level, resamples, seed)).encode()).hexdigest()
+        path = os.path.join(cache_dir, f'bootstrap-{digest}.npz')
+        if os.path.exists(path):
+            with np.load(path) as cached:
+                return cached['low'], cached['high']
+
+    # The interval depends only on (wins, games, total), and rarely played champions and
+    # compositions share a few distinct pairs, so each distinct pair is resampled once
+    pairs, inverse = np.unique(np.column_stack([wins.ravel(), games.ravel()]), axis=0, return_inverse=True)
+    blocks = [pairs[start:start + BLOCK_SIZE] for start in range(0, len(pairs), BLOCK_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(blocks))
+    args = [(block[:, 0], block[:, 1], int(total), resamples, level, block_seed)
+            for block, block_seed in zip(blocks, seeds)]
+    if processes == 1 or len(blocks) <= 1:
+        results = [_bootstrap_block(*block_args) for block_args in args]
+    else:
+        with ProcessPoolExecutor(max_workers=min(processes or os.cpu_count(), len(blocks))) as pool:
+            results = list(pool.map(_bootstrap_block, *zip(*args)))
+    pair_low = np.concatenate([block_low for block_low, _ in results] or [np.empty(0)])
+    pair_high = np.concatenate([block_high for _, block_high in results] or [np.empty(0)])
+    low, high = pair_low[inverse.ravel()].reshape(wins.shape), pair_high[inverse.ravel()].reshape(wins.shape)
+
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = path + '.tmp.npz'
+        np.savez(temp_path, low=low, high=high)
+        os.replace(temp_path, path)
+    return low, high
+
+
+def win_rate_interval(method, wins, games, total=None, level=0.95, **kwargs):
+    """
+    Dispatch to wilson_interval, beta_interval or bootstrap_interval by name.
+
+    :param total: Matches the counts come from; required for 'bootstrap'.
+    :param kwargs: Passed to bootstrap_interval.
+    """
+    if method == 'wilson':
+        return wilson_interval(wins, games, level)
+    if method == 'beta':
+        return beta_interval(wins, games, level)
+    if method == 'bootstrap':
+        return bootstrap_interval(wins, games, total, level, **kwargs)
+    raise ValueError(f'Unknown interval {method!r}; expected one of {INTERVALS}')
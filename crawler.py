@@ -0,0 +1,257 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from api_client import RiotAPIClient
+from http_transport import PooledTransport
+from match_store import MatchStore
+from pipeline import Pipeline, drain
+from puuid_resolver import PuuidResolver
+from rate_limiter import RiotRateLimiter
+
+# Regional routing value that serves match-v5 for each platform
+PLATFORM_ROUTES = {
+    'NA1': 'americas', 'BR1': 'americas', 'LA1': 'americas', 'LA2': 'americas',
+    'EUW1': 'europe', 'EUN1': 'europe', 'TR1': 'europe', 'RU': 'europe',
+    'KR': 'asia', 'JP1': 'asia',
+    'OC1': 'sea', 'PH2': 'sea', 'SG2': 'sea', 'TH2': 'sea', 'TW2': 'sea', 'VN2': 'sea',
+}
+TIERS = ['IRON', 'BRONZE', 'SILVER', 'GOLD', 'PLATINUM', 'EMERALD', 'DIAMOND']
+DIVISIONS = ['I', 'II', 'III', 'IV']
+
+
+def match_platform(match_id):
+    """Return the platform a match ID such as 'EUW1_6543210' belongs to."""
+    return match_id.partition('_')[0].upper()
+
+
+class CrawlOrchestrator:
+    def __init__(self, api_key, platforms=('NA1',), tiers=('BRONZE',), divisions=('I',), pages=(1,),
+                 queue='RANKED_SOLO_5x5', players_per_shard=None, workers_per_platform=4,
+                 rate_limiter=None, cache=None, transport=None, client_factory=None, puuid_cache=None):
+        """
+        Crawls league entries, match lists and match details for many platforms at once.
+
+        Every (platform, tier, division, page) is one shard. Each platform gets its own client
+        and its own worker pool, so a slow or throttled platform never holds up the others. The
+        clients share one RiotRateLimiter, which keeps separate buckets for every platform and
+        regional routing value, so each region's quota is spent independently. Match IDs are
+        deduplicated across all shards before their details are fetched.
+
+        :param api_key: The Riot API key.
+        :param platforms: Platform routing values to crawl (keys of PLATFORM_ROUTES).
+        :param tiers: Tiers to crawl, e.g. TIERS.
+        :param divisions: Divisions to crawl, e.g. DIVISIONS.
+        :param pages: League-entry pages to crawl per tier and division.
+        :param players_per_shard: Players taken from each page; None takes all of them.
+        :param workers_per_platform: Requests in flight at once on each platform.
+        :param client_factory: Called with a platform to build its client; defaults to a
+                               RiotAPIClient sharing the limiter, cache and transport.
+        :param puuid_cache: A PuuidCache, so players seen on earlier crawls are not resolved again.
+        """
+        self.platforms = list(platforms)
+        self.tiers = list(tiers)
+        self.divisions = list(divisions)
+        self.pages = list(pages)
+        self.queue = queue
+        self.players_per_shard = players_per_shard
+        self.workers_per_platform = workers_per_platform
+        self.rate_limiter = rate_limiter or RiotRateLimiter()
+        self.transport = transport or PooledTransport()
+        if client_factory is None:
+            client_factory = lambda platform: RiotAPIClient(api_key, region=platform, rate_limiter=self.rate_limiter,
+                                                            cache=cache, transport=self.transport)
+        self.clients = {platform: client_factory(platform) for platform in self.platforms}
+        self.resolvers = {platform: PuuidResolver(client, puuid_cache, max_workers=workers_per_platform, platform=platform)
+                          for platform, client in self.clients.items()}
+        self.shard_stats = {}
+        self.platform_stats = {platform: {'fetched': 0, 'stored': 0, 'failed': 0, 'seconds': 0.0}
+                               for platform in self.platforms}
+        self.pipelines = {}
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def shards(self):
+        return [(platform, tier, division, page)
+                for platform in self.platforms for tier in self.tiers
+                for division in self.divisions for page in self.pages]
+
+    def _count_shard(self, shard, **counts):
+        key = '/'.join(map(str, shard))
+        with self._lock:
+            stats = self.shard_stats.setdefault(key, {
+                'entries': 0, 'puuids': 0, 'match_ids': 0, 'new_match_ids': 0,
+                'started': time.perf_counter(), 'seconds': 0.0, 'match_ids_per_sec': 0.0,
+            })
+            for name, count in counts.items():
+                stats[name] += count
+            stats['seconds'] = time.perf_counter() - stats['started']
+            stats['match_ids_per_sec'] = stats['match_ids'] / stats['seconds'] if stats['seconds'] else 0.0
+
+    def _league_entries(self, shard):
+        platform, tier, division, page = shard
+        self._count_shard(shard)
+        entries = self.clients[platform].get_league_entries(self.queue, tier, division, page=page) or []
+        entries = entries[:self.players_per_shard]
+        self._count_shard(shard, entries=len(entries))
+        return [(shard, entries)]
+
+    def _puuids(self, item):
+        shard, entries = item
+        for puuid in self.resolvers[shard[0]].resolve(entries):
+            self._count_shard(shard, puuids=1)
+            yield shard, puuid
+
+    def _match_ids(self, item, num_matches):
+        shard, puuid = item
+        match_ids = self.clients[shard[0]].get_match_ids(puuid, num_matches)
+        self._count_shard(shard, match_ids=len(match_ids))
+        return [(shard, match_id) for match_id in match_ids]
+
+    def _dedupe(self, item):
+        shard, match_id = item
+        with self._lock:
+            if match_id in self._seen:
+                return []
+            self._seen.add(match_id)
+        self._count_shard(shard, new_match_ids=1)
+        return [(shard, match_id)]
+
+    def _enqueue(self, frontier, item):
+        shard, match_id = item
+        try:
+            queued = frontier.enqueue([match_id], *shard[1:3])
+        except Exception:
+            # Let a later discovery of the ID queue it, rather than losing it for the whole crawl
+            with self._lock:
+                self._seen.discard(match_id)
+            raise
+        return [match_id] if queued else []
+
+    def _fetch_details(self, platform, match_id):
+        start = time.perf_counter()
+        match_info = self.clients[platform].get_match_details(match_id)
+        return platform, match_id, match_info, time.perf_counter() - start
+
+    def _pipeline(self, platform, num_matches, output, frontier=None):
+        """
+        Build one platform's pipeline: shard -> league entries -> PUUIDs -> match IDs -> new
+        match IDs and, given a frontier MatchStore, -> queued match IDs -> match details.
+        Match IDs are queued with their shard's tier and division, which MatchStore keeps in
+        MatchInfo.
+        """
+        workers = self.workers_per_platform
+        pipeline = (Pipeline(output=output)
+                    .stage('league_entries', self._league_entries, workers=workers)
+                    .stage('puuids', self._puuids, workers=workers, maxsize=workers)
+                    .stage('match_ids', lambda item: self._match_ids(item, num_matches), workers=workers)
+                    .stage('dedupe', self._dedupe, maxsize=1000))
+        if frontier is not None:
+            # Only IDs neither stored nor already queued go on; queued ones are resumed below
+            pipeline.stage('frontier', lambda item: self._enqueue(frontier, item), maxsize=1000)
+            pipeline.stage('match_details', lambda match_id: [self._fetch_details(platform, match_id)],
+                           workers=workers, maxsize=workers * 4)
+        return pipeline
+
+    def _start(self, num_matches, frontiers=None):
+        output = queue.Queue(maxsize=100)
+        self.pipelines = {}
+        for platform in self.platforms:
+            frontier = frontiers[platform] if frontiers else None
+            self.pipelines[platform] = self._pipeline(platform, num_matches, output, frontier)
+            self.pipelines[platform].start(shard for shard in self.shards() if shard[0] == platform)
+        return drain(list(self.pipelines.values()))
+
+    def depths(self):
+        """Return the items waiting in front of each stage of each platform's pipeline."""
+        return {platform: pipeline.depths() for platform, pipeline in self.pipelines.items()}
+
+    def discover(self, num_matches=20):
+        """
+        Crawl every shard's league entries and match lists concurrently.
+
+        :return: Match IDs not seen before in this crawl, in discovery order.
+        """
+        return [match_id for _, match_id in self._start(num_matches)]
+
+    def _store(self, match_store, platform, match_id, match_info, seconds):
+        stats = self.platform_stats[platform]
+        stats['seconds'] += seconds
+        if match_info is None:
+            stats['failed'] += 1
+            match_store.mark_failed(match_id)
+            return False
+        stats['fetched'] += 1
+        if match_store.add_match(match_id, match_info):
+            stats['stored'] += 1
+            return True
+        return False
+
+    def _run_per_platform(self, tasks):
+        """
+        Run (platform, fn, args) tasks on per-platform worker pools.
+
+        :return: Results in completion order.
+        """
+        pools = {platform: ThreadPoolExecutor(max_workers=self.workers_per_platform,
+                                              thread_name_prefix=f'crawl-{platform}')
+                 for platform in self.platforms}
+        try:
+            futures = [pools[platform].submit(fn, *args) for platform, fn, args in tasks]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=True)
+
+    def crawl(self, match_store, num_matches=20):
+        """
+        Crawl every shard into a MatchStore as one streaming pipeline per platform.
+
+        Match details start downloading as soon as the first player's match list arrives,
+        while other shards are still listing entries. Bounded queues between the stages make
+        a slow stage hold back the ones before it, so memory stays flat however large the
+        crawl. Each platform has its own pipeline and quota. Match IDs already stored are
+        skipped, and those left queued by an interrupted crawl, or whose fetch failed, are
+        fetched once the pipelines are done.
+
+        :return: The number of matches stored.
+        """
+        frontiers = {platform: MatchStore(match_store.db_path, check_same_thread=False) for platform in self.platforms}
+        stored = 0
+        try:
+            for result in self._start(num_matches, frontiers):
+                stored += self._store(match_store, *result)
+        finally:
+            for frontier in frontiers.values():
+                frontier.close()
+        match_store.flush()
+
+        while True:
+            # Match IDs queued for platforms outside this crawl stay queued
+            batch = match_store.pending(limit=match_store.batch_size * len(self.platforms), platforms=self.platforms)
+            tasks = [(match_platform(match_id), self._fetch_details, (match_platform(match_id), match_id))
+                     for match_id in batch]
+            if not tasks:
+                break
+            for result in self._run_per_platform(tasks):
+                stored += self._store(match_store, *result)
+            match_store.flush()
+        return stored
+
+    def report(self):
+        """
+        Return throughput per shard and per platform.
+
+        Platform seconds are summed over concurrent requests, so matches_per_sec is the rate
+        one worker sustains; multiply by workers_per_platform for the platform's throughput.
+        """
+        platforms = {}
+        for platform, stats in self.platform_stats.items():
+            platforms[platform] = dict(stats, route=PLATFORM_ROUTES.get(platform),
+                                       puuids=dict(self.resolvers[platform].stats),
+                                       matches_per_sec=stats['fetched'] / stats['seconds'] if stats['seconds'] else 0.0)
+        shards = {key: {name: value for name, value in stats.items() if name != 'started'}
+                  for key, stats in self.shard_stats.items()}
+        return {'shards': shards, 'platforms': platforms, 'stages': {platform: pipeline.stats()
+                                                                      for platform, pipeline in self.pipelines.items()}}
@@ -1,93 +1,223 @@
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+from champion_stats import ChampionWinRates
+from compositions import CompositionStats
+from confidence import wilson_interval, win_rate_interval
+from dataset import load_matches
+
+# Analyses run by run_report, each a DataAnalysis.compute_* method name minus the prefix
+REPORT_ANALYSES = ['win_rates', 'composition']
+
+
+def _pyplot(headless):
+    """Import pyplot on first use; headless selects the non-interactive Agg backend."""
+    import matplotlib
+    if headless:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _compute(source, cache_dir, names_db, name, options):
+    # Runs in a worker process; the dataset loads from the .npy cache in milliseconds
+    return name, getattr(DataAnalysis(source, cache_dir, names_db), f'compute_{name}')(**options)
+
 
 class DataAnalysis:
-    def __init__(self, filepath):
-        self.data = pd.read_csv(filepath)
-        
-    def analyze_win_rates(self):
-        # Calculate win rates
-        win_rate_data = self.data.groupby('championName').agg(
-            total_games=('championName', 'size'),
-            total_wins=('win', 'sum')
-        ).reset_index()
-        
-        win_rate_data['win_rate'] = (win_rate_data['total_wins'] / win_rate_data['total_games']) * 100
-        
-        # Sort the data for better visualization
-        win_rate_data = win_rate_data.sort_values(by='win_rate', ascending=False)
-
-        # Plotting
-        plt.figure(figsize=(15, 8))
+    def __init__(self, filepath, cache_dir='dataset_cache', names_db='league.db'):
+        # minified.csv or league.db, read through the compact .npy cache
+        self.data = load_matches(filepath, cache_dir)
+        self.filepath = filepath
+        self.cache_dir = cache_dir
+        self.names_db = names_db
+        self._champion_names = None
+
+    @property
+    def champion_names(self):
+        """Champion names indexed by Champion table ID, or an empty list if names_db is missing."""
+        if self._champion_names is None:
+            self._champion_names = []
+            if self.names_db and os.path.exists(self.names_db):
+                conn = sqlite3.connect(self.names_db)
+                self._champion_names = [name for _, name in conn.execute('SELECT id, name FROM Champion ORDER BY id')]
+                conn.close()
+        return self._champion_names
+
+    def _name(self, champion_id):
+        names = self.champion_names
+        return names[champion_id] if champion_id < len(names) else str(champion_id)
+
+    def _with_interval(self, frame, wins, games, interval, level, rank_by):
+        """
+        Add win_rate_low and win_rate_high (%) to frame and sort it by rank_by, best first.
+
+        :param rank_by: 'win_rate', or 'lower_bound' to rank by the lower bound of a Wilson or
+                        Beta interval so that rates backed by a handful of games do not sit on
+                        top; implies a Wilson interval when interval is None.
+        """
+        if rank_by not in ('win_rate', 'lower_bound'):
+            raise ValueError(f"rank_by must be 'win_rate' or 'lower_bound', not {rank_by!r}")
+        if interval is None and rank_by == 'lower_bound':
+            interval = 'wilson'
+        if interval is not None:
+            # Bootstrap results are cached next to the dataset's .npy files, keyed by its counts
+            low, high = win_rate_interval(interval, wins, games, total=len(self.data), level=level,
+                                          cache_dir=os.path.join(self.cache_dir, 'intervals'))
+            frame['win_rate_low'] = low * 100
+            frame['win_rate_high'] = high * 100
+        if rank_by == 'win_rate':
+            return frame.sort_values(by='win_rate', ascending=False, kind='stable').reset_index(drop=True)
+        # Every resample of a perfect record is a perfect record, so a percentile bootstrap puts a
+        # 3/3 champion's lower bound at 100%; rank by a Wilson bound instead when showing one
+        rank_low = low if interval in ('wilson', 'beta') else wilson_interval(wins, games, level)[0]
+        order = pd.Series(rank_low).sort_values(ascending=False, kind='stable').index
+        return frame.iloc[order].reset_index(drop=True)
+
+    def compute_win_rates(self, interval=None, level=0.95, rank_by='win_rate', by_role=False):
+        """
+        Return games, wins and win rate (%) per champion, best first.
+
+        :param interval: 'wilson', 'beta' (requires scipy) or 'bootstrap' to add a confidence
+                         interval for every win rate, or None.
+        :param level: Confidence level of the interval.
+        :param rank_by: 'win_rate' or 'lower_bound'.
+        :param by_role: One row per champion and role, with a role column.
+        """
+        stats = ChampionWinRates()
+        stats.update(self.data)
+        frame = stats.to_dataframe(by_role=by_role).reset_index()
+        win_rate_data = pd.DataFrame({
+            'championName': [self._name(champion_id) for champion_id in frame['champion_id']],
+            'total_games': frame['wins'] + frame['losses'],
+            'total_wins': frame['wins'],
+            'win_rate': frame['winrate'] * 100,
+        })
+        if by_role:
+            win_rate_data.insert(1, 'role', frame['role'])
+        return self._with_interval(win_rate_data, win_rate_data['total_wins'].to_numpy(),
+                                   win_rate_data['total_games'].to_numpy(), interval, level, rank_by)
+
+    def compute_composition(self, top_n=10, size=5, min_games=1, interval=None, level=0.95, rank_by='win_rate'):
+        """
+        Return the top_n team compositions by win rate (%).
+
+        :param size: Champions per composition; 2 and 3 give the best duos and trios.
+        :param min_games: Skip compositions seen fewer times than this.
+        :param interval: As for compute_win_rates.
+        :param rank_by: As for compute_win_rates.
+        """
+        compositions = CompositionStats(self.data, sizes=(size,)).query(size, min_games)
+        frame = pd.DataFrame({
+            'wins': compositions['wins'],
+            'total': compositions['games'],
+            'win_rate': compositions['win_rate'] * 100,
+            'champions': compositions['champions'],
+        })
+        frame = self._with_interval(frame, frame['wins'].to_numpy(), frame['total'].to_numpy(),
+                                    interval, level, rank_by).head(top_n)
+        frame['composition'] = [' / '.join(map(self._name, key)) for key in frame.pop('champions')]
+        return frame
+
+    def plot_win_rates(self, win_rate_data, path=None):
+        """Bar chart of compute_win_rates' output, saved to path or shown if path is None."""
+        import seaborn as sns
+        plt = _pyplot(headless=path is not None)
+        fig = plt.figure(figsize=(15, 8))
         sns.barplot(data=win_rate_data, x='championName', y='win_rate')
+        self._error_bars(plt, win_rate_data)
         plt.xticks(rotation=90)
         plt.title('Champion Win Rates')
         plt.xlabel('Champion Name')
         plt.ylabel('Win Rate (%)')
-        plt.show()
-        
-        # Return the processed data for further analysis if needed
-        return win_rate_data
+        self._finish(plt, fig, path)
 
-    def analyze_composition(self):
-        # Extract team compositions
-        team_compositions = self.data.groupby('matchId')['championName'].apply(list)
-
-        # Count the occurrences of each unique team composition
-        composition_counts = Counter(map(tuple, team_compositions))
-        
-        # Calculate win rates
-        composition_win_data = {}
-        for match_id, champions in team_compositions.items():
-            key = tuple(sorted(champions))
-            if key not in composition_win_data:
-                composition_win_data[key] = {'wins': 0, 'total': 0}
-            
-            # Assuming 'win' column has boolean values indicating if the team won
-            if self.data.loc[self.data['matchId'] == match_id, 'win'].any():
-                composition_win_data[key]['wins'] += 1
-            composition_win_data[key]['total'] += 1
-
-        # Calculate win rates
-        for key in composition_win_data:
-            wins = composition_win_data[key]['wins']
-            total = composition_win_data[key]['total']
-            composition_win_data[key]['win_rate'] = (wins / total) * 100
-
-        # Convert to DataFrame for easier manipulation
-        composition_df = pd.DataFrame.from_dict(composition_win_data, orient='index')
-        composition_df['composition'] = composition_df.index
-        composition_df = composition_df.sort_values(by='win_rate', ascending=False)
-
-        # Visualize the top N compositions
-        top_n = 10
-        top_compositions = composition_df.head(top_n)
-        
-        plt.figure(figsize=(10, 6))
-        sns.barplot(data=top_compositions, x='composition', y='win_rate')
+    def plot_composition(self, composition_df, path=None):
+        """Bar chart of compute_composition's output, saved to path or shown if path is None."""
+        import seaborn as sns
+        plt = _pyplot(headless=path is not None)
+        fig = plt.figure(figsize=(10, 6))
+        sns.barplot(data=composition_df, x='composition', y='win_rate')
+        self._error_bars(plt, composition_df)
         plt.xticks(rotation=90)
-        plt.title(f'Top {top_n} Team Compositions by Win Rate')
+        plt.title(f'Top {len(composition_df)} Team Compositions by Win Rate')
         plt.xlabel('Team Composition')
         plt.ylabel('Win Rate (%)')
-        plt.show()
+        self._finish(plt, fig, path)
+
+    @staticmethod
+    def _error_bars(plt, frame):
+        if 'win_rate_low' in frame:
+            errors = [frame['win_rate'] - frame['win_rate_low'], frame['win_rate_high'] - frame['win_rate']]
+            plt.errorbar(range(len(frame)), frame['win_rate'], yerr=errors, fmt='none', ecolor='black')
+
+    @staticmethod
+    def _finish(plt, fig, path):
+        if path is None:
+            plt.show()
+        else:
+            fig.savefig(path, bbox_inches='tight')
+        plt.close(fig)
+
+    def analyze_win_rates(self, path=None, **options):
+        """Plot compute_win_rates(**options), e.g. interval='bootstrap', rank_by='lower_bound'."""
+        win_rate_data = self.compute_win_rates(**options)
+        self.plot_win_rates(win_rate_data, path)
+        # Return the processed data for further analysis if needed
+        return win_rate_data
 
+    def analyze_composition(self, path=None, **options):
+        top_compositions = self.compute_composition(**options)
+        self.plot_composition(top_compositions, path)
         return top_compositions
-    
-    def analyze_composition(self):
-        # Understand how team compositions affect match outcomes
-        pass
-    
+
     def analyze_items(self):
         # Analyze the impact of item choices on win rates
         pass
-    
+
     def additional_analysis(self):
         # Conduct additional analysis based on other relevant data points
         pass
-    
+
     def run_all_analyses(self):
         self.analyze_win_rates()
         self.analyze_composition()
         self.analyze_items()
-        self.additional_analysis()
\ No newline at end of file
+        self.additional_analysis()
+
+    def run_report(self, output_dir, render=True, processes=None, **options):
+        """
+        Run every analysis without a display and write the results to output_dir.
+
+        Analyses run in parallel worker processes. Each result is written as <name>.csv and,
+        when render is True, drawn with the Agg backend to <name>.png. matplotlib and seaborn
+        are only imported when rendering.
+
+        :param processes: Worker processes; defaults to one per analysis.
+        :param options: Passed to every compute_* method, e.g. interval and rank_by.
+        :return: Dict from analysis name to its DataFrame.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        with ProcessPoolExecutor(max_workers=processes or len(REPORT_ANALYSES)) as pool:
+            futures = [pool.submit(_compute, self.filepath, self.cache_dir, self.names_db, name, options)
+                       for name in REPORT_ANALYSES]
+            results = dict(future.result() for future in futures)
+        for name, frame in results.items():
+            frame.to_csv(os.path.join(output_dir, f'{name}.csv'), index=False)
+            if render:
+                getattr(self, f'plot_{name}')(frame, os.path.join(output_dir, f'{name}.png'))
+        return results
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Write the analysis report without a display.')
+    parser.add_argument('source', nargs='?', default='minified.csv')
+    parser.add_argument('--output-dir', default='report')
+    parser.add_argument('--no-render', action='store_true')
+    parser.add_argument('--interval', choices=['wilson', 'beta', 'bootstrap'])
+    parser.add_argument('--rank-by', choices=['win_rate', 'lower_bound'], default='win_rate')
+    args = parser.parse_args()
+    DataAnalysis(args.source).run_report(args.output_dir, render=not args.no_render,
+                                         interval=args.interval, rank_by=args.rank_by)
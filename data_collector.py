@@ -1,68 +1,194 @@
+import logging
 import pandas as pd
+import sqlite3
 import time
+from concurrent.futures import ThreadPoolExecutor
 from api_client import RiotAPIClient
+from match_columns import MatchColumns, to_epoch_ms
+from match_store import encode_rank, load_champion_ids
+from champion_stats import ChampionWinRates
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
 
 class DataCollector:
-    def __init__(self, api_client):
-        """Initialize the data collector with an API client."""
+    def __init__(self, api_client, champion_ids=None, db_path='league.db', metrics=REGISTRY):
+        """
+        Initialize the data collector with an API client.
+
+        :param champion_ids: Dict mapping lower-cased champion names to Champion table IDs.
+                             Loaded from the Champion table in db_path when not given.
+        :param metrics: MetricsRegistry the time spent in each collection stage is recorded in,
+                        as collector_stage_latency_ms.
+        """
         self.api_client = api_client
+        self.metrics = metrics
+        self.db_path = db_path
+        self._champion_ids = champion_ids
+        self.match_columns = MatchColumns()
         self.match_data = pd.DataFrame()
         self.champion_winrate_data = pd.DataFrame()
-    
+        self.champion_stats = ChampionWinRates()
+
+    @property
+    def champion_ids(self):
+        if self._champion_ids is None:
+            conn = sqlite3.connect(self.db_path)
+            self._champion_ids = load_champion_ids(conn)
+            conn.close()
+        return self._champion_ids
+
+    def _timer(self, stage):
+        return self.metrics.timer('collector_stage_latency_ms', stage=stage)
+
     def collect_match_data(self, puuids, num_matches=100):
-        matches = []
+        # Matches are projected into compact columns as they arrive; raw payloads are not kept
+        self.match_columns = MatchColumns()
         for puuid in puuids:
-            print(f"Collecting match data for PUUID {puuid}...")
-            match_ids = self.api_client.get_match_ids_for_puuids([puuid], num_matches)
-            print(f"Number of match IDs fetched for PUUID {puuid}: {len(match_ids[puuid])}")
-            
-            for match_id in match_ids[puuid]:
+            logger.debug("Collecting match data for PUUID %s...", puuid)
+            with self._timer('match_ids'):
+                match_ids = self.api_client.get_match_ids_for_puuids([puuid], num_matches)
+            logger.debug("Number of match IDs fetched for PUUID %s: %d", puuid, len(match_ids.get(puuid, [])))
+
+            for match_id in match_ids.get(puuid, []):
                 try:
-                    match_info = self.api_client.get_match_details(match_id)
-                    # Log the raw API response for troubleshooting
-                    print(f"Raw API response for match ID {match_id}: {match_info}")
-                    if match_info:
-                        matches.append(match_info)
-                        print(f"Fetched match data for match ID {match_id}")
+                    with self._timer('match_details'):
+                        match_info = self.api_client.get_match_details(match_id)
+                    with self._timer('parse'):
+                        appended = bool(match_info) and self.match_columns.append_payload(match_info, self.champion_ids)
+                    if appended:
+                        logger.debug("Fetched match data for match ID %s", match_id)
                     else:
-                        print(f"Match ID {match_id} data is missing important keys.")
+                        logger.info("Match ID %s data is missing important keys.", match_id)
                 except Exception as e:
-                    print(f"An error occurred while fetching match data for match ID {match_id}: {e}")
+                    logger.warning("An error occurred while fetching match data for match ID %s: %s", match_id, e)
                     continue
 
-        self.match_data = pd.DataFrame(matches)
-        print("Match data collection complete.")
-        # Log the structure of the final DataFrame
-        print(f"Final DataFrame structure: {self.match_data.head()}")
+        self.match_data = self.match_columns.to_dataframe()
+        logger.info("Match data collection complete: %d matches.", len(self.match_data))
         if self.match_data.empty:
-            print("No match data to process.")
+            logger.info("No match data to process.")
 
-    def filter_matches_by_time(self, start_date, end_date):
-        """Filter matches based on a time range."""
+    def collect_match_data_concurrent(self, puuids, num_matches=100, max_workers=8):
+        """
+        Collect match data like collect_match_data, fetching match IDs and match details on a
+        pool of worker threads. Requests draw from the API client's shared rate limiter, so the
+        pool never exceeds the key's limits however many workers are used.
+
+        :param puuids: A list of PUUIDs.
+        :param num_matches: Number of matches to fetch per PUUID.
+        :param max_workers: Number of requests in flight at once.
+        """
+        puuids = [puuid for puuid in puuids if puuid]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            with self._timer('match_ids'):
+                match_id_lists = executor.map(lambda puuid: self.api_client.get_match_ids(puuid, num_matches), puuids)
+                # Players in the same division share games, so each match is only fetched once
+                match_ids = list(dict.fromkeys(match_id for ids in match_id_lists for match_id in ids))
+            logger.info("Fetching %d matches for %d PUUIDs...", len(match_ids), len(puuids))
+            self.match_columns = MatchColumns(capacity=len(match_ids))
+            with self._timer('match_details'):
+                for match_info in executor.map(self.api_client.get_match_details, match_ids):
+                    if match_info:
+                        self.match_columns.append_payload(match_info, self.champion_ids)
+
+        self.match_data = self.match_columns.to_dataframe()
+        logger.info("Match data collection complete: %d of %d matches fetched.", len(self.match_columns), len(match_ids))
         if self.match_data.empty:
-            print("No match data available to filter.")
+            logger.info("No match data to process.")
+
+    def crawl_to_store(self, puuids, match_store, num_matches=100, max_workers=8):
+        """
+        Crawl matches for the given PUUIDs straight into a MatchStore instead of memory.
+
+        Match IDs are queued in the store's crawl frontier, skipping those already in the Match
+        table, and details are fetched and written one batch at a time. Match IDs left queued by
+        an interrupted crawl are fetched first, so calling this again resumes the crawl.
+
+        :param puuids: A list of PUUIDs.
+        :param match_store: The MatchStore to write matches to.
+        :param num_matches: Number of matches to fetch per PUUID.
+        :param max_workers: Number of requests in flight at once.
+        :return: The number of matches stored.
+        """
+        puuids = [puuid for puuid in puuids if puuid]
+        stored = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            with self._timer('match_ids'):
+                for match_ids in executor.map(lambda puuid: self.api_client.get_match_ids(puuid, num_matches), puuids):
+                    match_store.enqueue(match_ids)
+
+            while True:
+                batch = match_store.pending(limit=match_store.batch_size)
+                if not batch:
+                    break
+                with self._timer('match_details'):
+                    for match_id, match_info in zip(batch, executor.map(self.api_client.get_match_details, batch)):
+                        if match_info is None:
+                            match_store.mark_failed(match_id)
+                        elif match_store.add_match(match_id, match_info):
+                            stored += 1
+                with self._timer('store'):
+                    match_store.flush()
+                logger.info("Stored %d matches so far.", stored)
+
+        logger.info("Crawl complete: %d new matches stored, %d matches in total.", stored, match_store.count())
+        return stored
+
+    def _select(self, mask):
+        self.match_columns = self.match_columns.take(mask)
+        self.match_data = self.match_columns.to_dataframe()
+
+    def filter_matches_by_time(self, start_date, end_date):
+        """
+        Keep only collected matches created from start_date up to, but not including, end_date,
+        the same window load_matches(start, end) reads.
+
+        :param start_date: A datetime, date string or epoch milliseconds; naive times are UTC.
+        :param end_date: Likewise; exclusive.
+        """
+        if not len(self.match_columns):
+            logger.info("No match data available to filter.")
+            return
+        created = self.match_columns['game_creation']
+        self._select((created >= to_epoch_ms(start_date)) & (created < to_epoch_ms(end_date)))
+        logger.info("Filtered matches between %s and %s.", start_date, end_date)
+
+    def filter_matches_by_division(self, tier='DIAMOND', division='I'):
+        """
+        Keep only collected matches found through players in the given tier and division.
+
+        Only matches loaded with load_matches carry a rank; matches collected straight from the
+        API have none and are dropped.
+        """
+        if not len(self.match_columns):
+            logger.info("No match data available to filter.")
             return
+        tier_code, division_code = encode_rank(tier, division)
+        self._select((self.match_columns['tier'] == tier_code) & (self.match_columns['division'] == division_code))
+        logger.info("Filtered matches to include only those played by summoners in %s %s.", tier, division)
 
-        # Ensure start_date and end_date are datetime objects
-        start_date = pd.to_datetime(start_date)
-        end_date = pd.to_datetime(end_date)
+    def load_matches(self, start=None, end=None, patch=None, tier=None, division=None):
+        """
+        Load the matches stored in db_path inside a window as the collected match data.
 
-        # Filter matches based on the game creation timestamp
-        self.match_data = self.match_data[
-            (self.match_data['gameCreation'] >= start_date) & 
-            (self.match_data['gameCreation'] <= end_date)
-        ]
-        print(f"Filtered matches between {start_date} and {end_date}.")
+        The window includes start and excludes end. Only the matching index range is read; see
+        MatchColumns.from_db for the filters.
+        """
+        with self._timer('load'):
+            self.match_columns = MatchColumns.from_db(self.db_path, start, end, patch, tier, division)
+        self.match_data = self.match_columns.to_dataframe()
+        logger.info("Loaded %d matches from %s.", len(self.match_columns), self.db_path)
 
     def collect_champion_winrate_data(self):
         """Collect champion winrate data."""
-        print("Collecting champion win rate data...")
+        logger.info("Collecting champion win rate data...")
         try:
             champion_stats = self.api_client.get_champion_statistics()
             self.champion_winrate_data = pd.DataFrame(champion_stats)
-            print("Champion win rate data collection complete.")
+            logger.info("Champion win rate data collection complete.")
         except Exception as e:
-            print(f"An error occurred while collecting champion win rate data: {e}")
+            logger.warning("An error occurred while collecting champion win rate data: %s", e)
 
     def collect_champion_winrate_data(self, conditions=None):
         """
@@ -70,51 +196,49 @@ class DataCollector:
         
         :param conditions: Dict with conditions for data collection (e.g., division, region)
         """
-        print("Collecting champion win rate data...")
+        logger.info("Collecting champion win rate data...")
         try:
             champion_stats = self.api_client.get_champion_statistics(conditions)
             self.champion_winrate_data = pd.DataFrame(champion_stats)
-            print(f"Champion win rate data collection complete for conditions: {conditions}")
+            logger.info("Champion win rate data collection complete for conditions: %s", conditions)
         except Exception as e:
-            print(f"An error occurred while collecting champion win rate data: {e}")
-
-    def process_match_data(self, match_data):
-        """Process raw match data to update champion win/loss counts."""
-        for match in match_data:
-            # Assuming 'match' is a dictionary with match details
-            # You will need to adjust the keys based on the actual structure of the match data
-            for participant in match['participants']:
-                champion_id = participant['championId']
-                win = participant['stats']['win']
-                
-                # Initialize the champion entry in the DataFrame if it doesn't exist
-                if champion_id not in self.champion_winrate_data.index:
-                    self.champion_winrate_data.loc[champion_id] = {'wins': 0, 'losses': 0}
-                
-                # Increment win/loss count
-                if win:
-                    self.champion_winrate_data.loc[champion_id, 'wins'] += 1
-                else:
-                    self.champion_winrate_data.loc[champion_id, 'losses'] += 1
-
-        # Calculate win rates
-        self.champion_winrate_data['winrate'] = self.champion_winrate_data['wins'] / (self.champion_winrate_data['wins'] + self.champion_winrate_data['losses'])
+            logger.warning("An error occurred while collecting champion win rate data: %s", e)
+
+    def process_match_data(self, match_data=None):
+        """
+        Update the champion win/loss counts.
+
+        :param match_data: A list of match-v5 payloads, a DataFrame in minified.csv's layout, or
+                           a MatchColumns, added to the counts from earlier calls so new batches
+                           can be passed as they arrive. When omitted, the counts are rebuilt
+                           from the matches collected so far.
+        """
+        if match_data is None:
+            self.champion_stats = ChampionWinRates()
+            match_data = self.match_columns
+        elif isinstance(match_data, list):
+            batch = MatchColumns(capacity=len(match_data))
+            for match_info in match_data:
+                batch.append_payload(match_info, self.champion_ids)
+            match_data = batch
+        self.champion_stats.update(match_data)
+        self.champion_winrate_data = self.champion_stats.to_dataframe()
     
     def save_match_data_to_csv(self, file_path):
         """Save match data to a CSV file."""
         if not self.match_data.empty:
             self.match_data.to_csv(file_path, index=False)
-            print(f"Match data saved to {file_path}.")
+            logger.info("Match data saved to %s.", file_path)
         else:
-            print("No match data to save.")
+            logger.info("No match data to save.")
 
     def save_champion_winrate_data_to_csv(self, file_path):
         """Save champion winrate data to a CSV file."""
         if not self.champion_winrate_data.empty:
             self.champion_winrate_data.to_csv(file_path, index=False)
-            print(f"Champion winrate data saved to {file_path}.")
+            logger.info("Champion winrate data saved to %s.", file_path)
         else:
-            print("No champion winrate data to save.")
+            logger.info("No champion winrate data to save.")
 
     def get_match_data(self):
         """Get the collected match data."""
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+from match_store import MATCH_COLUMNS
+
+# Compact dtypes for minified.csv and the Match table; Champion IDs fit comfortably in int16
+COLUMN_DTYPES = dict({'team1_win': np.int8}, **{column: np.int16 for column in MATCH_COLUMNS[1:]})
+
+
+def source_signature(source):
+    stat = os.stat(source)
+    signature = {'source': os.path.abspath(source), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+    # A SQLite database in WAL mode takes new rows in its -wal file until a checkpoint, leaving
+    # the main file untouched
+    wal_path = source + '-wal'
+    if os.path.exists(wal_path):
+        wal = os.stat(wal_path)
+        signature.update(wal_mtime_ns=wal.st_mtime_ns, wal_size=wal.st_size)
+    return signature
+
+
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_match_blocks(source, chunk_size=100000):
+    """
+    Yield N x 11 int16 blocks of rows in minified.csv's column order.
+
+    :param source: minified.csv (any path ending in .csv) or a SQLite database with a Match table.
+    """
+    if source.endswith('.csv'):
+        for chunk in pd.read_csv(source, usecols=MATCH_COLUMNS, dtype=COLUMN_DTYPES, chunksize=chunk_size):
+            yield chunk[MATCH_COLUMNS].to_numpy(dtype=np.int16)
+        return
+    conn = sqlite3.connect(source)
+    try:
+        cursor = conn.execute(f"SELECT {', '.join(MATCH_COLUMNS)} FROM Match ORDER BY rowid")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield np.array(rows, dtype=np.int16)
+    finally:
+        conn.close()
+
+
+class MatchDataset:
+    def __init__(self, source='minified.csv', cache_dir='dataset_cache'):
+        """
+        Matches from minified.csv or league.db's Match table, converted once to .npy files.
+
+        The cache is checked against the source's mtime and size; if those changed but the
+        content hash did not (a touch, a copy), the cache is kept and only its note is updated.
+
+        :param source: minified.csv or a SQLite database with a Match table.
+        :param cache_dir: Directory holding one subdirectory of .npy files per source.
+        """
+        self.source = source
+        name = os.path.basename(source)
+        key = hashlib.sha1(os.path.abspath(source).encode()).hexdigest()[:12]
+        self.directory = os.path.join(cache_dir, f'{name}-{key}')
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _read_meta(self):
+        try:
+            with open(self._path('source.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, signature, content_hash):
+        with open(self._path('source.json'), 'w') as f:
+            json.dump(dict(signature, sha1=content_hash), f)
+
+    def is_fresh(self):
+        """Return True if the cache reflects the source as it is now."""
+        meta = self._read_meta()
+        if meta is None:
+            return False
+        signature = source_signature(self.source)
+        changed = {key for key, value in signature.items() if meta.get(key) != value}
+        if not changed:
+            return True
+        if changed & {'wal_mtime_ns', 'wal_size'}:
+            # The content hash only covers the main file
+            return False
+        content_hash = file_hash(self.source)
+        if meta.get('sha1') != content_hash:
+            return False
+        self._write_meta(signature, content_hash)
+        return True
+
+    def build(self, chunk_size=100000):
+        """Convert the source into team1_win.npy (int8) and champions.npy (N x 10 int16)."""
+        os.makedirs(self.directory, exist_ok=True)
+        signature, content_hash = source_signature(self.source), file_hash(self.source)
+        blocks = list(iter_match_blocks(self.source, chunk_size))
+        matrix = np.concatenate(blocks) if blocks else np.empty((0, len(MATCH_COLUMNS)), dtype=np.int16)
+        np.save(self._path('team1_win.npy'), matrix[:, 0].astype(np.int8))
+        np.save(self._path('champions.npy'), np.ascontiguousarray(matrix[:, 1:]))
+        self._write_meta(signature, content_hash)
+
+    def arrays(self, mmap_mode='r'):
+        """
+        Return (team1_win, champions), building or refreshing the cache first if needed.
+
+        :param mmap_mode: Passed to np.load; the default maps the files read-only without
+                          copying them into memory. Use None to read them in.
+        """
+        if not self.is_fresh():
+            self.build()
+        return (np.load(self._path('team1_win.npy'), mmap_mode=mmap_mode),
+                np.load(self._path('champions.npy'), mmap_mode=mmap_mode))
+
+    def matrix(self):
+        """Return the matches as an N x 11 int16 array in minified.csv's column order."""
+        team1_win, champions = self.arrays()
+        return np.column_stack([team1_win.astype(np.int16), champions])
+
+    def to_dataframe(self):
+        """Return the matches as a DataFrame with minified.csv's columns and compact dtypes."""
+        team1_win, champions = self.arrays()
+        data = {'team1_win': np.asarray(team1_win)}
+        for i, column in enumerate(MATCH_COLUMNS[1:]):
+            data[column] = champions[:, i]
+        return pd.DataFrame(data)
+
+
+def load_matches(source='minified.csv', cache_dir='dataset_cache'):
+    """Return minified.csv or league.db's matches as a compact DataFrame, via the .npy cache."""
+    return MatchDataset(source, cache_dir).to_dataframe()
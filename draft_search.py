@@ -0,0 +1,146 @@
+import time
+import numpy as np
+
+TEAM_SIZE = 5
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def default_pick_order(ally_picks, enemy_picks):
+    """Alternate the remaining picks, starting with whichever team has picked fewer (allies on ties)."""
+    order = []
+    ally, enemy = ally_picks, enemy_picks
+    while ally < TEAM_SIZE or enemy < TEAM_SIZE:
+        if ally < TEAM_SIZE and (ally <= enemy or enemy == TEAM_SIZE):
+            order.append('ally')
+            ally += 1
+        else:
+            order.append('enemy')
+            enemy += 1
+    return order
+
+
+class DraftSearch:
+    def __init__(self, index, beam_width=8, time_budget=1.0):
+        """
+        Alpha-beta search over the remaining draft.
+
+        Only the beam_width champions that score best for the side to move are expanded at each
+        pick, and positions are memoized in a transposition table keyed by the sorted team sets,
+        since different pick orders often reach the same teams. Search deepens one pick at a
+        time until time_budget runs out.
+
+        :param index: A MatchupIndex.
+        :param beam_width: Candidates expanded per pick.
+        :param time_budget: Seconds allowed per best_pick call.
+        """
+        self.index = index
+        self.beam_width = beam_width
+        self.time_budget = time_budget
+        self.table = {}
+        self.nodes = 0
+        self.depth_reached = 0
+
+    def evaluate(self, ally, enemy):
+        """Score a (possibly partial) draft from the allies' side."""
+        ally = np.asarray(ally, dtype=np.intp)
+        enemy = np.asarray(enemy, dtype=np.intp)
+        return float(self._strength(ally, enemy) - self._strength(enemy, ally))
+
+    def _strength(self, team, enemies):
+        index = self.index
+        synergy = index.synergy_delta[team][:, team].sum() / 4
+        counter = index.counter_delta[team][:, enemies].sum() / 5
+        return index.champion_delta[team].sum() + synergy + counter
+
+    def best_pick(self, ally, enemy, available, pick_order=None, time_budget=None):
+        """
+        Find the allies' best next pick looking ahead through the remaining picks.
+
+        :param ally: Allied champion IDs picked so far.
+        :param enemy: Enemy champion IDs picked so far.
+        :param available: Champion IDs that can still be picked by either team.
+        :param pick_order: Remaining picks as a list of 'ally'/'enemy', starting with the pick
+                           being decided; defaults to alternating picks.
+        :param time_budget: Overrides the instance's time budget for this call.
+        :return: A (champion_id, value) tuple, or (None, value) if nothing can be picked.
+        """
+        ally, enemy = tuple(ally), tuple(enemy)
+        available = frozenset(available) - set(ally) - set(enemy)
+        order = list(pick_order or default_pick_order(len(ally), len(enemy)))
+        deadline = time.perf_counter() + (self.time_budget if time_budget is None else time_budget)
+        self.table = {}
+        self.nodes = 0
+        self.depth_reached = 0
+        if not available or not order:
+            return None, self.evaluate(ally, enemy)
+
+        best = (self._candidates(ally, enemy, available, 'ally')[0], None)
+        for depth in range(1, len(order) + 1):
+            try:
+                best = self._root(ally, enemy, available, order, depth, deadline)
+            except SearchTimeout:
+                break
+            self.depth_reached = depth
+        return best
+
+    def _candidates(self, ally, enemy, available, side):
+        team, enemies = (ally, enemy) if side == 'ally' else (enemy, ally)
+        candidates = np.fromiter(available, dtype=np.intp, count=len(available))
+        scores = self.index.score(candidates, list(team), list(enemies))
+        top = np.argsort(-scores, kind='stable')[:self.beam_width]
+        return candidates[top].tolist()
+
+    def _root(self, ally, enemy, available, order, depth, deadline):
+        best_value, best_pick = -np.inf, None
+        for champion in self._candidates(ally, enemy, available, 'ally'):
+            value = self._search(ally + (champion,), enemy, available - {champion}, order[1:], depth - 1,
+                                 best_value, np.inf, deadline)
+            if value > best_value:
+                best_value, best_pick = value, champion
+        return best_pick, best_value
+
+    def _search(self, ally, enemy, available, order, depth, alpha, beta, deadline):
+        self.nodes += 1
+        if self.nodes % 256 == 0 and time.perf_counter() > deadline:
+            raise SearchTimeout()
+        if depth == 0 or not order or not available:
+            return self.evaluate(ally, enemy)
+
+        key = (tuple(sorted(ally)), tuple(sorted(enemy)), depth)
+        entry = self.table.get(key)
+        if entry is not None:
+            value, flag = entry
+            if flag == EXACT or (flag == LOWER and value >= beta) or (flag == UPPER and value <= alpha):
+                return value
+
+        original_alpha, original_beta = alpha, beta
+        side = order[0]
+        maximizing = side == 'ally'
+        best = -np.inf if maximizing else np.inf
+        for champion in self._candidates(ally, enemy, available, side):
+            if maximizing:
+                child = (ally + (champion,), enemy)
+            else:
+                child = (ally, enemy + (champion,))
+            value = self._search(*child, available - {champion}, order[1:], depth - 1, alpha, beta, deadline)
+            if maximizing:
+                best = max(best, value)
+                alpha = max(alpha, value)
+            else:
+                best = min(best, value)
+                beta = min(beta, value)
+            if alpha >= beta:
+                break
+
+        if best <= original_alpha:
+            flag = UPPER
+        elif best >= original_beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table[key] = (best, flag)
+        return best
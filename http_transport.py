@@ -0,0 +1,98 @@
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import REGISTRY
+
+
+def endpoint_template(path):
+    """
+    Return a Riot API path with its IDs and names replaced by {}, so every request to the
+    same endpoint shares one metric: 'match/v5/matches/NA1_1' -> 'match/v5/matches/{}'.
+    """
+    parts = path.strip('/').split('/')
+    if 'lol' in parts:
+        parts = parts[parts.index('lol') + 1:]
+    # The first three segments name the API, version and resource; later ones are literal
+    # only for sub-resources such as by-puuid and ids
+    return '/'.join(parts[:3] + [part if part.startswith('by-') or part == 'ids' else '{}' for part in parts[3:]])
+
+
+class PooledTransport:
+    def __init__(self, pool_sizes=None, default_pool_size=10, timeout=10, metrics=REGISTRY):
+        """
+        A keep-alive requests session shared by the raw requests path and LolWatcher, so each
+        Riot host only pays for its TLS handshakes once per pooled connection.
+
+        :param pool_sizes: Dict mapping routing values (e.g. 'NA1', 'americas') to the number of
+                           connections kept open to that host.
+        :param default_pool_size: Connections kept open to any other host.
+        :param timeout: Seconds to wait for a response before giving up.
+        :param metrics: MetricsRegistry every response's latency and status is recorded in, by
+                        endpoint, as riot_http_latency_ms and riot_http_responses_total.
+        """
+        self.timeout = timeout
+        self.metrics = metrics
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=default_pool_size))
+        for routing_value, size in (pool_sizes or {}).items():
+            self.session.mount(f'https://{routing_value.lower()}.api.riotgames.com',
+                               HTTPAdapter(pool_connections=1, pool_maxsize=size))
+        self.session.hooks['response'].append(self._record)
+        self._lock = threading.Lock()
+        self._timings = {}
+
+    def _record(self, response, *args, **kwargs):
+        url = urlsplit(response.url)
+        host, elapsed = url.hostname, response.elapsed.total_seconds()
+        if self.metrics is not None:
+            endpoint = endpoint_template(url.path)
+            self.metrics.histogram('riot_http_latency_ms', endpoint=endpoint).observe(elapsed)
+            self.metrics.counter('riot_http_responses_total', endpoint=endpoint, status=response.status_code).inc()
+        with self._lock:
+            timing = self._timings.setdefault(host, {'requests': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+            timing['requests'] += 1
+            timing['total_seconds'] += elapsed
+            timing['max_seconds'] = max(timing['max_seconds'], elapsed)
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def attach(self, lol_watcher):
+        """Route a LolWatcher's requests through this transport's session."""
+        # riotwatcher creates a private session per BaseApi and offers no way to pass one in
+        lol_watcher._base_api._session = self.session
+
+    def _connections_opened(self):
+        opened = {}
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    opened[pool.host] = opened.get(pool.host, 0) + pool.num_connections
+        return opened
+
+    def stats(self):
+        """
+        Return per-host connection metrics.
+
+        :return: A dict keyed by host with request count, connections opened, and mean and
+                 max time to response headers in milliseconds.
+        """
+        opened = self._connections_opened()
+        with self._lock:
+            timings = {host: dict(timing) for host, timing in self._timings.items()}
+        stats = {}
+        for host in set(timings) | set(opened):
+            timing = timings.get(host, {'requests': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+            requests_made = timing['requests']
+            stats[host] = {
+                'requests': requests_made,
+                'connections_opened': opened.get(host, 0),
+                'mean_ms': 1000 * timing['total_seconds'] / requests_made if requests_made else 0.0,
+                'max_ms': 1000 * timing['max_seconds'],
+            }
+        return stats
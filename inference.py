@@ -1,8 +1,89 @@
+import numpy as np
+from confidence import z_score
+from draft_search import DraftSearch
+from matchup_index import MatchupIndex
+
+
 class InferenceEngine:
-    def __init__(self, data):
-        self.data = data  # This could be your preprocessed data
-    
-    def predict_champion_pick(self, current_team, available_champions):
-        # Implement the logic to predict the champion pick
-        # based on win rates and team composition
-        pass
+    def __init__(self, data, logit_scale=1.0, win_model=None):
+        self.data = data  # A MatchupIndex built from the Match table
+        # Converts summed draft deltas to log-odds; 1.0 is roughly calibrated on league.db
+        self.logit_scale = logit_scale
+        # A trained win_model.WinModel; when set it replaces the index for win probabilities
+        self.win_model = win_model
+
+    @classmethod
+    def from_db(cls, db_path='league.db'):
+        return cls(MatchupIndex.from_db(db_path))
+
+    @classmethod
+    def load(cls, path):
+        return cls(MatchupIndex.load(path))
+
+    @classmethod
+    def from_stats_store(cls, directory='stats_store', days=None, patch=None):
+        """Build an engine from a StatsStore's counts, optionally for a window of days or a patch."""
+        from stats_store import StatsStore
+        return cls(StatsStore(directory).index(days=days, patch=patch))
+
+    def rank_champion_picks(self, current_team, available_champions, enemy_team=(), role=None, confidence=None):
+        """
+        Rank available champions by predicted contribution to the team's win chance.
+
+        :param current_team: Allied champion IDs, or a dict mapping role to champion ID.
+        :param available_champions: Champion IDs that can still be picked.
+        :param enemy_team: Enemy champion IDs picked so far, in the same form as current_team.
+        :param role: The role being picked for, if known.
+        :param confidence: Rank by the lower bound of each score at this confidence level
+                           (e.g. 0.95) instead of the score itself.
+        :return: A list of (champion_id, score) tuples, best first.
+        """
+        candidates = np.asarray(available_champions, dtype=np.intp)
+        if len(candidates) == 0:
+            return []
+        z = z_score(confidence) if confidence else 0.0
+        scores = self.data.score(candidates, current_team, enemy_team, role, z=z)
+        order = np.argsort(-scores, kind='stable')
+        return list(zip(candidates[order].tolist(), scores[order].tolist()))
+
+    def predict_champion_pick(self, current_team, available_champions, enemy_team=(), role=None, confidence=None):
+        """Return the best champion to pick next, or None if none are available."""
+        ranking = self.rank_champion_picks(current_team, available_champions, enemy_team, role, confidence)
+        return ranking[0][0] if ranking else None
+
+    def search_champion_pick(self, current_team, available_champions, enemy_team=(), pick_order=None,
+                             time_budget=1.0, beam_width=8):
+        """
+        Return the best champion to pick next, looking ahead through the rest of the draft.
+
+        :param current_team: Allied champion IDs picked so far.
+        :param available_champions: Champion IDs that can still be picked by either team.
+        :param enemy_team: Enemy champion IDs picked so far.
+        :param pick_order: Remaining picks as a list of 'ally'/'enemy', starting with this one;
+                           defaults to alternating picks.
+        :param time_budget: Seconds the search may take before answering with its deepest result.
+        :param beam_width: Candidates expanded per pick.
+        :return: A champion ID, or None if none are available.
+        """
+        search = DraftSearch(self.data, beam_width=beam_width, time_budget=time_budget)
+        champion, _ = search.best_pick(current_team, enemy_team, available_champions, pick_order)
+        return champion
+
+    def predict_win_probabilities(self, drafts, chunk_size=65536):
+        """
+        Predict team 1's win probability for many complete drafts at once.
+
+        :param drafts: An N x 10 array of Champion IDs in minified.csv's column order
+                       (team1_top ... team2_support, without the win column).
+        :param chunk_size: Drafts scored per step, bounding temporary memory.
+        :return: A float32 array of N probabilities.
+        """
+        drafts = np.asarray(drafts)
+        if self.win_model is not None:
+            scorer = self.win_model.predict_proba
+        else:
+            scorer = lambda chunk: 1 / (1 + np.exp(-self.logit_scale * self.data.draft_scores(chunk)))
+        probabilities = np.empty(len(drafts), dtype=np.float32)
+        for start in range(0, len(drafts), chunk_size):
+            probabilities[start:start + chunk_size] = scorer(drafts[start:start + chunk_size])
+        return probabilities
@@ -0,0 +1,181 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from inference import InferenceEngine
+from matchup_index import MatchupIndex
+from metrics import MetricsRegistry
+
+
+class RecommendationService:
+    def __init__(self, engine, champion_names, metrics=None):
+        """
+        Draft recommendations from a resident InferenceEngine.
+
+        :param engine: The InferenceEngine to query; it is kept in memory for the service's life.
+        :param champion_names: List of champion names indexed by Champion table ID.
+        :param metrics: MetricsRegistry to record recommend_latency_ms in; the service gets its own
+                        when not given.
+        """
+        self.engine = engine
+        self.champion_names = champion_names
+        self.registry = metrics or MetricsRegistry()
+        self.latency = self.registry.histogram('recommend_latency_ms')
+        self.started = time.time()
+        self.warm = False
+
+    @classmethod
+    def load(cls, db_path='league.db', index_path='matchup_index.npz'):
+        """
+        Load the matchup index and warm it up. The index is rebuilt from db_path and saved when
+        it is missing or was built before matches were added to or removed from db_path.
+        """
+        fingerprint = match_fingerprint(db_path)
+        index = None
+        if os.path.exists(index_path):
+            with np.load(index_path) as data:
+                saved = data['source'].tolist() if 'source' in data else None
+            if saved == fingerprint:
+                index = MatchupIndex.load(index_path)
+        if index is None:
+            index = MatchupIndex.from_db(db_path)
+            index.save(index_path, source=np.array(fingerprint))
+        conn = sqlite3.connect(db_path)
+        champion_names = [name for _, name in conn.execute('SELECT id, name FROM Champion ORDER BY id')]
+        conn.close()
+        service = cls(InferenceEngine(index), champion_names)
+        service.warm_up()
+        return service
+
+    def warm_up(self):
+        """Run one full-size query so the first real request doesn't pay for first-touch costs."""
+        self.engine.rank_champion_picks([0], range(len(self.champion_names)), enemy_team=[1])
+        self.warm = True
+
+    def recommend(self, request):
+        """
+        Rank picks for a draft state.
+
+        :param request: Dict with current_team and optionally available_champions (defaults
+                        to every champion not yet picked), enemy_team, role, limit and confidence
+                        (rank by the lower bound of each score at that level, e.g. 0.95).
+        :return: Dict with the ranked champions and the time spent scoring.
+        """
+        start = time.perf_counter()
+        current_team = request.get('current_team', [])
+        enemy_team = request.get('enemy_team', [])
+        available = request.get('available_champions')
+        if available is None:
+            picked = set(_champions(current_team)) | set(_champions(enemy_team))
+            available = [c for c in range(len(self.champion_names)) if c not in picked]
+        for champion_id in [*_champions(current_team), *_champions(enemy_team), *available]:
+            # A negative ID would index the score arrays from the end and score another champion
+            if isinstance(champion_id, bool) or not isinstance(champion_id, int) or not 0 <= champion_id < len(self.champion_names):
+                raise ValueError(f'Unknown champion ID {champion_id!r}')
+        ranking = self.engine.rank_champion_picks(current_team, available, enemy_team, request.get('role'),
+                                                  request.get('confidence'))
+        ranking = ranking[:request.get('limit', 10)]
+        elapsed = time.perf_counter() - start
+        self.latency.observe(elapsed)
+        return {
+            'ranking': [
+                {'champion_id': champion_id, 'name': self.champion_names[champion_id], 'score': score}
+                for champion_id, score in ranking
+            ],
+            'latency_ms': elapsed * 1000,
+        }
+
+    def health(self):
+        return {
+            'status': 'ok' if self.warm else 'warming',
+            'warm': self.warm,
+            'champions': len(self.champion_names),
+            'uptime_s': time.time() - self.started,
+        }
+
+    def metrics(self):
+        return {'recommend_latency': self.latency.snapshot()}
+
+
+def match_fingerprint(db_path):
+    """Return [row count, largest rowid] of db_path's Match table; it changes whenever matches are added or removed."""
+    conn = sqlite3.connect(db_path)
+    try:
+        return list(conn.execute('SELECT COUNT(*), COALESCE(MAX(rowid), 0) FROM Match').fetchone())
+    finally:
+        conn.close()
+
+
+def _champions(team):
+    return team.values() if isinstance(team, dict) else team
+
+
+class RecommendationHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def _send(self, status, body, content_type='application/json'):
+        payload = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200 if self.service.warm else 503, self.service.health())
+        elif self.path == '/metrics':
+            self._send(200, self.service.metrics())
+        elif self.path == '/metrics/prometheus':
+            self._send(200, self.service.registry.to_prometheus(), 'text/plain; version=0.0.4')
+        else:
+            self._send(404, {'error': f'Unknown path {self.path}'})
+
+    def do_POST(self):
+        if self.path != '/recommend':
+            self._send(404, {'error': f'Unknown path {self.path}'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(request, dict):
+                raise ValueError('The request body must be a JSON object')
+            self._send(200, self.service.recommend(request))
+        except (ValueError, TypeError, KeyError, IndexError) as e:
+            self._send(400, {'error': str(e)})
+
+    def log_message(self, format, *args):
+        # Per-request access logs would cost more than the scoring itself
+        pass
+
+
+def make_server(service, host='127.0.0.1', port=8765):
+    """Create an HTTP server answering /recommend, /health, /metrics and /metrics/prometheus from `service`."""
+    handler = type('BoundRecommendationHandler', (RecommendationHandler,), {'service': service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve draft recommendations during champion select.')
+    parser.add_argument('--db', default='league.db')
+    parser.add_argument('--index', default='matchup_index.npz')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    service = RecommendationService.load(args.db, args.index)
+    server = make_server(service, args.host, args.port)
+    print(f"Serving recommendations on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
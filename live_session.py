@@ -0,0 +1,406 @@
+import argparse
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+import urllib3
+from match_store import MATCH_COLUMNS, ROLES, TEAM_POSITIONS, load_champion_ids
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# The game client serves its Live Client Data API here, over HTTPS with a Riot-signed certificate
+LIVE_CLIENT_URL = 'https://127.0.0.1:2999'
+TEAMS = {'ORDER': 0, 'CHAOS': 1}
+SLOTS = {(team, role): index for index, (team, role) in enumerate(
+    (team, role) for team in range(2) for role in ROLES)}
+SCORES = ['kills', 'deaths', 'assists', 'creepScore']
+# Objectives counted per team from the event feed
+OBJECTIVES = {'TurretKilled': 'turrets', 'InhibKilled': 'inhibitors', 'DragonKill': 'dragons',
+              'HeraldKill': 'heralds', 'BaronKill': 'barons'}
+# Changes worth fresh advice; creep score, levels and items move every few seconds and are only tracked
+MEANINGFUL_CHANGES = {'roster', 'kills', 'objectives', 'game_end'}
+
+
+class LiveClientSource:
+    def __init__(self, base_url=LIVE_CLIENT_URL, timeout=0.25, verify=False):
+        """
+        Polls the Live Client Data API of a running game.
+
+        Each poll asks for the player list, the game clock and only the events after the last
+        one seen, over one keep-alive connection.
+
+        :param base_url: Where the API is served; point it at make_stand_in_server's address in tests.
+        :param timeout: Seconds to wait for the client before treating the game as not running.
+        :param verify: Path to Riot's root certificate, or False to accept the client's certificate unchecked.
+        """
+        self.base_url = base_url.rstrip('/')
+        # urllib3 directly rather than a requests session: requests spends about a millisecond of
+        # CPU per call on hooks and cookie handling, several times the rest of the cycle
+        if verify is False:
+            # The client only listens on localhost, and a warning per poll would flood the log.
+            # The filter matches this host only, so unverified requests anywhere else still warn;
+            # catch_warnings() around each request would swap the process-wide filters under
+            # other threads.
+            warnings.filterwarnings('ignore', message=rf"Unverified HTTPS request is being made to host "
+                                                      rf"'{re.escape(urlsplit(self.base_url).hostname)}'",
+                                    category=urllib3.exceptions.InsecureRequestWarning)
+            tls = {'cert_reqs': 'CERT_NONE'}
+        else:
+            tls = {'cert_reqs': 'CERT_REQUIRED', 'ca_certs': verify}
+        self.pool = urllib3.PoolManager(maxsize=1, timeout=timeout, retries=False, **tls)
+
+    def _get(self, path, **params):
+        response = self.pool.request('GET', f'{self.base_url}/liveclientdata/{path}', fields=params)
+        if response.status != 200:
+            raise ValueError(f'{path} answered {response.status}')
+        return response.data
+
+    def poll(self, next_event_id=0, active_player=True):
+        """
+        Fetch the game's current state.
+
+        :param next_event_id: ID of the first event not seen yet.
+        :param active_player: Whether to ask for the local player's name, which is fixed for the game.
+        :return: Dict with the raw player list bytes (left unparsed so an unchanged list costs a
+                 bytes comparison), the active player's name, the game time and the new events;
+                 None when no game is running.
+        """
+        try:
+            players = self._get('playerlist')
+            game_time = json.loads(self._get('gamestats'))['gameTime']
+            events = json.loads(self._get('eventdata', eventID=next_event_id))['Events']
+        except (urllib3.exceptions.HTTPError, ValueError, KeyError):
+            return None
+        name = None
+        if active_player:
+            try:
+                name = json.loads(self._get('activeplayername')) or None
+            except (urllib3.exceptions.HTTPError, ValueError):
+                pass  # Spectating
+        return {'players': players, 'active_player': name, 'game_time': game_time, 'events': events}
+
+
+class LiveState:
+    __slots__ = ['game_time', 'champions', 'levels', 'scores', 'dead', 'objectives',
+                 'names', 'active_name', 'active_slot', 'next_event_id', 'players', 'ended']
+
+    def __init__(self):
+        """
+        The live match, in fixed-size arrays indexed by slot in Match table column order
+        (team1_top ... team2_support); team 1 is the blue side ('ORDER').
+        """
+        self.game_time = 0.0
+        self.champions = np.full(10, -1, dtype=np.int16)  # -1 until the champion is known
+        self.levels = np.zeros(10, dtype=np.int8)
+        self.scores = np.zeros((10, len(SCORES)), dtype=np.int16)
+        self.dead = np.zeros(10, dtype=bool)
+        self.objectives = np.zeros((2, len(OBJECTIVES)), dtype=np.int16)
+        self.names = {}  # Summoner and Riot ID names to slot, for attributing events
+        self.active_name = None
+        self.active_slot = None  # The local player's slot; None when spectating
+        self.next_event_id = 0
+        self.players = b''  # The raw player list last parsed
+        self.ended = False
+
+    @property
+    def team_kills(self):
+        return self.scores[:, 0].reshape(2, 5).sum(axis=1)
+
+    def draft(self):
+        """Return the champions as a Match table draft, or None until all ten are known."""
+        return None if (self.champions < 0).any() else self.champions.astype(np.intp)
+
+
+def _champion_name(player):
+    # rawChampionName holds the internal name match-v5 and the Champion table use ('MonkeyKing'
+    # rather than 'Wukong')
+    raw = player.get('rawChampionName', '')
+    return raw.rsplit('_', 1)[-1] if raw.startswith('game_character_displayname_') else player.get('championName', '')
+
+
+def _player_slots(players):
+    """Yield (slot, player), by position where the game reports one and by list order otherwise."""
+    listed = [0, 0]
+    for player in players:
+        team = TEAMS.get(player.get('team'))
+        if team is None:
+            continue
+        role = TEAM_POSITIONS.get(player.get('position'))
+        if role is None:
+            # Positions are blank outside matchmade games; the list is then in pick order
+            role = ROLES[min(listed[team], 4)]
+        listed[team] += 1
+        yield SLOTS[team, role], player
+
+
+def update_state(state, snapshot, champion_ids):
+    """
+    Apply a LiveClientSource.poll result to state.
+
+    The player list is only parsed when its bytes differ from the last one, and only events
+    after state.next_event_id are read, so an unchanged game costs a few comparisons.
+
+    :param champion_ids: Dict mapping lower-cased champion names to Champion table IDs.
+    :return: The set of changes: 'roster', 'kills', 'dead', 'scores', 'levels', 'objectives', 'game_end'.
+    """
+    changes = set()
+    state.game_time = snapshot['game_time']
+    if snapshot['players'] != state.players:
+        state.players = snapshot['players']
+        champions, levels = np.full(10, -1, dtype=np.int16), np.zeros(10, dtype=np.int8)
+        scores, dead = np.zeros((10, len(SCORES)), dtype=np.int16), np.zeros(10, dtype=bool)
+        names = {}
+        for slot, player in _player_slots(json.loads(state.players)):
+            champions[slot] = champion_ids.get(_champion_name(player).lower(), -1)
+            levels[slot] = player.get('level', 0)
+            scores[slot] = [player.get('scores', {}).get(score, 0) for score in SCORES]
+            dead[slot] = player.get('isDead', False)
+            for key in ['summonerName', 'riotIdGameName', 'riotId']:
+                if player.get(key):
+                    names[player[key]] = slot
+        for change, old, new in [('roster', state.champions, champions), ('levels', state.levels, levels),
+                                 ('dead', state.dead, dead), ('scores', state.scores, scores)]:
+            if not np.array_equal(old, new):
+                changes.add(change)
+        if not np.array_equal(state.team_kills, scores[:, 0].reshape(2, 5).sum(axis=1)):
+            changes.add('kills')
+        state.champions, state.levels, state.scores, state.dead, state.names = champions, levels, scores, dead, names
+    state.active_name = state.active_name or snapshot.get('active_player')
+    if state.active_name is not None:
+        active_slot = state.names.get(state.active_name)
+        if active_slot != state.active_slot:
+            state.active_slot = active_slot
+            changes.add('roster')
+    for event in snapshot['events']:
+        if event['EventID'] < state.next_event_id:
+            continue
+        state.next_event_id = event['EventID'] + 1
+        name = event.get('EventName')
+        if name in OBJECTIVES:
+            team = _objective_team(event, state.names)
+            if team is not None:
+                state.objectives[team, list(OBJECTIVES).index(name)] += 1
+                changes.add('objectives')
+        elif name == 'GameEnd':
+            state.ended = True
+            changes.add('game_end')
+    return changes
+
+
+def _objective_team(event, names):
+    """Return the team (0 or 1) credited with an objective event, or None if it can't be told."""
+    # Structures are named for the team that owned them ('Turret_T1_L_03_A' is blue's), and may
+    # fall to minions, so their killer's name says nothing
+    structure = event.get('TurretKilled') or event.get('InhibKilled')
+    if structure:
+        return 1 if '_T1_' in structure else 0 if '_T2_' in structure else None
+    slot = names.get(event.get('KillerName'))
+    return None if slot is None else slot // 5
+
+
+class LiveSession:
+    def __init__(self, engine, champion_ids, source=None, interval=0.5, on_advice=None, metrics=REGISTRY):
+        """
+        Follows a running game and advises from a resident InferenceEngine as it changes.
+
+        Each cycle polls the client, diffs the result against the LiveState and, on a
+        meaningful change (see MEANINGFUL_CHANGES), builds fresh advice. The engine only scores
+        drafts, so its answers are cached per roster and recomputed when the roster changes.
+
+        :param engine: The InferenceEngine to query; it is kept in memory for the session's life.
+        :param champion_ids: Dict mapping lower-cased champion names to Champion table IDs.
+        :param source: A LiveClientSource, or anything with its poll method; defaults to the local client.
+        :param interval: Seconds between polls.
+        :param on_advice: Called with each advice dict; by default advice is logged.
+        :param metrics: MetricsRegistry each cycle's CPU time is recorded in as live_cycle_cpu_ms.
+        """
+        self.engine = engine
+        self.champion_ids = champion_ids
+        self.source = source or LiveClientSource()
+        self.interval = interval
+        self.on_advice = on_advice or (lambda advice: logger.info("Live advice: %s", advice))
+        self.metrics = metrics
+        self.state = LiveState()
+        self.advice = None
+        self._draft_key = None
+        self._draft_advice = {}
+        self._thread = None
+        self._stop = threading.Event()
+        if metrics is not None:
+            self.cycle_cpu = metrics.histogram('live_cycle_cpu_ms')
+
+    def _draft(self):
+        """Return the engine's view of the current roster, querying it only when the roster changed."""
+        state = self.state
+        key = (state.champions.tobytes(), state.active_slot)
+        if key == self._draft_key:
+            return self._draft_advice
+        draft = state.draft()
+        advice = {'win_probability': None, 'pick_score': None}
+        if draft is not None:
+            team = 0 if state.active_slot is None else state.active_slot // 5
+            team1_probability = float(self.engine.predict_win_probabilities(draft[None, :])[0])
+            advice['win_probability'] = team1_probability if team == 0 else 1 - team1_probability
+            if state.active_slot is not None:
+                # How the player's own champion scores with its allies and against the enemies
+                allies = {ROLES[slot % 5]: int(draft[slot]) for slot in range(team * 5, team * 5 + 5)}
+                enemies = {ROLES[slot % 5]: int(draft[slot]) for slot in range((1 - team) * 5, (2 - team) * 5)}
+                role = ROLES[state.active_slot % 5]
+                champion = allies.pop(role)
+                advice['pick_score'] = self.engine.rank_champion_picks(allies, [champion], enemies, role)[0][1]
+        self._draft_key, self._draft_advice = key, advice
+        return advice
+
+    def _advise(self, changes, events):
+        state = self.state
+        return {
+            'game_time': state.game_time,
+            'changes': sorted(changes),
+            'team': None if state.active_slot is None else MATCH_COLUMNS[1 + state.active_slot].split('_')[0],
+            **self._draft(),
+            'kills': state.team_kills.tolist(),
+            'objectives': {name: state.objectives[:, i].tolist() for i, name in enumerate(OBJECTIVES.values())},
+            'events': [event['EventName'] for event in events],
+        }
+
+    def _reset(self):
+        self.state, self.advice, self._draft_key = LiveState(), None, None
+
+    def step(self):
+        """
+        Run one poll, diff and advise cycle.
+
+        :return: The new advice, or None if nothing meaningful changed or no game is running.
+        """
+        start = time.thread_time()
+        state = self.state
+        snapshot = self.source.poll(state.next_event_id, state.active_name is None)
+        if snapshot is not None and snapshot['game_time'] < state.game_time:
+            # A new game started since the last poll; its events start again from 0
+            self._reset()
+            snapshot = self.source.poll()
+        advice = None
+        if snapshot is None:
+            if state.next_event_id or state.players:
+                self._reset()
+        else:
+            changes = update_state(self.state, snapshot, self.champion_ids)
+            if changes & MEANINGFUL_CHANGES:
+                advice = self.advice = self._advise(changes, snapshot['events'])
+        # CPU rather than wall time, since the cycle mostly waits on the client
+        if self.metrics is not None:
+            self.cycle_cpu.observe(time.thread_time() - start)
+        if advice is not None:
+            self.on_advice(advice)
+        return advice
+
+    def run(self):
+        """Poll every interval until stop() is called."""
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.step()
+            except Exception as e:
+                logger.warning("Live session cycle failed: %s", e)
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name='live-session', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+
+class StandInGame:
+    def __init__(self, players=(), active_player=None):
+        """
+        A scripted game for make_stand_in_server to serve in place of the game client.
+        Tests change players, game_time and events between polls.
+
+        :param players: Player dicts as the playerlist endpoint returns them.
+        :param active_player: The local player's summoner name.
+        """
+        self.players = list(players)
+        self.active_player = active_player
+        self.game_time = 0.0
+        self.events = []
+
+    def add_event(self, name, **fields):
+        self.events.append({'EventID': len(self.events), 'EventName': name, 'EventTime': self.game_time, **fields})
+
+    def respond(self, path, query):
+        if path == 'playerlist':
+            return self.players
+        if path == 'activeplayername':
+            return self.active_player
+        if path == 'gamestats':
+            return {'gameMode': 'CLASSIC', 'gameTime': self.game_time, 'mapName': 'Map11'}
+        if path == 'eventdata':
+            return {'Events': self.events[int(query.get('eventID', 0)):]}
+        return None
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    game = None
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes, which Nagle's algorithm would hold up per request
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        body = self.game.respond(url.path.rsplit('/', 1)[-1], query)
+        payload = json.dumps(body).encode()
+        self.send_response(404 if body is None else 200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_stand_in_server(game, host='127.0.0.1', port=0):
+    """Create a plain HTTP server answering /liveclientdata/... from a StandInGame."""
+    handler = type('BoundStandInHandler', (StandInHandler,), {'game': game})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    from inference_engine import RecommendationService
+
+    parser = argparse.ArgumentParser(description='Advise from the draft model while a game is running.')
+    parser.add_argument('--db', default='league.db')
+    parser.add_argument('--index', default='matchup_index.npz')
+    parser.add_argument('--url', default=LIVE_CLIENT_URL)
+    parser.add_argument('--interval', type=float, default=0.5)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    engine = RecommendationService.load(args.db, args.index).engine
+    conn = sqlite3.connect(args.db)
+    champion_ids = load_champion_ids(conn)
+    conn.close()
+    session = LiveSession(engine, champion_ids, LiveClientSource(args.url), args.interval)
+    try:
+        session.run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
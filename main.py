@@ -1,34 +1,55 @@
 
-from api_client import RiotAPIClient
-from data_collector import DataCollector
+import logging
+from crawler import CrawlOrchestrator
 from inference import InferenceEngine
+from response_cache import ResponseCache
+from http_transport import PooledTransport
+from match_store import MatchStore
+from puuid_resolver import PuuidCache
+from metrics import REGISTRY
+from profiler import SamplingProfiler, install_toggle_signal
 from config import RIOT_API_KEY
 
 
 def main():
-    # Initialize the Riot API client with your API key
-    api_client = RiotAPIClient(RIOT_API_KEY)
-    data_collector = DataCollector(api_client)
-
-    # Define the parameters for the division and number of matches
-    num_matches_per_puuid = 10  # Number of matches to fetch per PUUID
-    division = 'I'
-    tier = 'BRONZE'
-    queue = 'RANKED_SOLO_5x5'
-    num_summoners = 10  # Number of summoners to fetch PUUIDs for
-
-    # Fetch league entries to get summoner names
-    league_entries = api_client.get_league_entries(queue, tier, division, page=1)
-
-    # Fetch PUUIDs for the summoner names
-    puuids = [api_client.get_summoner_puuid(entry['summonerName']) for entry in league_entries[:num_summoners]]
-
-    # Fetch and store match details for the PUUIDs
-    data_collector.collect_match_data(puuids, num_matches_per_puuid)
-
-    # Save match data to a CSV file
-    data_collector.match_data.to_csv('match_data.csv', index=False)
-    print("Match data saved to match_data.csv.")
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    # `kill -USR1 <pid>` starts sampling the crawl; a second one stops and writes profile.folded
+    install_toggle_signal(SamplingProfiler())
+    # Responses are cached on disk so re-runs cost almost no API quota
+    response_cache = ResponseCache('response_cache.db')
+    # Players resolved on earlier crawls are not looked up again
+    puuid_cache = PuuidCache('puuid_cache.db')
+    transport = PooledTransport(pool_sizes={'NA1': 4, 'EUW1': 4, 'KR': 4, 'americas': 10, 'europe': 10, 'asia': 10})
+
+    # Every (platform, tier, division, page) shard is crawled concurrently; each platform and
+    # regional route spends its own rate-limit quota
+    orchestrator = CrawlOrchestrator(
+        RIOT_API_KEY,
+        platforms=['NA1', 'EUW1', 'KR'],
+        tiers=['BRONZE', 'SILVER', 'GOLD', 'PLATINUM'],
+        divisions=['I', 'II', 'III', 'IV'],
+        pages=[1],
+        queue='RANKED_SOLO_5x5',
+        players_per_shard=10,  # Number of players per page to fetch match lists for
+        cache=response_cache,
+        transport=transport,
+        puuid_cache=puuid_cache,
+    )
+
+    # Match details are stored in the Match table as they arrive. Re-running after an
+    # interruption picks up the matches that were still queued.
+    match_store = MatchStore('league.db')
+    orchestrator.crawl(match_store, num_matches=10)  # Number of matches to fetch per PUUID
+    match_store.close()
+    puuid_cache.close()
+    report = orchestrator.report()
+    for shard, stats in report['shards'].items():
+        print(f"{shard}: {stats['new_match_ids']} new match IDs in {stats['seconds']:.1f}s")
+    for platform, stats in report['platforms'].items():
+        print(f"{platform}: {stats['stored']} matches stored")
+    print(f"Response cache: {response_cache.stats()}")
+    print(f"Connections: {transport.stats()}")
+    REGISTRY.write('crawl_metrics.prom')
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
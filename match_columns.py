@@ -0,0 +1,187 @@
+import numbers
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+from match_store import MATCH_COLUMNS, encode_rank, extract_match_fields
+
+# On-disk dtype of each column; champions holds the ten Champion IDs per match
+COLUMN_DTYPES = {
+    'match_id': np.dtype('S24'),
+    'team1_win': np.dtype(np.int8),
+    'champions': np.dtype(np.int16),
+    'patch': np.dtype(np.int16),
+    'game_creation': np.dtype(np.int64),
+    'game_duration': np.dtype(np.int32),
+    'tier': np.dtype(np.int8),
+    'division': np.dtype(np.int8),
+}
+# Columns extract_match_fields cannot fill in from a payload; they stay 0 (unknown) for those
+OPTIONAL_COLUMNS = ['tier', 'division']
+
+
+def to_epoch_ms(value):
+    """Return epoch milliseconds for a datetime, date string or epoch-millisecond number; naive times are UTC."""
+    # pd.Timestamp would read a bare number as nanoseconds
+    if isinstance(value, numbers.Real) and not isinstance(value, bool):
+        return int(value)
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize('UTC')
+    return timestamp.value // 1_000_000
+
+
+class MatchColumns:
+    def __init__(self, capacity=1024):
+        """
+        Typed, column-oriented store of projected matches, holding a few dozen bytes per match
+        instead of the full match-v5 payload.
+
+        :param capacity: Number of matches to allocate room for up front; grows as needed.
+        """
+        self.size = 0
+        self._columns = {
+            name: np.zeros((capacity, 10) if name == 'champions' else capacity, dtype=dtype)
+            for name, dtype in COLUMN_DTYPES.items()
+        }
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, name):
+        return self._columns[name][:self.size]
+
+    def _reserve(self, count):
+        capacity = len(self._columns['team1_win'])
+        if self.size + count <= capacity:
+            return
+        capacity = max(capacity * 2, self.size + count)
+        for name, column in self._columns.items():
+            grown = np.zeros((capacity,) + column.shape[1:], dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self._columns[name] = grown
+
+    def append(self, fields):
+        """Append one match, given as a dict from extract_match_fields."""
+        self._reserve(1)
+        for name, column in self._columns.items():
+            column[self.size] = fields.get(name, 0) if name in OPTIONAL_COLUMNS else fields[name]
+        self.size += 1
+
+    def append_payload(self, match_info, champion_ids):
+        """
+        Project a match-v5 payload and append it, dropping the payload itself.
+
+        :return: True if the match could be projected and was appended.
+        """
+        fields = extract_match_fields(match_info, champion_ids)
+        if fields is None:
+            return False
+        self.append(fields)
+        return True
+
+    def take(self, selection):
+        """Return a new MatchColumns holding the matches picked by a boolean mask or index array."""
+        taken = MatchColumns(capacity=0)
+        taken._columns = {name: np.ascontiguousarray(self[name][selection]) for name in COLUMN_DTYPES}
+        taken.size = len(taken._columns['team1_win'])
+        return taken
+
+    @classmethod
+    def from_db(cls, db_path='league.db', start=None, end=None, patch=None, tier=None, division=None,
+                chunk_size=100000):
+        """
+        Load the stored matches inside a window without reading the rest of the Match table.
+
+        The filters run against MatchInfo's indexes on (game_creation), (patch, game_creation),
+        (tier, division, patch, game_creation) and (tier, division, game_creation), so SQLite
+        reads only the matching index range.
+        Matches stored without a MatchInfo row are never returned.
+
+        :param start: Earliest game creation, inclusive; a datetime, date string or epoch ms.
+        :param end: Latest game creation, exclusive.
+        :param patch: A patch as encoded by match_store.parse_patch, e.g. 1401 for 14.1.
+        :param tier: A tier such as 'GOLD'.
+        :param division: A division such as 'II'; only meaningful together with tier.
+        """
+        conditions, params = [], []
+        tier, division = encode_rank(tier, division)
+        for column, value in [('tier', tier), ('division', division), ('patch', patch)]:
+            if value:
+                conditions.append(f'MatchInfo.{column} = ?')
+                params.append(value)
+        if start is not None:
+            conditions.append('MatchInfo.game_creation >= ?')
+            params.append(to_epoch_ms(start))
+        if end is not None:
+            conditions.append('MatchInfo.game_creation < ?')
+            params.append(to_epoch_ms(end))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        columns = ', '.join(f'Match.{column}' for column in MATCH_COLUMNS)
+        query = (f'SELECT MatchInfo.id, {columns}, MatchInfo.patch, MatchInfo.game_creation, '
+                 'MatchInfo.game_duration, MatchInfo.tier, MatchInfo.division '
+                 f'FROM MatchInfo JOIN Match ON Match.id = MatchInfo.id {where}')
+        store = cls(capacity=0)
+        conn = sqlite3.connect(db_path)
+        try:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                store._reserve(len(rows))
+                numbers = np.array([row[1:] for row in rows], dtype=np.int64)
+                block = slice(store.size, store.size + len(rows))
+                store._columns['match_id'][block] = [row[0] for row in rows]
+                store._columns['team1_win'][block] = numbers[:, 0]
+                store._columns['champions'][block] = numbers[:, 1:len(MATCH_COLUMNS)]
+                for i, name in enumerate(['patch', 'game_creation', 'game_duration', 'tier', 'division']):
+                    store._columns[name][block] = numbers[:, len(MATCH_COLUMNS) + i]
+                store.size += len(rows)
+        finally:
+            conn.close()
+        return store
+
+    def to_dataframe(self):
+        """Return the matches as a DataFrame with minified.csv's columns plus match metadata."""
+        champions = self['champions']
+        data = {'matchId': self['match_id'].astype(str), 'team1_win': self['team1_win']}
+        for i, column in enumerate(MATCH_COLUMNS[1:]):
+            data[column] = champions[:, i]
+        data['patch'] = self['patch']
+        data['gameCreation'] = self['game_creation']
+        data['gameDuration'] = self['game_duration']
+        data['tier'] = self['tier']
+        data['division'] = self['division']
+        return pd.DataFrame(data)
+
+    def save(self, directory):
+        """Write each column as a .npy file so it can be loaded back memory-mapped."""
+        os.makedirs(directory, exist_ok=True)
+        for name in COLUMN_DTYPES:
+            np.save(os.path.join(directory, f'{name}.npy'), self[name])
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """
+        Load columns written by save.
+
+        :param mmap_mode: Passed to np.load; the default maps the files read-only instead of
+                          reading them into memory. Use None to load a growable copy.
+        """
+        store = cls(capacity=0)
+        for name in COLUMN_DTYPES:
+            path = os.path.join(directory, f'{name}.npy')
+            if name in OPTIONAL_COLUMNS and not os.path.exists(path):
+                continue
+            store._columns[name] = np.load(path, mmap_mode=mmap_mode)
+        store.size = len(store._columns['team1_win'])
+        for name in OPTIONAL_COLUMNS:
+            # Saved before the column existed
+            if len(store._columns[name]) != store.size:
+                store._columns[name] = np.zeros(store.size, dtype=COLUMN_DTYPES[name])
+        return store
+
+    def to_parquet(self, path):
+        """Write the matches to a Parquet file (requires pyarrow or fastparquet)."""
+        self.to_dataframe().to_parquet(path, index=False)
@@ -0,0 +1,244 @@
+import sqlite3
+
+# Match table columns, in the same order as minified.csv
+MATCH_COLUMNS = [
+    'team1_win',
+    'team1_top', 'team1_jungle', 'team1_mid', 'team1_adc', 'team1_support',
+    'team2_top', 'team2_jungle', 'team2_mid', 'team2_adc', 'team2_support',
+]
+ROLES = ['top', 'jungle', 'mid', 'adc', 'support']
+# match-v5 teamPosition values mapped to the roles used in the Match table
+TEAM_POSITIONS = {'TOP': 'top', 'JUNGLE': 'jungle', 'MIDDLE': 'mid', 'BOTTOM': 'adc', 'UTILITY': 'support'}
+BLUE_TEAM_ID = 100
+# Ranked tiers and divisions, stored in MatchInfo as small integers; 0 means unknown
+TIER_CODES = {tier: code for code, tier in enumerate(
+    ['IRON', 'BRONZE', 'SILVER', 'GOLD', 'PLATINUM', 'EMERALD', 'DIAMOND', 'MASTER', 'GRANDMASTER', 'CHALLENGER'], 1)}
+DIVISION_CODES = {'I': 1, 'II': 2, 'III': 3, 'IV': 4}
+RANK_COLUMNS = [('tier', 'INTEGER NOT NULL DEFAULT 0'), ('division', 'INTEGER NOT NULL DEFAULT 0')]
+MATCH_INFO_INDEXES = {
+    'MatchInfo_time': 'game_creation',
+    'MatchInfo_patch': 'patch, game_creation',
+    'MatchInfo_rank': 'tier, division, patch, game_creation',
+    # Per-elo time windows without a patch would otherwise scan every row of the division
+    'MatchInfo_rank_time': 'tier, division, game_creation',
+}
+
+
+def load_champion_ids(conn):
+    """Map lower-cased champion names to Champion table IDs."""
+    return {name.lower(): champion_id for champion_id, name in conn.execute('SELECT id, name FROM Champion')}
+
+
+def encode_rank(tier=None, division=None):
+    """
+    Encode a tier and division such as ('GOLD', 'II') as MatchInfo's (tier, division) codes.
+
+    Either may already be a code, or None for unknown (0).
+    """
+    if isinstance(tier, str):
+        tier = TIER_CODES[tier.upper()]
+    if isinstance(division, str):
+        division = DIVISION_CODES[division.upper()]
+    return tier or 0, division or 0
+
+
+def _add_columns(conn, table, columns):
+    """Add columns missing from a table created by an older version of this module."""
+    existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    for name, definition in columns:
+        if name not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+
+
+def parse_patch(game_version):
+    """Encode a gameVersion such as '14.1.555.5828' as major * 100 + minor (1401), or 0 if unknown."""
+    parts = str(game_version or '').split('.')
+    try:
+        return int(parts[0]) * 100 + int(parts[1])
+    except (IndexError, ValueError):
+        return 0
+
+
+def extract_match_fields(match_info, champion_ids):
+    """
+    Project a match-v5 payload down to the fields used at ingest time.
+
+    :param match_info: A match-v5 MatchDto.
+    :param champion_ids: Dict from load_champion_ids.
+    :return: A dict with match_id, team1_win, champions (Champion IDs in Match table column
+             order), patch, game_creation (epoch ms) and game_duration (seconds), or None if the
+             match does not have exactly one known champion per role on each team.
+    """
+    info = match_info.get('info', {})
+    participants = info.get('participants', [])
+    if len(participants) != 10:
+        return None
+    picks = {}
+    team1_win = None
+    for participant in participants:
+        role = TEAM_POSITIONS.get(participant.get('teamPosition'))
+        champion_id = champion_ids.get(str(participant.get('championName', '')).lower())
+        team = 'team1' if participant.get('teamId') == BLUE_TEAM_ID else 'team2'
+        if role is None or champion_id is None:
+            return None
+        picks[f'{team}_{role}'] = champion_id
+        if team == 'team1':
+            team1_win = int(bool(participant.get('win')))
+    if len(picks) != 10:
+        return None
+    return {
+        'match_id': match_info['metadata']['matchId'],
+        'team1_win': team1_win,
+        'champions': tuple(picks[column] for column in MATCH_COLUMNS[1:]),
+        'patch': parse_patch(info.get('gameVersion')),
+        'game_creation': info.get('gameCreation', 0),
+        'game_duration': info.get('gameDuration', 0),
+    }
+
+
+def extract_match_row(match_info, champion_ids):
+    """
+    Project a match-v5 payload down to a Match table row.
+
+    :return: A (match_id, team1_win, team1_top, ..., team2_support) tuple, or None if the match
+             cannot be stored in the Match table's layout.
+    """
+    fields = extract_match_fields(match_info, champion_ids)
+    if fields is None:
+        return None
+    return (fields['match_id'], fields['team1_win']) + fields['champions']
+
+
+class MatchStore:
+    def __init__(self, db_path='league.db', batch_size=100, max_attempts=3, check_same_thread=True, busy_timeout=30):
+        """
+        Writes crawled matches straight into the Match table and tracks the crawl frontier, the
+        match IDs discovered but not yet stored, so an interrupted crawl resumes where it stopped.
+
+        :param db_path: Path to the SQLite database holding the Match and Champion tables.
+        :param batch_size: Number of matches written per transaction.
+        :param max_attempts: Failed fetches after which a match ID is given up on.
+        :param check_same_thread: Passed to sqlite3.connect; False lets a store opened on one
+                                  thread be used by another, one thread at a time.
+        :param busy_timeout: Seconds to wait for another connection's write to finish before
+                             failing with 'database is locked'.
+        """
+        self.db_path = db_path
+        # A crawl writes through one store per platform besides the main one; the busy timeout
+        # queues their writes behind each other instead of failing. The journal mode is left as
+        # it is, since WAL is a persistent setting of the database file and other tools read it.
+        self.conn = sqlite3.connect(db_path, timeout=busy_timeout, check_same_thread=check_same_thread)
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS CrawlFrontier ('
+            "match_id TEXT PRIMARY KEY, status TEXT NOT NULL DEFAULT 'pending', "
+            'attempts INTEGER NOT NULL DEFAULT 0)'
+        )
+        # The rank of the ladder page a match was discovered from, carried over to MatchInfo
+        _add_columns(self.conn, 'CrawlFrontier', RANK_COLUMNS)
+        self.conn.execute('CREATE INDEX IF NOT EXISTS CrawlFrontier_status ON CrawlFrontier (status)')
+        # Per-match metadata the Match table has no columns for; matches stored before this
+        # table existed simply have no row here
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS MatchInfo ('
+            'id TEXT PRIMARY KEY, game_creation INTEGER NOT NULL, patch INTEGER NOT NULL)'
+        )
+        _add_columns(self.conn, 'MatchInfo', [('game_duration', 'INTEGER NOT NULL DEFAULT 0')] + RANK_COLUMNS)
+        # Filters by time, patch and rank are range scans over these instead of full table scans
+        for name, columns in MATCH_INFO_INDEXES.items():
+            self.conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON MatchInfo ({columns})')
+        self.conn.commit()
+        self.champion_ids = load_champion_ids(self.conn)
+        self._rows = []
+        self._info = []
+        self._skipped = []
+        self._failed = []
+
+    def enqueue(self, match_ids, tier=None, division=None):
+        """
+        Add match IDs to the frontier, skipping those already stored or already queued.
+
+        :param tier: The tier of the players the matches were found through, e.g. 'GOLD'; stored
+                     with each match so it can be filtered by rank.
+        :param division: Their division, e.g. 'II'.
+        :return: The number of newly queued match IDs.
+        """
+        tier, division = encode_rank(tier, division)
+        before = self.conn.total_changes
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO CrawlFrontier (match_id, tier, division) '
+            'SELECT ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM Match WHERE id = ?)',
+            [(match_id, tier, division, match_id) for match_id in match_ids],
+        )
+        self.conn.commit()
+        return self.conn.total_changes - before
+
+    def pending(self, limit=None, platforms=None):
+        """
+        Return queued match IDs in the order they were discovered.
+
+        :param platforms: Only return IDs of these platforms (e.g. ['NA1']), which match IDs
+                          start with; None returns every platform's.
+        """
+        query = "SELECT match_id FROM CrawlFrontier WHERE status = 'pending'"
+        params = []
+        if platforms is not None:
+            # _ is a LIKE wildcard, so it is escaped to match the literal separator
+            conditions = ["match_id LIKE ? ESCAPE '\\'"] * len(platforms)
+            query += f" AND ({' OR '.join(conditions) or '0'})"
+            params = [f'{platform.upper()}\\_%' for platform in platforms]
+        query += ' ORDER BY rowid'
+        if limit is not None:
+            query += f' LIMIT {int(limit)}'
+        return [row[0] for row in self.conn.execute(query, params)]
+
+    def has_match(self, match_id):
+        return self.conn.execute('SELECT 1 FROM Match WHERE id = ?', (match_id,)).fetchone() is not None
+
+    def add_match(self, match_id, match_info):
+        """
+        Buffer a fetched match for storage, writing the buffer once it reaches batch_size.
+
+        :return: True if the match could be stored in the Match table's layout.
+        """
+        fields = extract_match_fields(match_info, self.champion_ids) if match_info else None
+        if fields is None:
+            self._skipped.append((match_id,))
+        else:
+            self._rows.append((fields['match_id'], fields['team1_win']) + fields['champions'])
+            self._info.append((fields['match_id'], fields['game_creation'], fields['patch'], fields['game_duration']))
+        if len(self._rows) + len(self._skipped) >= self.batch_size:
+            self.flush()
+        return fields is not None
+
+    def mark_failed(self, match_id):
+        """Record a failed fetch; the match ID stays queued until it has failed max_attempts times."""
+        self._failed.append((self.max_attempts, match_id))
+
+    def flush(self):
+        """Write buffered matches and frontier updates in one transaction."""
+        with self.conn:
+            placeholders = ', '.join('?' * (len(MATCH_COLUMNS) + 1))
+            self.conn.executemany(
+                f"INSERT OR IGNORE INTO Match (id, {', '.join(MATCH_COLUMNS)}) VALUES ({placeholders})", self._rows)
+            # Must run before the frontier rows holding each match's rank are deleted
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO MatchInfo (id, game_creation, patch, game_duration, tier, division) '
+                'SELECT ?1, ?2, ?3, ?4, COALESCE(MAX(tier), 0), COALESCE(MAX(division), 0) '
+                'FROM CrawlFrontier WHERE match_id = ?1', self._info)
+            self.conn.executemany('DELETE FROM CrawlFrontier WHERE match_id = ?', [(row[0],) for row in self._rows])
+            self.conn.executemany("UPDATE CrawlFrontier SET status = 'skipped' WHERE match_id = ?", self._skipped)
+            self.conn.executemany(
+                'UPDATE CrawlFrontier SET attempts = attempts + 1, '
+                "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE status END WHERE match_id = ?",
+                self._failed,
+            )
+        self._rows, self._info, self._skipped, self._failed = [], [], [], []
+
+    def count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM Match').fetchone()[0]
+
+    def close(self):
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,212 @@
+import numpy as np
+from champion_stats import NUM_CHAMPIONS, load_match_matrix, match_matrix
+from match_store import ROLES
+
+COUNT_ARRAYS = [
+    'champion_wins', 'champion_games',
+    'synergy_wins', 'synergy_games',
+    'counter_wins', 'counter_games',
+]
+
+DELTA_ARRAYS = [
+    'champion_delta', 'synergy_delta', 'counter_delta',
+    'role_champion_delta', 'role_synergy_delta', 'role_counter_delta',
+]
+
+
+class MatchupIndex:
+    def __init__(self, num_champions=NUM_CHAMPIONS, prior_games=10, deltas=True):
+        """
+        Dense win/game counts for every champion, same-team pair and cross-team pair, by role.
+
+        champion_* arrays are indexed [role, champion], synergy_* [role_a, role_b, a, b] for a and
+        b on the same team, and counter_* [role_a, role_b, a, b] for a facing b. Wins are counted
+        from a's side. The *_delta arrays hold smoothed win rates minus 0.5, so scoring a pick
+        is a handful of array lookups.
+
+        :param num_champions: Number of rows in the Champion table.
+        :param prior_games: Games of 50% win rate blended into every rate, so pairs seen a
+                            handful of times stay close to neutral.
+        :param deltas: Whether to keep the *_delta arrays; an index that is only summed into
+                       others (see combine) can skip them and hold just the counts.
+        """
+        self.num_champions = num_champions
+        self.prior_games = prior_games
+        self.deltas = deltas
+        roles, n = len(ROLES), num_champions
+        self.champion_wins = np.zeros((roles, n), dtype=np.int32)
+        self.champion_games = np.zeros((roles, n), dtype=np.int32)
+        self.synergy_wins = np.zeros((roles, roles, n, n), dtype=np.int32)
+        self.synergy_games = np.zeros((roles, roles, n, n), dtype=np.int32)
+        self.counter_wins = np.zeros((roles, roles, n, n), dtype=np.int32)
+        self.counter_games = np.zeros((roles, roles, n, n), dtype=np.int32)
+        self._compute_deltas()
+
+    @classmethod
+    def from_db(cls, db_path='league.db', **kwargs):
+        index = cls(**kwargs)
+        index.update(load_match_matrix(db_path))
+        return index
+
+    @classmethod
+    def combine(cls, indexes, num_champions=NUM_CHAMPIONS, prior_games=10):
+        """Return a new index holding the summed counts of `indexes`, which may be a generator."""
+        combined = cls(num_champions=num_champions, prior_games=prior_games)
+        for index in indexes:
+            for name in COUNT_ARRAYS:
+                getattr(combined, name)[...] += getattr(index, name)
+        combined._compute_deltas()
+        return combined
+
+    def update(self, matches):
+        """
+        Add a batch of matches to the counts.
+
+        :param matches: Anything accepted by champion_stats.match_matrix.
+        """
+        matrix = match_matrix(matches)
+        if len(matrix) == 0:
+            return
+        n = self.num_champions
+        champions = matrix[:, 1:].astype(np.intp)
+        team1_win = matrix[:, 0].astype(np.float64)
+        # Win flag of the team each of the ten columns belongs to
+        column_win = np.repeat(np.column_stack([team1_win, 1 - team1_win]), len(ROLES), axis=1)
+        for i in range(10):
+            role_i = i % len(ROLES)
+            self.champion_games[role_i] += np.bincount(champions[:, i], minlength=n).astype(np.int32)
+            self.champion_wins[role_i] += np.bincount(champions[:, i], weights=column_win[:, i], minlength=n).astype(np.int32)
+            for j in range(10):
+                if i == j:
+                    continue
+                role_j = j % len(ROLES)
+                pairs = champions[:, i] * n + champions[:, j]
+                games = np.bincount(pairs, minlength=n * n).reshape(n, n).astype(np.int32)
+                wins = np.bincount(pairs, weights=column_win[:, i], minlength=n * n).reshape(n, n).astype(np.int32)
+                if i // len(ROLES) == j // len(ROLES):
+                    self.synergy_games[role_i, role_j] += games
+                    self.synergy_wins[role_i, role_j] += wins
+                else:
+                    self.counter_games[role_i, role_j] += games
+                    self.counter_wins[role_i, role_j] += wins
+        self._compute_deltas()
+
+    def _delta(self, wins, games):
+        return ((wins + self.prior_games / 2) / (games + self.prior_games) - 0.5).astype(np.float32)
+
+    def _variance(self, wins, games):
+        rate = (wins + self.prior_games / 2) / (games + self.prior_games)
+        return (rate * (1 - rate) / (games + self.prior_games)).astype(np.float32)
+
+    def _compute_deltas(self):
+        self._variances = None
+        if not self.deltas:
+            return
+        self.champion_delta = self._delta(self.champion_wins.sum(axis=0), self.champion_games.sum(axis=0))
+        self.synergy_delta = self._delta(self.synergy_wins.sum(axis=(0, 1)), self.synergy_games.sum(axis=(0, 1)))
+        self.counter_delta = self._delta(self.counter_wins.sum(axis=(0, 1)), self.counter_games.sum(axis=(0, 1)))
+        self.role_champion_delta = self._delta(self.champion_wins, self.champion_games)
+        self.role_synergy_delta = self._delta(self.synergy_wins, self.synergy_games)
+        self.role_counter_delta = self._delta(self.counter_wins, self.counter_games)
+
+    def save(self, path, compressed=False, **extra):
+        """
+        Write the counts to an .npz file, optionally compressed (pair counts are mostly zero).
+
+        :param extra: Further arrays stored alongside the counts; load() ignores them.
+        """
+        savez = np.savez_compressed if compressed else np.savez
+        savez(path, prior_games=self.prior_games, **extra, **{name: getattr(self, name) for name in COUNT_ARRAYS})
+
+    @classmethod
+    def load(cls, path, deltas=True):
+        with np.load(path) as data:
+            index = cls(num_champions=data['champion_wins'].shape[1], prior_games=int(data['prior_games']),
+                        deltas=deltas)
+            for name in COUNT_ARRAYS:
+                setattr(index, name, data[name])
+        index._compute_deltas()
+        return index
+
+    def draft_scores(self, drafts):
+        """
+        Score complete drafts from team 1's side using the role-specific deltas.
+
+        Each champion contributes its own delta, a quarter of its synergy with each of its four
+        teammates and a fifth of its matchup against each of the five enemies, so every
+        champion's weight is comparable however many pairs it appears in.
+
+        :param drafts: An N x 10 array of Champion IDs in minified.csv's column order (no win column).
+        :return: A float32 array of N scores; positive favours team 1.
+        """
+        drafts = np.asarray(drafts, dtype=np.intp)
+        if drafts.ndim != 2 or drafts.shape[1] != 10:
+            raise ValueError(f'Expected an N x 10 array of champion IDs, got shape {drafts.shape}')
+        roles = len(ROLES)
+        scores = np.zeros(len(drafts), dtype=np.float32)
+        for i in range(10):
+            sign = 1 if i < roles else -1
+            role_i = i % roles
+            scores += sign * self.role_champion_delta[role_i, drafts[:, i]]
+            for j in range(10):
+                if i == j:
+                    continue
+                role_j = j % roles
+                if i // roles == j // roles:
+                    scores += sign / 4 * self.role_synergy_delta[role_i, role_j, drafts[:, i], drafts[:, j]]
+                else:
+                    scores += sign / 5 * self.role_counter_delta[role_i, role_j, drafts[:, i], drafts[:, j]]
+        return scores
+
+    def variances(self):
+        """
+        Return the sampling variance of every smoothed rate behind the *_delta arrays, keyed by
+        the delta array's name. Computed on first use, since only lower-bound scoring needs them.
+        """
+        if self._variances is None:
+            self._variances = {
+                'champion_delta': self._variance(self.champion_wins.sum(axis=0), self.champion_games.sum(axis=0)),
+                'synergy_delta': self._variance(self.synergy_wins.sum(axis=(0, 1)), self.synergy_games.sum(axis=(0, 1))),
+                'counter_delta': self._variance(self.counter_wins.sum(axis=(0, 1)), self.counter_games.sum(axis=(0, 1))),
+                'role_champion_delta': self._variance(self.champion_wins, self.champion_games),
+                'role_synergy_delta': self._variance(self.synergy_wins, self.synergy_games),
+                'role_counter_delta': self._variance(self.counter_wins, self.counter_games),
+            }
+        return self._variances
+
+    def score(self, candidates, team=(), enemies=(), role=None, z=0.0):
+        """
+        Score candidate picks by how far above a coin flip their team is expected to be.
+
+        :param candidates: Champion IDs to score.
+        :param team: Allied champion IDs, or a dict mapping role to champion ID.
+        :param enemies: Enemy champion IDs, or a dict mapping role to champion ID.
+        :param role: The role the candidate will play. Role-specific counts are used when this
+                     is given and team and enemies are dicts (or empty).
+        :param z: When positive, return the lower confidence bound of each score instead: the
+                  score minus z standard errors of the rates it sums, so picks backed by few
+                  games rank below equally good picks backed by many.
+        :return: A float array of scores, one per candidate.
+        """
+        candidates = np.asarray(candidates, dtype=np.intp)
+        if role is None or not all(isinstance(side, dict) or len(side) == 0 for side in (team, enemies)):
+            team = np.asarray(list(team.values()) if isinstance(team, dict) else team, dtype=np.intp)
+            enemies = np.asarray(list(enemies.values()) if isinstance(enemies, dict) else enemies, dtype=np.intp)
+            terms = lambda arrays: (arrays['champion_delta'][candidates]
+                                    + arrays['synergy_delta'][candidates][:, team].sum(axis=1)
+                                    + arrays['counter_delta'][candidates][:, enemies].sum(axis=1))
+        else:
+            role_i = ROLES.index(role)
+
+            def terms(arrays):
+                total = arrays['role_champion_delta'][role_i, candidates].astype(np.float32)
+                for other_role, champion in (team or {}).items():
+                    total += arrays['role_synergy_delta'][role_i, ROLES.index(other_role), candidates, champion]
+                for other_role, champion in (enemies or {}).items():
+                    total += arrays['role_counter_delta'][role_i, ROLES.index(other_role), candidates, champion]
+                return total
+
+        scores = terms({name: getattr(self, name) for name in DELTA_ARRAYS})
+        if z > 0:
+            scores = scores - z * np.sqrt(terms(self.variances()))
+        return scores
@@ -0,0 +1,167 @@
+import bisect
+import json
+import threading
+import time
+from collections import deque
+
+# Upper bounds of the latency buckets, in milliseconds
+DEFAULT_BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000]
+
+
+class LatencyHistogram:
+    def __init__(self, buckets_ms=DEFAULT_BUCKETS_MS, window=10000):
+        """
+        Cumulative latency histogram plus a window of recent samples for percentiles.
+
+        :param buckets_ms: Bucket upper bounds in milliseconds; an overflow bucket is added.
+        :param window: Number of recent samples percentiles are computed over.
+        """
+        self.buckets_ms = list(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        ms = seconds * 1000
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets_ms, ms)] += 1
+            self.count += 1
+            self.total_ms += ms
+            self._recent.append(ms)
+
+    def percentile(self, q):
+        """Return the q-th percentile (0-100) of recent samples in milliseconds."""
+        with self._lock:
+            recent = sorted(self._recent)
+        if not recent:
+            return 0.0
+        return recent[min(len(recent) - 1, int(len(recent) * q / 100))]
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self.counts)
+            count, total_ms = self.count, self.total_ms
+        buckets = {str(bound): n for bound, n in zip(self.buckets_ms + ['+Inf'], counts)}
+        return {
+            'count': count,
+            'mean_ms': total_ms / count if count else 0.0,
+            'p50_ms': self.percentile(50),
+            'p99_ms': self.percentile(99),
+            'buckets_ms': buckets,
+        }
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+def _label_value(value):
+    # The Prometheus text format escapes backslashes, double quotes and newlines in label values
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _series(name, labels):
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{key}="{_label_value(value)}"' for key, value in labels) + '}'
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        Named counters and latency histograms, each optionally split by labels, that can be
+        dumped as JSON or in the Prometheus text format.
+        """
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def _get(self, metrics, factory, name, labels):
+        key = (name, tuple(sorted((key, str(value)) for key, value in labels.items())))
+        metric = metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = metrics.setdefault(key, factory())
+        return metric
+
+    def counter(self, name, **labels):
+        return self._get(self._counters, Counter, name, labels)
+
+    def histogram(self, name, **labels):
+        """Return the LatencyHistogram for name and labels; observed values are in milliseconds."""
+        return self._get(self._histograms, LatencyHistogram, name, labels)
+
+    def timer(self, name, **labels):
+        """Context manager observing the time spent inside it in histogram(name, **labels)."""
+        return _Timer(self.histogram(name, **labels))
+
+    def snapshot(self):
+        with self._lock:
+            counters, histograms = dict(self._counters), dict(self._histograms)
+        return {
+            'counters': {_series(name, labels): counter.value for (name, labels), counter in sorted(counters.items())},
+            'histograms': {_series(name, labels): histogram.snapshot()
+                           for (name, labels), histogram in sorted(histograms.items())},
+        }
+
+    def to_prometheus(self):
+        """Return every metric in the Prometheus text exposition format."""
+        with self._lock:
+            counters, histograms = dict(self._counters), dict(self._histograms)
+        lines, typed = [], set()
+        for (name, labels), counter in sorted(counters.items()):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} counter')
+            lines.append(f'{_series(name, labels)} {counter.value}')
+        for (name, labels), histogram in sorted(histograms.items()):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} histogram')
+            with histogram._lock:
+                counts, count, total_ms = list(histogram.counts), histogram.count, histogram.total_ms
+            cumulative = 0
+            for bound, n in zip(histogram.buckets_ms + ['+Inf'], counts):
+                cumulative += n
+                lines.append(f'{_series(name + "_bucket", labels + (("le", str(bound)),))} {cumulative}')
+            lines.append(f'{_series(name + "_sum", labels)} {total_ms}')
+            lines.append(f'{_series(name + "_count", labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Dump the metrics to path, in the Prometheus text format if it ends in .prom, else as JSON."""
+        with open(path, 'w') as f:
+            if path.endswith('.prom'):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.snapshot(), f, indent=2)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+# Registry the crawler, API client and collector report to unless given another
+REGISTRY = MetricsRegistry()
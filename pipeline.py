@@ -0,0 +1,151 @@
+import logging
+import queue
+import threading
+import time
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class Stage:
+    def __init__(self, name, fn, workers=1, maxsize=100):
+        """
+        One step of a Pipeline.
+
+        :param name: Reported in depths() and stats().
+        :param fn: Called with each input item; returns or yields any number of output items.
+        :param workers: Threads running fn.
+        :param maxsize: Capacity of the stage's input queue. A full queue blocks the stage
+                        feeding it, so a slow stage slows its producers instead of piling up
+                        items in memory.
+        """
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.processed = 0
+        self.emitted = 0
+        self.errors = 0
+        self._running = workers
+        self._lock = threading.Lock()
+
+
+class Pipeline:
+    def __init__(self, output_maxsize=100, output=None, metrics=REGISTRY):
+        """
+        Threaded stages connected by bounded queues.
+
+        Every stage starts work as soon as its first input arrives, so later stages overlap
+        with earlier ones instead of waiting for them to finish.
+
+        :param output_maxsize: Capacity of the queue the caller reads results from.
+        :param output: A queue to share with other pipelines instead; see drain().
+        :param metrics: MetricsRegistry each item's processing time is recorded in, per stage, as
+                        pipeline_stage_latency_ms, and the time spent waiting for room in the
+                        next stage's queue as pipeline_stage_blocked_ms.
+        """
+        self.stages = []
+        self.metrics = metrics
+        self.output = queue.Queue(maxsize=output_maxsize) if output is None else output
+        self._threads = []
+
+    def stage(self, name, fn, workers=1, maxsize=100):
+        """Append a stage and return the pipeline, so calls can be chained."""
+        self.stages.append(Stage(name, fn, workers, maxsize))
+        return self
+
+    def _next_queue(self, index):
+        return self.stages[index + 1].queue if index + 1 < len(self.stages) else self.output
+
+    def _work(self, index):
+        stage, downstream = self.stages[index], self._next_queue(index)
+        if self.metrics is not None:
+            latency = self.metrics.histogram('pipeline_stage_latency_ms', stage=stage.name)
+            blocked_latency = self.metrics.histogram('pipeline_stage_blocked_ms', stage=stage.name)
+        while True:
+            item = stage.queue.get()
+            if item is _DONE:
+                # Pass the marker on to sibling workers; the last one out tells the next stage
+                with stage._lock:
+                    stage._running -= 1
+                    last = stage._running == 0
+                (downstream if last else stage.queue).put(_DONE)
+                return
+            start, blocked = time.perf_counter(), 0.0
+            try:
+                results = stage.fn(item)
+                for result in results if results is not None else ():
+                    put_start = time.perf_counter()
+                    downstream.put(result)
+                    blocked += time.perf_counter() - put_start
+                    with stage._lock:
+                        stage.emitted += 1
+            except Exception as e:
+                with stage._lock:
+                    stage.errors += 1
+                logger.warning("Pipeline stage %s failed on %r: %s", stage.name, item, e)
+            with stage._lock:
+                stage.processed += 1
+            if self.metrics is not None:
+                latency.observe(time.perf_counter() - start - blocked)
+                blocked_latency.observe(blocked)
+
+    def _feed(self, source):
+        first = self.stages[0].queue
+        try:
+            for item in source:
+                first.put(item)
+        finally:
+            first.put(_DONE)
+
+    def start(self, source):
+        """Start pushing source's items through every stage in background threads."""
+        self._threads = [threading.Thread(target=self._feed, args=(source,), daemon=True)]
+        for index, stage in enumerate(self.stages):
+            self._threads += [threading.Thread(target=self._work, args=(index,), daemon=True,
+                                               name=f'{stage.name}-{worker}') for worker in range(stage.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def run(self, source):
+        """
+        Push source's items through every stage and yield the last stage's outputs as they
+        come out. Must be consumed to the end for the workers to finish.
+        """
+        self.start(source)
+        return drain([self])
+
+    def depths(self):
+        """Return the number of items waiting in front of each stage and in the output queue."""
+        depths = {stage.name: stage.queue.qsize() for stage in self.stages}
+        depths['output'] = self.output.qsize()
+        return depths
+
+    def stats(self):
+        return {
+            stage.name: {'processed': stage.processed, 'emitted': stage.emitted, 'errors': stage.errors,
+                         'waiting': stage.queue.qsize(), 'workers': stage.workers}
+            for stage in self.stages
+        }
+
+
+def drain(pipelines):
+    """
+    Yield the outputs of started pipelines that share one output queue, until all have finished.
+    """
+    output = pipelines[0].output
+    running = len(pipelines)
+    while running:
+        item = output.get()
+        if item is _DONE:
+            running -= 1
+            continue
+        yield item
+    for pipeline in pipelines:
+        pipeline.join()
@@ -0,0 +1,114 @@
+import collections
+import os
+import signal
+import sys
+import threading
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005, max_depth=30):
+        """
+        Statistical profiler that samples the stack of every thread on a timer.
+
+        Unlike cProfile it does not hook every call, so it slows the profiled code very little
+        and can be switched on in a running crawl to see where time goes and switched off again.
+
+        :param interval: Seconds between samples.
+        :param max_depth: Innermost frames kept per sampled stack.
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        # Guards stacks and samples, which the sampling thread updates while others read them
+        self._stacks_lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._sample, name='sampling-profiler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def toggle(self):
+        """Start the profiler if it is stopped, otherwise stop it. Returns whether it is now running."""
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+        return self.running
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                    frame = frame.f_back
+                stacks.append(';'.join(reversed(stack)))
+            with self._stacks_lock:
+                self.stacks.update(stacks)
+                self.samples += 1
+
+    def _snapshot(self):
+        with self._stacks_lock:
+            return dict(self.stacks)
+
+    def top(self, n=20):
+        """Return the n functions most often on top of a sampled stack, as (function, fraction) pairs."""
+        leaves = collections.Counter()
+        for stack, count in self._snapshot().items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        total = sum(leaves.values())
+        return [(function, count / total) for function, count in leaves.most_common(n)]
+
+    def folded(self):
+        """Return the samples in the collapsed-stack format flame graph tools read."""
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(self._snapshot().items()))
+
+    def reset(self):
+        with self._stacks_lock:
+            self.stacks.clear()
+            self.samples = 0
+
+
+def install_toggle_signal(profiler, signum=getattr(signal, 'SIGUSR1', None), path='profile.folded'):
+    """
+    Toggle profiler whenever the process receives signum (SIGUSR1 by default), writing the
+    samples collected so far to path each time it is switched off. Does nothing where the
+    signal does not exist, e.g. on Windows.
+    """
+    if signum is None:
+        return
+
+    def handle(signum, frame):
+        # Stopping joins the sampling thread, which must not happen inside the signal handler
+        threading.Thread(target=_toggle_and_write, args=(profiler, path), daemon=True).start()
+
+    signal.signal(signum, handle)
+
+
+def _toggle_and_write(profiler, path):
+    if not profiler.toggle():
+        with open(path, 'w') as f:
+            f.write(profiler.folded())
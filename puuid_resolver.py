@@ -0,0 +1,156 @@
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+
+def identity_of(entry):
+    """
+    Return the (kind, key) a league entry is resolved by: its summoner ID when it has one,
+    otherwise its summoner name (names are case-insensitive), or None if it has neither.
+    """
+    if entry.get('summonerId'):
+        return 'summonerId', entry['summonerId']
+    if entry.get('summonerName'):
+        return 'name', entry['summonerName'].lower()
+    return None
+
+
+class PuuidCache:
+    def __init__(self, path='puuid_cache.db'):
+        """
+        Persistent map from (platform, summoner ID or name) to PUUID.
+
+        A PUUID never changes for an account, so entries do not expire. Entries for names can
+        go stale when a player renames; resolving by summoner ID avoids that.
+
+        :param path: The SQLite file to store identities in.
+        """
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS puuid ('
+            'platform TEXT NOT NULL, kind TEXT NOT NULL, key TEXT NOT NULL, puuid TEXT NOT NULL, '
+            'resolved REAL NOT NULL, PRIMARY KEY (platform, kind, key))'
+        )
+        self._conn.commit()
+
+    def get_many(self, platform, identities):
+        """Return a dict from each cached (kind, key) in identities to its PUUID."""
+        found = {}
+        identities = list(identities)
+        with self._lock:
+            # SQLite limits the number of bound parameters, so look keys up in slices
+            for start in range(0, len(identities), 400):
+                chunk = identities[start:start + 400]
+                clause = ' OR '.join(['(kind = ? AND key = ?)'] * len(chunk))
+                params = [value for identity in chunk for value in identity]
+                for kind, key, puuid in self._conn.execute(
+                        f'SELECT kind, key, puuid FROM puuid WHERE platform = ? AND ({clause})', [platform] + params):
+                    found[(kind, key)] = puuid
+        return found
+
+    def set_many(self, platform, resolved):
+        """Store a dict from (kind, key) to PUUID."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO puuid VALUES (?, ?, ?, ?, ?)',
+                [(platform, kind, key, puuid, now) for (kind, key), puuid in resolved.items()])
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM puuid').fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+class PuuidResolver:
+    def __init__(self, client, cache=None, max_workers=8, platform=None):
+        """
+        Resolves league entries to PUUIDs in bulk for one platform.
+
+        Entries that already carry a PUUID need no request. The others are deduplicated,
+        looked up in the cache with one query, and only the misses are resolved, concurrently
+        and through the client's rate limiter.
+
+        :param client: A RiotAPIClient for the platform the entries come from.
+        :param cache: A PuuidCache; without one every miss is resolved again on each call.
+        :param max_workers: Lookups in flight at once.
+        :param platform: The platform cache entries are stored under; defaults to client.region.
+        """
+        self.client = client
+        self.platform = platform or client.region
+        self.cache = cache
+        self.max_workers = max_workers
+        self.stats = {'entries': 0, 'duplicates': 0, 'cache_hits': 0, 'resolved': 0, 'failed': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, **counts):
+        with self._lock:
+            for name, count in counts.items():
+                self.stats[name] += count
+
+    def _lookup(self, identity):
+        kind, key = identity
+        if kind == 'summonerId':
+            return self.client.get_summoner_puuid_by_id(key)
+        return self.client.get_summoner_puuid(key)
+
+    def resolve(self, entries):
+        """
+        Yield the PUUID of every distinct player in entries, as soon as each is known.
+
+        PUUIDs that need no request come first; the rest follow in the order their lookups
+        finish, so the next stage can start on them right away. Players that cannot be
+        resolved are counted in stats['failed'] and skipped.
+        """
+        entries = list(entries)
+        seen_puuids, identities = set(), {}
+        for entry in entries:
+            puuid, identity = entry.get('puuid'), identity_of(entry)
+            if puuid:
+                if puuid not in seen_puuids:
+                    seen_puuids.add(puuid)
+                    yield puuid
+            elif identity is not None:
+                identities.setdefault(identity, None)
+        unique = len(seen_puuids) + len(identities)
+        self._count(entries=len(entries), duplicates=len(entries) - unique)
+
+        cached = self.cache.get_many(self.platform, identities) if self.cache is not None and identities else {}
+        self._count(cache_hits=len(cached))
+        for puuid in cached.values():
+            if puuid not in seen_puuids:
+                seen_puuids.add(puuid)
+                yield puuid
+
+        misses = [identity for identity in identities if identity not in cached]
+        if not misses:
+            return
+        resolved = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._lookup, identity): identity for identity in misses}
+            try:
+                for future in as_completed(futures):
+                    try:
+                        puuid = future.result()
+                    except Exception as e:
+                        logger.warning("Could not resolve %s: %s", futures[future], e)
+                        puuid = None
+                    if not puuid:
+                        self._count(failed=1)
+                        continue
+                    self._count(resolved=1)
+                    resolved[futures[future]] = puuid
+                    if puuid not in seen_puuids:
+                        seen_puuids.add(puuid)
+                        yield puuid
+            finally:
+                if self.cache is not None and resolved:
+                    self.cache.set_many(self.platform, resolved)
@@ -0,0 +1,135 @@
+import datetime
+import threading
+import time
+from riotwatcher.RateLimiter import RateLimiter
+
+# Limits handed out to a development key; replaced as soon as the API reports the real ones.
+DEFAULT_APP_LIMITS = '20:1,100:120'
+
+
+def parse_rate_limit_header(value):
+    """
+    Parse a Riot rate limit header into (count, window_seconds) pairs.
+
+    :param value: Header value, e.g. '20:1,100:120'.
+    :return: A list of (count, seconds) tuples.
+    """
+    limits = []
+    if not value:
+        return limits
+    for part in value.split(','):
+        count, _, seconds = part.strip().partition(':')
+        if count and seconds:
+            limits.append((int(count), int(seconds)))
+    return limits
+
+
+class TokenBucket:
+    def __init__(self, count, seconds):
+        """A bucket that refills `count` tokens evenly over `seconds`."""
+        self.capacity = count
+        self.seconds = seconds
+        self.rate = count / seconds
+        self.tokens = float(count)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, now):
+        """Take one token, returning how long the caller must wait before using it."""
+        self._refill(now)
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def sync(self, used, now):
+        """Align the bucket with the request count the server reports for this window."""
+        self._refill(now)
+        self.tokens = min(self.tokens, self.capacity - used)
+
+
+class RiotRateLimiter(RateLimiter):
+    def __init__(self, app_limits=DEFAULT_APP_LIMITS):
+        """
+        Token-bucket limiter shared by every request made through a RiotAPIClient.
+
+        Application limits are tracked per routing value (e.g. 'NA1', 'americas') and method
+        limits per (routing value, method). Bucket sizes follow the X-App-Rate-Limit and
+        X-Method-Rate-Limit headers, and a 429 blocks the routing value until Retry-After passes.
+
+        :param app_limits: Application limits to assume before any response has been seen.
+        """
+        self._lock = threading.Lock()
+        self._default_app_limits = parse_rate_limit_header(app_limits)
+        self._app_buckets = {}
+        self._method_buckets = {}
+        self._blocked_until = {}
+
+    def _buckets_for(self, region, method):
+        if region not in self._app_buckets:
+            self._app_buckets[region] = [TokenBucket(c, s) for c, s in self._default_app_limits]
+        return self._app_buckets[region] + self._method_buckets.get((region, method), [])
+
+    def reserve(self, region, method):
+        """
+        Reserve a request slot.
+
+        :param region: The platform or regional routing value of the request.
+        :param method: The method name used for method-level limits.
+        :return: The number of seconds to wait before sending the request.
+        """
+        with self._lock:
+            now = time.monotonic()
+            delay = max([bucket.reserve(now) for bucket in self._buckets_for(region, method)], default=0.0)
+            blocked = self._blocked_until.get(region, 0.0) - now
+            return max(delay, blocked, 0.0)
+
+    def acquire(self, region, method):
+        """Block until a request to `method` on `region` may be sent."""
+        delay = self.reserve(region, method)
+        if delay > 0:
+            time.sleep(delay)
+
+    def update(self, region, method, status, headers):
+        """Update bucket sizes and back-off state from a response."""
+        with self._lock:
+            now = time.monotonic()
+            self._apply_limits(self._app_buckets, region, headers.get('X-App-Rate-Limit'),
+                               headers.get('X-App-Rate-Limit-Count'), now)
+            self._apply_limits(self._method_buckets, (region, method), headers.get('X-Method-Rate-Limit'),
+                               headers.get('X-Method-Rate-Limit-Count'), now)
+            if status == 429:
+                retry_after = headers.get('Retry-After')
+                delay = float(retry_after) if retry_after else 1.0
+                self._blocked_until[region] = max(self._blocked_until.get(region, 0.0), now + delay)
+
+    @staticmethod
+    def _apply_limits(buckets, key, limit_header, count_header, now):
+        limits = parse_rate_limit_header(limit_header)
+        if not limits:
+            return
+        by_window = {bucket.seconds: bucket for bucket in buckets.get(key, [])}
+        current = []
+        for count, seconds in limits:
+            bucket = by_window.get(seconds)
+            if bucket is None or bucket.capacity != count:
+                bucket = TokenBucket(count, seconds)
+            current.append(bucket)
+        buckets[key] = current
+        used = {seconds: count for count, seconds in parse_rate_limit_header(count_header)}
+        for bucket in current:
+            if bucket.seconds in used:
+                bucket.sync(used[bucket.seconds], now)
+
+    # riotwatcher.RateLimiter interface, so LolWatcher draws from the same buckets.
+    def wait_until(self, region, endpoint_name, method_name):
+        delay = self.reserve(region, f'{endpoint_name}.{method_name}')
+        if delay <= 0:
+            return None
+        return datetime.datetime.now() + datetime.timedelta(seconds=delay)
+
+    def record_response(self, region, endpoint_name, method_name, status, headers):
+        self.update(region, f'{endpoint_name}.{method_name}', status, headers)
@@ -0,0 +1,127 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+# Seconds each endpoint's responses stay valid, matched on the longest endpoint prefix.
+# None means the response never expires.
+DEFAULT_TTLS = {
+    'match/v5/matches/by-puuid': 10 * 60,  # Matchlists grow as players keep playing
+    'match/v5/matches': None,  # A finished match never changes
+    'league/v4/entries': 10 * 60,
+    'league-exp/v4/entries': 10 * 60,
+    'summoner/v4/summoners': 24 * 60 * 60,
+}
+
+
+class ResponseCache:
+    def __init__(self, path='response_cache.db', ttls=None, default_ttl=5 * 60, max_bytes=512 * 1024 * 1024):
+        """
+        Persistent SQLite cache for Riot API responses, keyed by region, endpoint and params.
+
+        :param path: The SQLite file to store responses in.
+        :param ttls: Dict mapping endpoint prefixes to a TTL in seconds (None never expires).
+        :param default_ttl: TTL for endpoints not covered by `ttls`.
+        :param max_bytes: Least recently used responses are evicted once the stored
+                          (compressed) bodies exceed this size.
+        """
+        self.path = path
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS response ('
+            'key TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL, '
+            'expires REAL, accessed REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS response_accessed ON response (accessed)')
+        self._conn.commit()
+        self._size = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM response').fetchone()[0]
+
+    @staticmethod
+    def make_key(region, endpoint, params=None):
+        return f"{region}:{endpoint.strip('/')}?{json.dumps(params or {}, sort_keys=True)}"
+
+    def ttl_for(self, endpoint):
+        """Return the TTL in seconds for an endpoint, or None if its responses never expire."""
+        endpoint = endpoint.strip('/')
+        matches = [prefix for prefix in self.ttls if endpoint.startswith(prefix)]
+        if not matches:
+            return self.default_ttl
+        return self.ttls[max(matches, key=len)]
+
+    def get(self, region, endpoint, params=None):
+        """Return the cached response, or None if it is missing or expired."""
+        key = self.make_key(region, endpoint, params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT body, expires FROM response WHERE key = ?', (key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE response SET accessed = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def set(self, region, endpoint, params, value):
+        """Store a response under its endpoint's TTL, evicting old entries if the cache is full."""
+        key = self.make_key(region, endpoint, params)
+        ttl = self.ttl_for(endpoint)
+        now = time.time()
+        body = zlib.compress(json.dumps(value).encode())
+        with self._lock:
+            old = self._conn.execute('SELECT size FROM response WHERE key = ?', (key,)).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO response (key, body, size, expires, accessed) VALUES (?, ?, ?, ?, ?)',
+                (key, body, len(body), None if ttl is None else now + ttl, now),
+            )
+            self._size += len(body) - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Drop least recently used entries until the cache is back under 90% of max_bytes
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute('SELECT key, size FROM response ORDER BY accessed')
+        evicted = []
+        for key, size in rows:
+            if self._size <= target:
+                break
+            evicted.append((key,))
+            self._size -= size
+        self._conn.executemany('DELETE FROM response WHERE key = ?', evicted)
+        self.evictions += len(evicted)
+
+    def purge_expired(self):
+        """Delete every expired response."""
+        with self._lock:
+            self._conn.execute('DELETE FROM response WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+            self._conn.commit()
+            self._size = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM response').fetchone()[0]
+
+    def stats(self):
+        """Return hit/miss counters and the cache's current size."""
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM response').fetchone()[0]
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': entries,
+            'bytes': self._size,
+        }
+
+    def close(self):
+        self._conn.close()
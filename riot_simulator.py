@@ -0,0 +1,332 @@
+import argparse
+import json
+import math
+import random
+import re
+import sqlite3
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from requests.adapters import HTTPAdapter
+from match_store import MATCH_COLUMNS, TEAM_POSITIONS, load_champion_ids
+from rate_limiter import parse_rate_limit_header
+
+# match-v5 teamPosition for each of the Match table's five roles
+POSITIONS = {role: position for position, role in TEAM_POSITIONS.items()}
+TIERS = ['IRON', 'BRONZE', 'SILVER', 'GOLD', 'PLATINUM', 'EMERALD', 'DIAMOND']
+DIVISIONS = ['I', 'II', 'III', 'IV']
+ENTRIES_PER_PAGE = 205  # league-v4 page size
+GAME_START_MS = 1704067200000  # 2024-01-01
+# App limits of a production key; a development key's 20:1,100:120 makes benchmarks take minutes
+PRODUCTION_LIMITS = '500:10,30000:600'
+
+
+class SyntheticLeague:
+    def __init__(self, db_path='league.db', num_players=2000, platform='NA1', seed=0, max_matches=None):
+        """
+        Riot API payloads generated from league.db's Match and Champion tables.
+
+        Every Match row becomes a match-v5 payload on `platform`, played by ten players drawn
+        from a pool of num_players, who are spread over the ladder's tiers and divisions.
+
+        :param max_matches: Use only the first max_matches rows of the Match table.
+        """
+        conn = sqlite3.connect(db_path)
+        self.champion_names = dict(conn.execute('SELECT id, name FROM Champion'))
+        query = f"SELECT {', '.join(MATCH_COLUMNS)} FROM Match ORDER BY rowid"
+        if max_matches is not None:
+            query += f' LIMIT {int(max_matches)}'
+        self.rows = conn.execute(query).fetchall()
+        conn.close()
+        self.platform = platform
+        rng = random.Random(seed)
+        self.players = [{'puuid': f'sim-puuid-{i}', 'summonerId': f'sim-summoner-{i}',
+                         'summonerName': f'SimPlayer{i}'} for i in range(num_players)]
+        self.by_summoner = {player['summonerId']: player for player in self.players}
+        self.by_name = {player['summonerName'].lower(): player for player in self.players}
+        self.match_players = [rng.sample(range(num_players), 10) for _ in self.rows]
+        self.player_matches = {player['puuid']: [] for player in self.players}
+        # Newest match first, as match-v5 lists them
+        for i in reversed(range(len(self.rows))):
+            for player in self.match_players[i]:
+                self.player_matches[self.players[player]['puuid']].append(self.match_id(i))
+        self.ladder = {}
+        for i, player in enumerate(self.players):
+            division = (TIERS[i % len(TIERS)], DIVISIONS[i // len(TIERS) % len(DIVISIONS)])
+            self.ladder.setdefault(division, []).append(player)
+
+    def match_id(self, i):
+        return f'{self.platform}_{i + 1}'
+
+    def league_entries(self, queue, tier, division, page):
+        players = self.ladder.get((tier, division), [])
+        start = (page - 1) * ENTRIES_PER_PAGE
+        return [dict(player, queueType=queue, tier=tier, rank=division, leaguePoints=0, wins=10, losses=10)
+                for player in players[start:start + ENTRIES_PER_PAGE]]
+
+    def match_ids(self, puuid, start=0, count=20):
+        return self.player_matches.get(puuid, [])[start:start + count]
+
+    def match(self, match_id):
+        platform, _, number = match_id.partition('_')
+        if platform != self.platform or not number.isdigit() or not 0 < int(number) <= len(self.rows):
+            return None
+        i = int(number) - 1
+        row = self.rows[i]
+        participants = []
+        for column, (name, champion_id) in enumerate(zip(MATCH_COLUMNS[1:], row[1:])):
+            team1 = column < 5
+            participants.append({
+                'puuid': self.players[self.match_players[i][column]]['puuid'],
+                'teamId': 100 if team1 else 200,
+                'teamPosition': POSITIONS[name.split('_')[1]],
+                'championName': self.champion_names.get(champion_id, ''),
+                'win': bool(row[0]) == team1,
+            })
+        return {
+            'metadata': {'matchId': match_id, 'participants': [p['puuid'] for p in participants]},
+            'info': {'participants': participants, 'gameVersion': '14.1.555.5828',
+                     'gameCreation': GAME_START_MS + i * 60000, 'gameDuration': 1800},
+        }
+
+
+class FixedWindowLimiter:
+    def __init__(self, limits):
+        """Riot-style app rate limit: at most count requests per window of seconds, per route."""
+        self.limits = parse_rate_limit_header(limits)
+        self.header = limits
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def hit(self, route):
+        """
+        Count a request against route.
+
+        :return: (retry_after_seconds, count_header); retry_after is 0 if the request is allowed.
+        """
+        with self._lock:
+            now = time.monotonic()
+            windows = self._windows.setdefault(route, [[0.0, 0] for _ in self.limits])
+            retry_after = 0.0
+            for window, (count, seconds) in zip(windows, self.limits):
+                if now - window[0] >= seconds:
+                    window[0], window[1] = now, 0
+                if window[1] >= count:
+                    retry_after = max(retry_after, seconds - (now - window[0]))
+            if not retry_after:
+                for window in windows:
+                    window[1] += 1
+            counts = ','.join(f'{window[1]}:{seconds}' for window, (_, seconds) in zip(windows, self.limits))
+            return retry_after, counts
+
+
+class RiotSimulator:
+    def __init__(self, league, latency_ms=0.0, jitter_ms=0.0, rate_limits=None, error_rate=0.0, seed=0):
+        """
+        Local stand-in for the Riot API serving a SyntheticLeague.
+
+        :param latency_ms: Delay added to every response.
+        :param jitter_ms: Up to this much more delay, drawn uniformly per response.
+        :param rate_limits: App limits to enforce per routing value, e.g. '20:1,100:120';
+                            requests over them get a 429 with Retry-After. None disables them.
+        :param error_rate: Fraction of requests answered with a 500.
+        """
+        self.league = league
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.limiter = FixedWindowLimiter(rate_limits) if rate_limits else None
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'served': 0, 'rate_limited': 0, 'errors': 0, 'not_found': 0}
+        self.route_requests = {}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _route(self, path, query):
+        league = self.league
+        patterns = [
+            (r'/lol/league/v4/entries/([^/]+)/([^/]+)/([^/]+)',
+             lambda queue, tier, division: league.league_entries(queue, tier, division, int(query.get('page', 1)))),
+            (r'/lol/summoner/v4/summoners/by-name/([^/]+)', lambda name: league.by_name.get(name.lower())),
+            (r'/lol/summoner/v4/summoners/by-puuid/([^/]+)',
+             lambda puuid: next((p for p in league.players if p['puuid'] == puuid), None)),
+            (r'/lol/summoner/v4/summoners/([^/]+)', lambda summoner_id: league.by_summoner.get(summoner_id)),
+            (r'/lol/match/v5/matches/by-puuid/([^/]+)/ids',
+             lambda puuid: league.match_ids(puuid, int(query.get('start', 0)), int(query.get('count', 20)))),
+            (r'/lol/match/v5/matches/([^/]+)', league.match),
+        ]
+        for pattern, handler in patterns:
+            match = re.fullmatch(pattern, path)
+            if match:
+                return handler(*match.groups())
+        return None
+
+    def respond(self, route, path, query):
+        """
+        Answer one request.
+
+        :param route: The routing value the request was sent to ('na1', 'americas', ...).
+        :return: (status, headers, body).
+        """
+        self._count('requests')
+        with self._lock:
+            self.route_requests[route] = self.route_requests.get(route, 0) + 1
+            delay = self.latency_ms + self._rng.uniform(0, self.jitter_ms)
+            fail = self._rng.random() < self.error_rate
+        if delay:
+            time.sleep(delay / 1000)
+        headers = {}
+        if self.limiter is not None:
+            retry_after, counts = self.limiter.hit(route)
+            headers = {'X-App-Rate-Limit': self.limiter.header, 'X-App-Rate-Limit-Count': counts}
+            if retry_after:
+                self._count('rate_limited')
+                headers['Retry-After'] = str(math.ceil(retry_after))
+                return 429, headers, {'status': {'status_code': 429, 'message': 'Rate limit exceeded'}}
+        if fail:
+            self._count('errors')
+            return 500, headers, {'status': {'status_code': 500, 'message': 'Internal server error'}}
+        body = self._route(path, query)
+        if body is None:
+            self._count('not_found')
+            return 404, headers, {'status': {'status_code': 404, 'message': 'Data not found'}}
+        self._count('served')
+        return 200, headers, body
+
+
+class SimulatorHandler(BaseHTTPRequestHandler):
+    simulator = None
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        route, _, path = url.path.lstrip('/').partition('/')
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        status, headers, body = self.simulator.respond(route, '/' + path, query)
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(simulator, host='127.0.0.1', port=0):
+    """Create an HTTP server answering Riot API paths prefixed by their routing value, e.g. /na1/lol/..."""
+    handler = type('BoundSimulatorHandler', (SimulatorHandler,), {'simulator': simulator})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+class RedirectAdapter(HTTPAdapter):
+    def __init__(self, base_url, **kwargs):
+        """Sends https://<route>.api.riotgames.com/<path> requests to <base_url>/<route>/<path>."""
+        self.base_url = base_url.rstrip('/')
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        route = url.hostname.split('.')[0]
+        request.url = f'{self.base_url}/{route}{url.path}' + (f'?{url.query}' if url.query else '')
+        return super().send(request, **kwargs)
+
+
+def redirect_transport(transport, base_url, pool_size=20):
+    """Point a PooledTransport, and every client sharing it, at a simulator instead of Riot."""
+    for prefix in [prefix for prefix in transport.session.adapters if prefix.startswith('https://')]:
+        del transport.session.adapters[prefix]
+    transport.session.mount('https://', RedirectAdapter(base_url, pool_maxsize=pool_size))
+
+
+def allowed_requests(limits, seconds, routes=1):
+    """The most requests rate limits allow in `seconds` across `routes` routing values."""
+    return routes * min(count * math.ceil(max(seconds, 1e-9) / window) for count, window in parse_rate_limit_header(limits))
+
+
+def run_benchmark(db_path='league.db', num_players=50, matches_per_player=10, max_matches=None, latency_ms=20.0,
+                  jitter_ms=10.0, rate_limits=PRODUCTION_LIMITS, error_rate=0.0, concurrent=True, max_workers=8):
+    """
+    Crawl a simulated league with RiotAPIClient and DataCollector and measure throughput.
+
+    :param concurrent: Use collect_match_data_concurrent instead of collect_match_data.
+    :return: Dict with matches, seconds, matches_per_sec, requests, quota_utilization (served
+             requests over the most the rate limits allow in the elapsed time, for the
+             routing values used), peak_kib_per_1k_matches (tracemalloc peak) and the
+             per-endpoint and per-stage metrics recorded during the run.
+    """
+    from api_client import RiotAPIClient
+    from data_collector import DataCollector
+    from http_transport import PooledTransport
+    from metrics import MetricsRegistry
+    from rate_limiter import RiotRateLimiter
+
+    league = SyntheticLeague(db_path, num_players=max(num_players, 10), max_matches=max_matches)
+    simulator = RiotSimulator(league, latency_ms, jitter_ms, rate_limits, error_rate)
+    server = make_server(simulator)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    metrics = MetricsRegistry()
+    transport = PooledTransport(default_pool_size=max_workers, metrics=metrics)
+    redirect_transport(transport, f'http://127.0.0.1:{server.server_address[1]}', pool_size=max_workers)
+    limiter = RiotRateLimiter(app_limits=rate_limits or '100000:1')
+    client = RiotAPIClient('simulated-key', rate_limiter=limiter, transport=transport, metrics=metrics)
+    conn = sqlite3.connect(db_path)
+    collector = DataCollector(client, champion_ids=load_champion_ids(conn), metrics=metrics)
+    conn.close()
+    puuids = [player['puuid'] for player in league.players[:num_players]]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        if concurrent:
+            collector.collect_match_data_concurrent(puuids, matches_per_player, max_workers=max_workers)
+        else:
+            collector.collect_match_data(puuids, matches_per_player)
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        server.shutdown()
+        server.server_close()
+    matches = len(collector.match_columns)
+    routes = len(simulator.route_requests)
+    return {
+        'matches': matches,
+        'seconds': seconds,
+        'matches_per_sec': matches / seconds if seconds else 0.0,
+        'requests': dict(simulator.stats),
+        'quota_utilization': (simulator.stats['served'] / allowed_requests(rate_limits, seconds, routes)
+                              if rate_limits else None),
+        'peak_kib_per_1k_matches': peak / 1024 / matches * 1000 if matches else None,
+        'metrics': metrics.snapshot(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark match collection against a simulated Riot API.')
+    parser.add_argument('--db', default='league.db')
+    parser.add_argument('--players', type=int, default=50)
+    parser.add_argument('--matches-per-player', type=int, default=10)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--jitter-ms', type=float, default=10.0)
+    parser.add_argument('--rate-limits', default=PRODUCTION_LIMITS, help="App limits per route, or '' for none")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--serial', action='store_true', help='Use collect_match_data instead of the concurrent path')
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+    result = run_benchmark(args.db, args.players, args.matches_per_player, latency_ms=args.latency_ms,
+                           jitter_ms=args.jitter_ms, rate_limits=args.rate_limits or None,
+                           error_rate=args.error_rate, concurrent=not args.serial, max_workers=args.workers)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
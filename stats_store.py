@@ -0,0 +1,212 @@
+import json
+import os
+import re
+import sqlite3
+import time
+import numpy as np
+from champion_stats import NUM_CHAMPIONS
+from match_store import MATCH_COLUMNS
+from matchup_index import MatchupIndex
+
+DAY_MS = 24 * 60 * 60 * 1000
+# Bucket for matches stored without a MatchInfo row; only the all-time totals include it
+UNKNOWN_BUCKET = (0, 0)
+
+
+class StatsStore:
+    def __init__(self, directory='stats_store', num_champions=NUM_CHAMPIONS, prior_games=10):
+        """
+        Champion, role, synergy and counter counts kept up to date as matches are added to
+        league.db, instead of being recomputed from the whole Match table.
+
+        Counts are split into buckets by (patch, day of game creation), each a MatchupIndex saved
+        as its own .npz file, plus a running all-time total. sync() reads only the Match rows
+        inserted since the last sync and rewrites only the buckets they touch. Windows such as
+        the last 14 days or one patch are sums over a few buckets.
+
+        The high-water mark is the rowid of the last Match row applied. Every file stores the
+        mark it is current through next to its counts, and total.npz is written last, so a crash
+        part way through a save never makes the next sync count a row twice. Match has no
+        INTEGER PRIMARY KEY, so a VACUUM of league.db may renumber its rowids; delete the
+        store's directory after one to rebuild it.
+
+        A bucket is a dense MatchupIndex of several megabytes, so buckets hold only counts, stay
+        in memory only between apply() and save(), and are read one at a time when summed.
+
+        :param directory: Where total.npz and the bucket files live.
+        :param num_champions: Number of rows in the Champion table.
+        :param prior_games: Passed to every MatchupIndex built from the counts.
+        """
+        self.directory = directory
+        self.num_champions = num_champions
+        self.prior_games = prior_games
+        os.makedirs(directory, exist_ok=True)
+        self.high_water_mark = self._read_mark(self._path('total.npz'))
+        self._buckets = {}  # Buckets changed by apply() and not saved yet
+        self._marks = {}  # High-water mark of each bucket in _buckets
+        self._total = None
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _bucket_path(self, bucket):
+        return self._path(f'bucket-{bucket[0]}-{bucket[1]}.npz')
+
+    def _read_mark(self, path):
+        if os.path.exists(path):
+            with np.load(path) as data:
+                if 'high_water_mark' in data:
+                    return int(data['high_water_mark'])
+        if path == self._path('total.npz'):
+            # Stores written before total.npz held the mark kept it in state.json
+            try:
+                with open(self._path('state.json')) as f:
+                    return json.load(f).get('high_water_mark', 0)
+            except (OSError, ValueError):
+                pass
+        return 0
+
+    def _new_index(self, deltas=True):
+        return MatchupIndex(num_champions=self.num_champions, prior_games=self.prior_games, deltas=deltas)
+
+    def _load(self, path, deltas=True):
+        if not os.path.exists(path):
+            return self._new_index(deltas)
+        return MatchupIndex.load(path, deltas=deltas)
+
+    def _bucket(self, bucket):
+        if bucket not in self._buckets:
+            path = self._bucket_path(bucket)
+            self._buckets[bucket] = self._load(path, deltas=False)
+            self._marks[bucket] = self._read_mark(path)
+        return self._buckets[bucket]
+
+    def _iter_buckets(self, buckets):
+        # Yields each bucket without keeping it, so summing a window holds one bucket at a time
+        for bucket in buckets:
+            yield self._buckets[bucket] if bucket in self._buckets else self._load(self._bucket_path(bucket), deltas=False)
+
+    @property
+    def total(self):
+        """All-time counts as a MatchupIndex."""
+        if self._total is None:
+            self._total = self._load(self._path('total.npz'))
+        return self._total
+
+    def _save(self, index, path, high_water_mark):
+        # Write then rename, so readers in other processes never see a half-written file
+        temp_path = path + '.tmp.npz'
+        index.save(temp_path, compressed=True, high_water_mark=high_water_mark)
+        os.replace(temp_path, path)
+
+    def apply(self, matches, game_creation=None, patch=None, rowids=None):
+        """
+        Add a batch of matches to the counts, without saving.
+
+        :param matches: An N x 11 array in minified.csv's column order.
+        :param game_creation: N game start times in epoch milliseconds, 0 if unknown.
+        :param patch: N patches encoded as by match_store.parse_patch, 0 if unknown.
+        :param rowids: The rows' Match rowids, ascending, when the batch holds every row after the
+                       high-water mark up to the last one; each bucket then skips the rows its
+                       saved file already counts and becomes current through the last rowid.
+        :return: The set of buckets that changed.
+        """
+        matrix = np.asarray(matches)
+        if len(matrix) == 0:
+            return set()
+        zeros = np.zeros(len(matrix), dtype=np.int64)
+        days = np.asarray(zeros if game_creation is None else game_creation, dtype=np.int64) // DAY_MS
+        patches = np.asarray(zeros if patch is None else patch, dtype=np.int64)
+        # Only matches with both a patch and a creation time are bucketed by them
+        known = (days > 0) & (patches > 0)
+        days, patches = np.where(known, days, 0), np.where(known, patches, 0)
+        self.total.update(matrix)
+        keys = np.column_stack([patches, days])
+        buckets, inverse = np.unique(keys, axis=0, return_inverse=True)
+        changed = set()
+        for i, (bucket_patch, bucket_day) in enumerate(buckets.tolist()):
+            bucket = (bucket_patch, bucket_day)
+            selected = inverse.ravel() == i
+            index = self._bucket(bucket)
+            if rowids is not None:
+                selected &= np.asarray(rowids) > self._marks[bucket]
+                self._marks[bucket] = int(rowids[-1])
+            index.update(matrix[selected])
+            changed.add(bucket)
+        return changed
+
+    def save(self, changed=None):
+        """
+        Write the given (default: all changed) buckets, then the totals with the high-water mark.
+        Saved buckets are dropped from memory.
+        """
+        for bucket in list(self._buckets) if changed is None else changed:
+            self._save(self._buckets.pop(bucket), self._bucket_path(bucket), self._marks.pop(bucket))
+        self._save(self.total, self._path('total.npz'), self.high_water_mark)
+
+    def sync(self, db_path='league.db', batch_size=50000):
+        """
+        Apply every Match row inserted since the last sync and save the result.
+
+        Counts are saved after every batch, so only the buckets one batch touches are held in memory.
+
+        :return: The number of matches applied.
+        """
+        conn = sqlite3.connect(db_path)
+        has_info = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'MatchInfo'").fetchone()
+        info_columns = 'COALESCE(MatchInfo.game_creation, 0), COALESCE(MatchInfo.patch, 0)' if has_info else '0, 0'
+        join = 'LEFT JOIN MatchInfo ON MatchInfo.id = Match.id' if has_info else ''
+        columns = ', '.join(f'Match.{column}' for column in MATCH_COLUMNS)
+        applied = 0
+        try:
+            while True:
+                rows = conn.execute(
+                    f'SELECT Match.rowid, {columns}, {info_columns} FROM Match {join} '
+                    'WHERE Match.rowid > ? ORDER BY Match.rowid LIMIT ?',
+                    (self.high_water_mark, batch_size),
+                ).fetchall()
+                if not rows:
+                    break
+                block = np.array(rows, dtype=np.int64)
+                changed = self.apply(block[:, 1:1 + len(MATCH_COLUMNS)], block[:, -2], block[:, -1], block[:, 0])
+                self.high_water_mark = int(block[-1, 0])
+                self.save(changed)
+                applied += len(block)
+        finally:
+            conn.close()
+        return applied
+
+    def _saved_buckets(self):
+        buckets = set()
+        for name in os.listdir(self.directory):
+            match = re.fullmatch(r'bucket-(\d+)-(\d+)\.npz', name)
+            if match:
+                buckets.add((int(match.group(1)), int(match.group(2))))
+        return buckets
+
+    def buckets(self, days=None, patch=None, now_ms=None):
+        """
+        Return the known buckets inside a window.
+
+        :param days: Keep buckets from the last `days` days, counting today.
+        :param patch: Keep buckets from this patch only (for example 1401 for 14.1).
+        :param now_ms: The current time in epoch milliseconds; defaults to the clock.
+        """
+        selected = [bucket for bucket in self._saved_buckets() | set(self._buckets) if bucket != UNKNOWN_BUCKET]
+        if patch is not None:
+            selected = [bucket for bucket in selected if bucket[0] == patch]
+        if days is not None:
+            today = (int(time.time() * 1000) if now_ms is None else now_ms) // DAY_MS
+            selected = [bucket for bucket in selected if today - days < bucket[1] <= today]
+        return sorted(selected)
+
+    def index(self, days=None, patch=None, now_ms=None):
+        """
+        Return counts for a window as a MatchupIndex, ready for an InferenceEngine.
+
+        With no window this is the all-time total, read from one file.
+        """
+        if days is None and patch is None:
+            return self.total
+        return MatchupIndex.combine(self._iter_buckets(self.buckets(days, patch, now_ms)),
+                                    num_champions=self.num_champions, prior_games=self.prior_games)
@@ -1,8 +1,77 @@
 from dotenv import load_dotenv
 import os
+import json
+import sqlite3
+import tempfile
+import threading
+import urllib.request
+import importlib.util
+import time
 import unittest
+import warnings
+from unittest import mock
+import numpy as np
 import requests_mock
+import urllib3
 from api_client import RiotAPIClient  # Adjust this import based on your file structure
+from response_cache import ResponseCache
+from http_transport import PooledTransport
+from match_store import MATCH_COLUMNS, MatchStore, extract_match_row
+from match_columns import MatchColumns, to_epoch_ms
+from champion_stats import ChampionWinRates
+from matchup_index import MatchupIndex
+from inference import InferenceEngine
+from draft_search import DraftSearch, default_pick_order
+from dataset import MatchDataset, load_matches
+from data_analysis import DataAnalysis
+from compositions import CompositionStats, pack_keys, unpack_key
+from confidence import bootstrap_interval, wilson_interval
+from stats_store import DAY_MS, StatsStore
+from crawler import CrawlOrchestrator, match_platform
+from puuid_resolver import PuuidCache, PuuidResolver
+from pipeline import Pipeline
+from riot_simulator import RiotSimulator, SyntheticLeague, make_server as make_simulator_server, redirect_transport, run_benchmark
+from win_model import FeatureCache, WinModel, encode_features, load_latest, train
+from inference_engine import RecommendationService, make_server
+from live_session import LiveClientSource, LiveSession, StandInGame, make_stand_in_server
+from metrics import MetricsRegistry
+from profiler import SamplingProfiler
+from data_collector import DataCollector
+from rate_limiter import RiotRateLimiter, parse_rate_limit_header
+
+CHAMPIONS = ['Aatrox', 'Ahri', 'Akali', 'Alistar', 'Ashe', 'Brand', 'Caitlyn', 'Darius', 'Ezreal', 'Garen', 'Jinx', 'Lux']
+POSITIONS = ['TOP', 'JUNGLE', 'MIDDLE', 'BOTTOM', 'UTILITY']
+
+
+def make_league_db(path, matches=()):
+    """Create a database with league.db's Champion and Match tables."""
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE Champion (id INTEGER PRIMARY KEY, name TEXT)')
+    conn.execute('CREATE TABLE Match (id TEXT PRIMARY KEY, team1_win INTEGER NOT NULL, '
+                 + ', '.join(f'{column} INTEGER NOT NULL' for column in [
+                     'team1_top', 'team1_jungle', 'team1_mid', 'team1_adc', 'team1_support',
+                     'team2_top', 'team2_jungle', 'team2_mid', 'team2_adc', 'team2_support']) + ')')
+    conn.executemany('INSERT INTO Champion VALUES (?, ?)', list(enumerate(CHAMPIONS)))
+    conn.executemany('INSERT INTO Match VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', matches)
+    conn.commit()
+    conn.close()
+
+
+def make_match_info(match_id, champion_names, team1_win=True, game_version='14.1.555.5828', game_creation=1704067200000):
+    """Build a minimal match-v5 payload with champions listed in Match table column order."""
+    participants = []
+    for i, name in enumerate(champion_names):
+        team1 = i < 5
+        participants.append({
+            'teamId': 100 if team1 else 200,
+            'teamPosition': POSITIONS[i % 5],
+            'championName': name,
+            'win': team1_win if team1 else not team1_win,
+        })
+    info = {'participants': participants, 'gameVersion': game_version,
+            'gameCreation': game_creation, 'gameDuration': 1800}
+    return {'metadata': {'matchId': match_id}, 'info': info}
+
 
 class TestRiotAPIClient(unittest.TestCase):
     def setUp(self):
@@ -149,5 +218,1096 @@ class TestRiotAPIClient(unittest.TestCase):
     # For get_match_ids, you'll need to mock the pagination behavior, so this might involve setting up multiple mocked responses
     # to simulate retrieving multiple pages of data.
 
+class TestRiotRateLimiter(unittest.TestCase):
+    def test_parse_rate_limit_header(self):
+        self.assertEqual(parse_rate_limit_header('20:1,100:120'), [(20, 1), (100, 120)])
+        self.assertEqual(parse_rate_limit_header(None), [])
+
+    def test_reserve_waits_once_bucket_is_empty(self):
+        limiter = RiotRateLimiter(app_limits='2:10')
+        self.assertEqual(limiter.reserve('NA1', 'match'), 0)
+        self.assertEqual(limiter.reserve('NA1', 'match'), 0)
+        self.assertGreater(limiter.reserve('NA1', 'match'), 4)
+        # Other routing values have their own buckets
+        self.assertEqual(limiter.reserve('EUW1', 'match'), 0)
+
+    def test_retry_after_blocks_region(self):
+        limiter = RiotRateLimiter()
+        limiter.update('NA1', 'match', 429, {'Retry-After': '5', 'X-App-Rate-Limit': '20:1,100:120'})
+        self.assertGreater(limiter.reserve('NA1', 'match'), 4)
+
+    @requests_mock.Mocker()
+    def test_request_retries_after_429(self, m):
+        m.get(requests_mock.ANY, [
+            {'status_code': 429, 'headers': {'Retry-After': '0'}},
+            {'json': [{'summonerId': 'test_summoner_id'}]},
+        ])
+        client = RiotAPIClient(api_key='test_key')
+        result = client.get_league_entries(queue='RANKED_SOLO_5x5', tier='GOLD', division='I')
+        self.assertEqual(m.call_count, 2)
+        self.assertEqual(result[0]['summonerId'], 'test_summoner_id')
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'cache.db')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_ttl_policy(self):
+        cache = ResponseCache(self.path)
+        self.assertIsNone(cache.ttl_for('match/v5/matches/NA1_1'))
+        self.assertEqual(cache.ttl_for('match/v5/matches/by-puuid/abc/ids'), 600)
+        cache.close()
+
+    def test_persists_and_counts_hits(self):
+        cache = ResponseCache(self.path)
+        self.assertIsNone(cache.get('NA1', 'match/v5/matches/NA1_1'))
+        cache.set('NA1', 'match/v5/matches/NA1_1', {}, {'metadata': {'matchId': 'NA1_1'}})
+        cache.close()
+
+        cache = ResponseCache(self.path)
+        self.assertEqual(cache.get('NA1', 'match/v5/matches/NA1_1'), {'metadata': {'matchId': 'NA1_1'}})
+        self.assertEqual(cache.stats()['hits'], 1)
+        cache.close()
+
+    def test_expired_entries_miss(self):
+        cache = ResponseCache(self.path, ttls={'league/v4/entries': 0})
+        cache.set('NA1', 'league/v4/entries/RANKED_SOLO_5x5/GOLD/I', {'page': 1}, [])
+        self.assertIsNone(cache.get('NA1', 'league/v4/entries/RANKED_SOLO_5x5/GOLD/I', {'page': 1}))
+        cache.close()
+
+    def test_evicts_least_recently_used(self):
+        cache = ResponseCache(self.path, max_bytes=200)
+        for i in range(20):
+            cache.set('NA1', f'match/v5/matches/NA1_{i}', {}, {'payload': str(i) * 20})
+            time.sleep(0.001)
+        self.assertLessEqual(cache.stats()['bytes'], 200)
+        self.assertGreater(cache.evictions, 0)
+        self.assertIsNone(cache.get('NA1', 'match/v5/matches/NA1_0'))
+        self.assertIsNotNone(cache.get('NA1', 'match/v5/matches/NA1_19'))
+        cache.close()
+
+    @requests_mock.Mocker()
+    def test_client_reads_through_cache(self, m):
+        m.get(requests_mock.ANY, json=[{'summonerId': 'test_summoner_id'}])
+        client = RiotAPIClient(api_key='test_key', cache=ResponseCache(self.path))
+        client.get_league_entries(queue='RANKED_SOLO_5x5', tier='GOLD', division='I')
+        result = client.get_league_entries(queue='RANKED_SOLO_5x5', tier='GOLD', division='I')
+        self.assertEqual(m.call_count, 1)
+        self.assertEqual(result[0]['summonerId'], 'test_summoner_id')
+        client.cache.close()
+
+class TestPooledTransport(unittest.TestCase):
+    def test_watcher_shares_transport_session(self):
+        transport = PooledTransport()
+        client = RiotAPIClient(api_key='test_key', transport=transport)
+        self.assertIs(client.lol_watcher._base_api._session, transport.session)
+
+    def test_pool_size_per_host(self):
+        transport = PooledTransport(pool_sizes={'americas': 25})
+        adapter = transport.session.get_adapter('https://americas.api.riotgames.com/lol/match/v5/matches/NA1_1')
+        self.assertEqual(adapter._pool_maxsize, 25)
+
+    @requests_mock.Mocker()
+    def test_records_timings_per_host(self, m):
+        m.get(requests_mock.ANY, json={'puuid': 'test_puuid'})
+        transport = PooledTransport()
+        client = RiotAPIClient(api_key='test_key', transport=transport)
+        client.get_league_entries(queue='RANKED_SOLO_5x5', tier='GOLD', division='I')
+        client.get_summoner_puuid_by_id('test_summoner_id')
+        client.get_match_ids('test_puuid')
+        stats = transport.stats()
+        self.assertEqual(stats['na1.api.riotgames.com']['requests'], 2)
+        self.assertEqual(stats['americas.api.riotgames.com']['requests'], 1)
+
+class FakeMatchClient:
+    def __init__(self, match_ids):
+        self.match_ids = match_ids
+        self.fetched = []
+
+    def get_match_ids(self, puuid, num_matches=10):
+        return self.match_ids
+
+    def get_match_details(self, match_id):
+        self.fetched.append(match_id)
+        return make_match_info(match_id, CHAMPIONS[:10])
+
+
+class TestMatchStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'league.db')
+        make_league_db(self.path, [('NA1_1', 1, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9)])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_extract_match_row(self):
+        store = MatchStore(self.path)
+        row = extract_match_row(make_match_info('NA1_2', CHAMPIONS[2:12], team1_win=False), store.champion_ids)
+        self.assertEqual(row, ('NA1_2', 0, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11))
+        self.assertIsNone(extract_match_row(make_match_info('NA1_3', CHAMPIONS[:9]), store.champion_ids))
+        store.close()
+
+    def test_enqueue_skips_stored_matches(self):
+        store = MatchStore(self.path)
+        self.assertEqual(store.enqueue(['NA1_1', 'NA1_2', 'NA1_2']), 1)
+        self.assertEqual(store.pending(), ['NA1_2'])
+        store.close()
+
+    def test_crawl_resumes_from_frontier(self):
+        store = MatchStore(self.path, batch_size=2)
+        store.enqueue(['NA1_2', 'NA1_3'])
+        store.close()
+
+        store = MatchStore(self.path, batch_size=2)
+        client = FakeMatchClient(['NA1_1', 'NA1_4'])
+        stored = DataCollector(client).crawl_to_store(['puuid'], store, max_workers=2)
+        self.assertEqual(stored, 3)
+        self.assertEqual(client.fetched, ['NA1_2', 'NA1_3', 'NA1_4'])
+        self.assertEqual(store.count(), 4)
+        self.assertEqual(store.pending(), [])
+        store.close()
+
+    def test_filter_by_time_patch_and_rank(self):
+        store = MatchStore(self.path)
+        store.enqueue(['NA1_2'], 'GOLD', 'II')
+        store.enqueue(['NA1_3'], 'SILVER', 'I')
+        store.add_match('NA1_2', make_match_info('NA1_2', CHAMPIONS[:10], game_creation=1704067200000))
+        store.add_match('NA1_3', make_match_info('NA1_3', CHAMPIONS[2:12], game_version='14.2.1.1',
+                                                 game_creation=1705276800000))
+        store.add_match('NA1_4', make_match_info('NA1_4', CHAMPIONS[1:11], game_creation=1704153600000))
+        store.close()
+
+        def ids(**filters):
+            return sorted(MatchColumns.from_db(self.path, **filters)['match_id'].astype(str))
+
+        self.assertEqual(ids(), ['NA1_2', 'NA1_3', 'NA1_4'])
+        self.assertEqual(ids(tier='GOLD', division='II'), ['NA1_2'])
+        self.assertEqual(ids(patch=1402), ['NA1_3'])
+        self.assertEqual(ids(start='2024-01-01', end='2024-01-02'), ['NA1_2'])
+        self.assertEqual(ids(start=1704067200001), ['NA1_3', 'NA1_4'])
+        columns = MatchColumns.from_db(self.path, tier='SILVER')
+        self.assertEqual(columns['champions'].tolist(), [list(range(2, 12))])
+        self.assertEqual(columns['division'].tolist(), [1])
+
+        conn = sqlite3.connect(self.path)
+        plan = ' '.join(row[-1] for row in conn.execute(
+            'EXPLAIN QUERY PLAN SELECT id FROM MatchInfo WHERE tier = 4 AND division = 2 AND patch = 1401'))
+        time_plan = ' '.join(row[-1] for row in conn.execute(
+            'EXPLAIN QUERY PLAN SELECT id FROM MatchInfo WHERE tier = 4 AND division = 2 '
+            'AND game_creation >= 1704067200000 AND game_creation < 1704153600000'))
+        conn.close()
+        self.assertIn('SEARCH MatchInfo USING INDEX MatchInfo_rank', plan)
+        self.assertIn('MatchInfo_rank_time (tier=? AND division=? AND game_creation>? AND game_creation<?)', time_plan)
+
+        collector = DataCollector(FakeMatchClient([]), db_path=self.path)
+        collector.load_matches(start='2024-01-01')
+        collector.filter_matches_by_time('2024-01-01', '2024-01-03')
+        self.assertEqual(collector.match_data['matchId'].tolist(), ['NA1_2', 'NA1_4'])
+        collector.filter_matches_by_division('GOLD', 'II')
+        self.assertEqual(collector.match_data['matchId'].tolist(), ['NA1_2'])
+        # Both APIs include the start and exclude the end
+        collector.load_matches()
+        collector.filter_matches_by_time('2024-01-01', '2024-01-02')
+        self.assertEqual(collector.match_data['matchId'].tolist(), ids(start='2024-01-01', end='2024-01-02'))
+
+class TestPipeline(unittest.TestCase):
+    def test_stages_overlap_and_preserve_items(self):
+        first_output = threading.Event()
+        pipeline = (Pipeline()
+                    .stage('double', lambda x: [x, x], workers=2)
+                    .stage('square', lambda x: [x * x], workers=3))
+
+        def source():
+            yield 1
+            # The rest of the source waits until an item has made it through every stage
+            self.assertTrue(first_output.wait(5))
+            yield from range(2, 6)
+
+        results = []
+        for result in pipeline.run(source()):
+            first_output.set()
+            results.append(result)
+        self.assertEqual(sorted(results), sorted([x * x for x in range(1, 6)] * 2))
+        self.assertEqual(pipeline.stats()['double']['emitted'], 10)
+
+    def test_bounded_queues_apply_backpressure(self):
+        release = threading.Event()
+        pipeline = (Pipeline(output_maxsize=1)
+                    .stage('produce', lambda x: [x], maxsize=2)
+                    .stage('slow', lambda x: [x] if release.wait(5) else [], maxsize=2))
+        outputs = pipeline.run(range(100))
+        time.sleep(0.2)
+        self.assertTrue(all(depth <= 2 for depth in pipeline.depths().values()))
+        release.set()
+        self.assertEqual(sorted(outputs), list(range(100)))
+
+    def test_errors_are_counted_and_skipped(self):
+        pipeline = Pipeline().stage('invert', lambda x: [1 / x])
+        self.assertEqual(list(pipeline.run([1, 0, 2])), [1.0, 0.5])
+        self.assertEqual(pipeline.stats()['invert']['errors'], 1)
+
+class FakeSummonerClient:
+    region = 'NA1'
+
+    def __init__(self):
+        self.lookups = []
+
+    def get_summoner_puuid(self, summoner_name):
+        self.lookups.append(summoner_name)
+        return None if summoner_name == 'missing' else f'puuid-{summoner_name}'
+
+    def get_summoner_puuid_by_id(self, summoner_id):
+        self.lookups.append(summoner_id)
+        return f'puuid-{summoner_id}'
+
+
+class TestPuuidResolver(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = PuuidCache(os.path.join(self.tmpdir.name, 'puuids.db'))
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmpdir.cleanup()
+
+    def test_deduplicates_and_skips_failures(self):
+        client = FakeSummonerClient()
+        resolver = PuuidResolver(client, self.cache)
+        entries = [{'summonerName': 'One'}, {'summonerName': 'one'}, {'summonerId': 'id-2', 'summonerName': 'Two'},
+                   {'puuid': 'known'}, {'summonerName': 'missing'}]
+        puuids = list(resolver.resolve(entries))
+        self.assertEqual(puuids[0], 'known')
+        self.assertEqual(sorted(puuids), ['known', 'puuid-id-2', 'puuid-one'])
+        self.assertEqual(sorted(client.lookups), ['id-2', 'missing', 'one'])
+        self.assertEqual(resolver.stats['duplicates'], 1)
+        self.assertEqual(resolver.stats['failed'], 1)
+
+    def test_cache_persists_between_crawls(self):
+        list(PuuidResolver(FakeSummonerClient(), self.cache).resolve([{'summonerId': 'id-1'}]))
+        self.cache.close()
+        self.cache = PuuidCache(os.path.join(self.tmpdir.name, 'puuids.db'))
+        client = FakeSummonerClient()
+        resolver = PuuidResolver(client, self.cache)
+        self.assertEqual(list(resolver.resolve([{'summonerId': 'id-1'}])), ['puuid-id-1'])
+        self.assertEqual(client.lookups, [])
+        self.assertEqual(resolver.stats['cache_hits'], 1)
+        # The same summoner ID on another platform is a different player
+        list(PuuidResolver(client, self.cache, platform='EUW1').resolve([{'summonerId': 'id-1'}]))
+        self.assertEqual(client.lookups, ['id-1'])
+
+class FakePlatformClient:
+    def __init__(self, platform, match_ids):
+        self.platform = platform
+        self.match_ids = match_ids
+        self.fetched = []
+
+    def get_league_entries(self, queue, tier, division, page=1):
+        return [{'puuid': f'{self.platform}-{tier}-{division}-{i}'} for i in range(2)]
+
+    def get_match_ids(self, puuid, num_matches=10):
+        return self.match_ids[:num_matches]
+
+    def get_match_details(self, match_id):
+        self.fetched.append(match_id)
+        return make_match_info(match_id, CHAMPIONS[:10])
+
+
+class TestCrawlOrchestrator(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'league.db')
+        make_league_db(self.path, [('NA1_1', 1, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9)])
+        match_ids = {'NA1': ['NA1_1', 'NA1_2', 'NA1_3'], 'EUW1': ['EUW1_1', 'EUW1_2']}
+        self.clients = {platform: FakePlatformClient(platform, ids) for platform, ids in match_ids.items()}
+        self.orchestrator = CrawlOrchestrator('test_key', platforms=['NA1', 'EUW1'], tiers=['GOLD', 'SILVER'],
+                                              divisions=['I', 'II'], client_factory=self.clients.get)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_match_platform(self):
+        self.assertEqual(match_platform('EUW1_6543210'), 'EUW1')
+
+    def test_discover_deduplicates_across_shards(self):
+        self.assertEqual(len(self.orchestrator.shards()), 8)
+        match_ids = self.orchestrator.discover(num_matches=10)
+        self.assertEqual(sorted(match_ids), ['EUW1_1', 'EUW1_2', 'NA1_1', 'NA1_2', 'NA1_3'])
+        shards = self.orchestrator.report()['shards']
+        self.assertEqual(len(shards), 8)
+        self.assertEqual(sum(stats['new_match_ids'] for stats in shards.values()), 5)
+        self.assertEqual(shards['NA1/GOLD/I/1']['puuids'], 2)
+
+    def test_crawl_fetches_each_match_from_its_platform(self):
+        store = MatchStore(self.path, batch_size=2)
+        self.assertEqual(self.orchestrator.crawl(store, num_matches=10), 4)
+        self.assertEqual(sorted(self.clients['NA1'].fetched), ['NA1_2', 'NA1_3'])
+        self.assertEqual(sorted(self.clients['EUW1'].fetched), ['EUW1_1', 'EUW1_2'])
+        self.assertEqual(store.count(), 5)
+        store.close()
+        report = self.orchestrator.report()
+        platforms = report['platforms']
+        self.assertEqual(platforms['EUW1']['stored'], 2)
+        self.assertEqual(report['stages']['NA1']['match_details']['processed'], 2)
+        self.assertEqual(self.orchestrator.depths()['NA1']['match_details'], 0)
+        self.assertEqual(platforms['EUW1']['route'], 'europe')
+        conn = sqlite3.connect(self.path)
+        ranks = conn.execute('SELECT tier, division FROM MatchInfo').fetchall()
+        conn.close()
+        # Stored with the rank of the first shard each match was found on
+        self.assertEqual(len(ranks), 4)
+        self.assertTrue(all(tier in (3, 4) and division in (1, 2) for tier, division in ranks))
+
+    def test_resume_skips_queues_of_other_platforms(self):
+        store = MatchStore(self.path, batch_size=2)
+        # More than a batch of another platform's leftovers ahead of one of this crawl's
+        store.enqueue([f'KR_{i}' for i in range(5)] + ['NA1X_1', 'NA1_9'])
+        orchestrator = CrawlOrchestrator('test_key', platforms=['NA1'],
+                                         client_factory={'NA1': FakePlatformClient('NA1', [])}.get)
+        self.assertEqual(orchestrator.crawl(store), 1)
+        self.assertEqual(orchestrator.clients['NA1'].fetched, ['NA1_9'])
+        self.assertEqual(store.pending(platforms=['NA1']), [])
+        self.assertEqual(len(store.pending()), 6)
+        store.close()
+
+    def test_failed_enqueue_is_rediscovered(self):
+        class LockedFrontier:
+            def enqueue(self, match_ids, tier=None, division=None):
+                raise sqlite3.OperationalError('database is locked')
+
+        item = (('NA1', 'GOLD', 'I', 1), 'NA1_2')
+        self.assertEqual(self.orchestrator._dedupe(item), [item])
+        with self.assertRaises(sqlite3.OperationalError):
+            self.orchestrator._enqueue(LockedFrontier(), item)
+        self.assertEqual(self.orchestrator._dedupe(item), [item])
+        store = MatchStore(self.path)
+        self.assertEqual(store.conn.execute('PRAGMA journal_mode').fetchone()[0], 'delete')
+        self.assertEqual(self.orchestrator._enqueue(store, item), ['NA1_2'])
+        store.close()
+
+class TestRiotSimulator(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.directory.name, 'league.db')
+        make_league_db(self.db_path, [(f'NA1_{i}',) + row for i, row in enumerate(TestMatchDataset.ROWS)])
+        self.league = SyntheticLeague(self.db_path, num_players=20)
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        self.directory.cleanup()
+
+    def serve(self, simulator):
+        server = make_simulator_server(simulator)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.servers.append(server)
+        return f'http://127.0.0.1:{server.server_address[1]}'
+
+    def test_match_payload_round_trips(self):
+        champion_ids = {name.lower(): i for i, name in enumerate(CHAMPIONS)}
+        for i, row in enumerate(TestMatchDataset.ROWS):
+            match_id = self.league.match_id(i)
+            self.assertEqual(extract_match_row(self.league.match(match_id), champion_ids), (match_id,) + row)
+        self.assertIsNone(self.league.match('EUW1_1'))
+
+    def test_client_reads_through_simulator(self):
+        transport = PooledTransport()
+        redirect_transport(transport, self.serve(RiotSimulator(self.league)))
+        client = RiotAPIClient('key', transport=transport, rate_limiter=RiotRateLimiter('1000:1'))
+        puuid = self.league.match('NA1_1')['metadata']['participants'][0]
+        match_ids = client.get_match_ids(puuid, 3)
+        self.assertEqual(match_ids, self.league.match_ids(puuid, count=3))
+        self.assertEqual(client.get_match_details(match_ids[0])['metadata']['matchId'], match_ids[0])
+        entries = client.get_league_entries('RANKED_SOLO_5x5', 'IRON', 'I')
+        self.assertEqual(client.get_summoner_puuid_by_id(entries[0]['summonerId']), entries[0]['puuid'])
+
+    def test_rate_limit_and_errors(self):
+        simulator = RiotSimulator(self.league, rate_limits='2:10')
+        statuses = [simulator.respond('americas', '/lol/match/v5/matches/NA1_1', {})[0] for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        status, headers, _ = simulator.respond('americas', '/lol/match/v5/matches/NA1_1', {})
+        self.assertEqual(int(headers['Retry-After']), 10)
+        self.assertEqual(simulator.respond('na1', '/lol/match/v5/matches/NA1_1', {})[0], 200)
+        failing = RiotSimulator(self.league, error_rate=1.0)
+        self.assertEqual(failing.respond('americas', '/lol/match/v5/matches/NA1_1', {})[0], 500)
+        self.assertEqual(failing.stats['errors'], 1)
+
+    def test_benchmark(self):
+        result = run_benchmark(self.db_path, num_players=10, matches_per_player=3, latency_ms=0, jitter_ms=0,
+                               max_workers=2)
+        self.assertGreater(result['matches'], 0)
+        self.assertEqual(result['requests']['rate_limited'], 0)
+        self.assertGreater(result['quota_utilization'], 0)
+        self.assertIn('peak_kib_per_1k_matches', result)
+        self.assertIn('riot_http_latency_ms{endpoint="match/v5/matches/{}"}', result['metrics']['histograms'])
+        self.assertIn('collector_stage_latency_ms{stage="match_details"}', result['metrics']['histograms'])
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_counters_and_histograms(self):
+        registry = MetricsRegistry()
+        registry.counter('requests_total', endpoint='a', status=200).inc()
+        registry.counter('requests_total', endpoint='a', status=200).inc(2)
+        with registry.timer('latency_ms', endpoint='a'):
+            pass
+        snapshot = registry.snapshot()
+        self.assertEqual(snapshot['counters'], {'requests_total{endpoint="a",status="200"}': 3})
+        self.assertEqual(snapshot['histograms']['latency_ms{endpoint="a"}']['count'], 1)
+        text = registry.to_prometheus()
+        self.assertIn('# TYPE requests_total counter\nrequests_total{endpoint="a",status="200"} 3', text)
+        self.assertIn('latency_ms_bucket{endpoint="a",le="+Inf"} 1', text)
+        self.assertIn('latency_ms_count{endpoint="a"} 1', text)
+        registry.counter('errors_total', message='bad "id"\\n\nnext').inc()
+        self.assertIn('errors_total{message="bad \\"id\\"\\\\n\\nnext"} 1', registry.to_prometheus())
+
+    def test_write(self):
+        registry = MetricsRegistry()
+        registry.counter('requests_total').inc()
+        with tempfile.TemporaryDirectory() as directory:
+            registry.write(os.path.join(directory, 'metrics.json'))
+            registry.write(os.path.join(directory, 'metrics.prom'))
+            with open(os.path.join(directory, 'metrics.json')) as f:
+                self.assertEqual(json.load(f)['counters'], {'requests_total': 1})
+            with open(os.path.join(directory, 'metrics.prom')) as f:
+                self.assertIn('requests_total 1', f.read())
+
+    def test_sampling_profiler(self):
+        stop = threading.Event()
+
+        def busy():
+            while not stop.is_set():
+                sum(range(1000))
+
+        thread = threading.Thread(target=busy)
+        thread.start()
+        profiler = SamplingProfiler(interval=0.001)
+        self.assertTrue(profiler.toggle())
+        deadline = time.monotonic() + 0.1
+        while time.monotonic() < deadline:
+            # Reading while the sampler writes must not trip over the changing dict
+            profiler.folded()
+            profiler.top()
+        self.assertFalse(profiler.toggle())
+        stop.set()
+        thread.join()
+        self.assertGreater(profiler.samples, 0)
+        self.assertTrue(any('testing.py:busy' in stack for stack in profiler.stacks))
+        self.assertIn(' ', profiler.folded())
+
+class TestMatchColumns(unittest.TestCase):
+    def setUp(self):
+        self.champion_ids = {name.lower(): i for i, name in enumerate(CHAMPIONS)}
+
+    def test_append_grows_and_projects(self):
+        columns = MatchColumns(capacity=1)
+        for i in range(3):
+            self.assertTrue(columns.append_payload(make_match_info(f'NA1_{i}', CHAMPIONS[i:i + 10]), self.champion_ids))
+        self.assertFalse(columns.append_payload(make_match_info('NA1_9', CHAMPIONS[:9]), self.champion_ids))
+        frame = columns.to_dataframe()
+        self.assertEqual(len(frame), 3)
+        self.assertEqual(frame['team1_top'].dtype, 'int16')
+        self.assertEqual(frame['team2_support'].tolist(), [9, 10, 11])
+        self.assertEqual(frame['patch'].tolist(), [1401] * 3)
+
+    def test_save_and_load_memory_mapped(self):
+        columns = MatchColumns()
+        columns.append_payload(make_match_info('NA1_1', CHAMPIONS[:10], team1_win=False), self.champion_ids)
+        with tempfile.TemporaryDirectory() as directory:
+            columns.save(directory)
+            loaded = MatchColumns.load(directory)
+            self.assertEqual(len(loaded), 1)
+            self.assertEqual(loaded['match_id'][0], b'NA1_1')
+            self.assertEqual(loaded['team1_win'][0], 0)
+            self.assertEqual(loaded['champions'][0].tolist(), list(range(10)))
+
+    def test_to_epoch_ms(self):
+        for value in [1704067200000, np.int64(1704067200000), 1704067200000.0, np.float64(1704067200000),
+                      '2024-01-01', '2024-01-01T01:00:00+01:00']:
+            self.assertEqual(to_epoch_ms(value), 1704067200000)
+
+    def test_collector_keeps_projected_matches(self):
+        collector = DataCollector(FakeMatchClient(['NA1_1', 'NA1_2']), champion_ids=self.champion_ids)
+        collector.collect_match_data_concurrent(['puuid1', 'puuid2'], max_workers=2)
+        self.assertEqual(collector.match_data['matchId'].tolist(), ['NA1_1', 'NA1_2'])
+        self.assertNotIn('info', collector.match_data.columns)
+
+class TestChampionWinRates(unittest.TestCase):
+    MATCHES = [
+        [1, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+        [0, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+        [1, 5, 6, 7, 8, 9, 0, 1, 2, 3, 4],
+    ]
+
+    def test_counts_per_champion_and_role(self):
+        stats = ChampionWinRates(num_champions=10)
+        stats.update(self.MATCHES)
+        frame = stats.to_dataframe()
+        self.assertEqual(frame.loc[0, 'wins'], 1)
+        self.assertEqual(frame.loc[0, 'losses'], 2)
+        self.assertEqual(frame.loc[5, 'winrate'], 2 / 3)
+        by_role = stats.to_dataframe(by_role=True)
+        self.assertEqual(by_role.loc[(0, 'top'), 'wins'], 1)
+        self.assertEqual(by_role.loc[(0, 'top'), 'losses'], 2)
+
+    def test_incremental_batches_match_full_recompute(self):
+        full = ChampionWinRates(num_champions=10)
+        full.update(self.MATCHES)
+        incremental = ChampionWinRates(num_champions=10)
+        incremental.update(self.MATCHES[:1])
+        incremental.update(self.MATCHES[1:])
+        self.assertTrue((full.wins == incremental.wins).all())
+        self.assertTrue((full.games == incremental.games).all())
+
+    def test_process_match_data_accepts_payloads(self):
+        champion_ids = {name.lower(): i for i, name in enumerate(CHAMPIONS)}
+        collector = DataCollector(None, champion_ids=champion_ids)
+        collector.process_match_data([make_match_info('NA1_1', CHAMPIONS[:10])])
+        collector.process_match_data([make_match_info('NA1_2', CHAMPIONS[:10], team1_win=False)])
+        self.assertEqual(collector.champion_winrate_data.loc[0, 'wins'], 1)
+        self.assertEqual(collector.champion_winrate_data.loc[0, 'winrate'], 0.5)
+
+    def test_process_match_data_rebuilds_collected_counts(self):
+        collector = DataCollector(FakeMatchClient(['NA1_1', 'NA1_2']),
+                                  champion_ids={name.lower(): i for i, name in enumerate(CHAMPIONS)})
+        collector.collect_match_data_concurrent(['puuid1'], max_workers=1)
+        collector.process_match_data()
+        collector.process_match_data()
+        self.assertEqual(collector.champion_winrate_data.loc[0, 'wins'], 2)
+
+class TestConfidenceIntervals(unittest.TestCase):
+    def test_wilson_interval(self):
+        low, high = wilson_interval([5, 0], [10, 0])
+        self.assertAlmostEqual(low[0], 0.2366, places=4)
+        self.assertAlmostEqual(high[0], 0.7634, places=4)
+        self.assertTrue(np.isnan(low[1]))
+
+    def test_bootstrap_interval(self):
+        wins, games = np.array([[500, 5], [0, 1]]), np.array([[1000, 10], [0, 1]])
+        with tempfile.TemporaryDirectory() as directory:
+            low, high = bootstrap_interval(wins, games, total=5000, resamples=500, processes=1, cache_dir=directory)
+            self.assertEqual(len(os.listdir(directory)), 1)
+            cached_low, _ = bootstrap_interval(wins, games, total=5000, resamples=500, cache_dir=directory)
+        np.testing.assert_array_equal(low, cached_low)
+        self.assertEqual(low.shape, (2, 2))
+        wilson_low, wilson_high = wilson_interval(wins, games)
+        self.assertAlmostEqual(low[0, 0], wilson_low[0, 0], delta=0.01)
+        self.assertAlmostEqual(high[0, 0], wilson_high[0, 0], delta=0.01)
+        self.assertTrue(low[0, 1] < 0.5 < high[0, 1])
+        self.assertTrue(np.isnan(low[1, 0]))
+        self.assertEqual((low[1, 1], high[1, 1]), (1.0, 1.0))
+
+    def test_bootstrap_interval_without_matches(self):
+        low, high = bootstrap_interval(np.zeros(3), np.zeros(3), total=0, processes=1)
+        self.assertTrue(np.isnan(low).all() and np.isnan(high).all())
+
+class TestMatchupIndex(unittest.TestCase):
+    # Champion 0 always wins alongside 1 and always loses to 11
+    MATCHES = [
+        [1, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+        [1, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+        [0, 0, 10, 2, 3, 4, 11, 6, 7, 8, 9],
+        [1, 5, 6, 7, 8, 9, 11, 1, 2, 3, 4],
+    ]
+
+    def setUp(self):
+        self.index = MatchupIndex(num_champions=12)
+        self.index.update(self.MATCHES)
+
+    def test_pair_counts(self):
+        self.assertEqual(self.index.synergy_games[0, 1, 0, 1], 2)
+        self.assertEqual(self.index.synergy_wins[0, 1, 0, 1], 2)
+        self.assertEqual(self.index.synergy_games.sum(axis=(0, 1))[1, 0], 2)
+        self.assertEqual(self.index.counter_games[0, 0, 0, 11], 1)
+        self.assertEqual(self.index.counter_wins[0, 0, 11, 0], 1)
+        self.assertGreater(self.index.counter_delta[11, 0], 0)
+        self.assertLess(self.index.counter_delta[0, 11], 0)
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'index.npz')
+            self.index.save(path)
+            loaded = MatchupIndex.load(path)
+        self.assertTrue((loaded.counter_wins == self.index.counter_wins).all())
+        self.assertTrue((loaded.synergy_delta == self.index.synergy_delta).all())
+
+    def test_predict_champion_pick(self):
+        engine = InferenceEngine(self.index)
+        self.assertEqual(engine.predict_champion_pick([1], [0, 10]), 0)
+        self.assertEqual(engine.predict_champion_pick({'jungle': 1}, [0, 10], role='top'), 0)
+        ranking = engine.rank_champion_picks([], [0, 11], enemy_team=[0])
+        self.assertEqual(ranking[0][0], 11)
+        self.assertIsNone(engine.predict_champion_pick([1], []))
+
+    def test_rank_by_lower_bound(self):
+        # Champion 0 won all 3 of its games, champion 1 won 17 of 20
+        filler = [2, 3, 4, 5, 6, 7, 8, 9, 10]
+        matches = [[1, 0] + filler] * 3 + [[1, 1] + filler] * 17 + [[0, 1] + filler] * 3
+        index = MatchupIndex(num_champions=12, prior_games=1)
+        index.update(matches)
+        engine = InferenceEngine(index)
+        self.assertEqual(engine.predict_champion_pick([], [0, 1]), 0)
+        self.assertEqual(engine.predict_champion_pick([], [0, 1], confidence=0.95), 1)
+        self.assertEqual(engine.predict_champion_pick({}, [0, 1], role='top', confidence=0.95), 1)
+
+    def test_predict_win_probabilities_in_chunks(self):
+        engine = InferenceEngine(self.index)
+        drafts = np.array([match[1:] for match in self.MATCHES] * 3)
+        probabilities = engine.predict_win_probabilities(drafts, chunk_size=5)
+        self.assertEqual(probabilities.shape, (12,))
+        self.assertTrue(np.allclose(probabilities, engine.predict_win_probabilities(drafts)))
+        self.assertGreater(probabilities[0], 0.5)
+        self.assertLess(probabilities[2], 0.5)
+        # Swapping sides mirrors the prediction
+        swapped = engine.predict_win_probabilities(drafts[:, [5, 6, 7, 8, 9, 0, 1, 2, 3, 4]])
+        self.assertTrue(np.allclose(probabilities + swapped, 1))
+        with self.assertRaises(ValueError):
+            engine.predict_win_probabilities(np.array(self.MATCHES))
+
+class TestDraftSearch(unittest.TestCase):
+    def setUp(self):
+        self.index = MatchupIndex(num_champions=12)
+        self.index.update(TestMatchupIndex.MATCHES)
+
+    def minimax(self, search, ally, enemy, available, order):
+        if not order or not available:
+            return search.evaluate(ally, enemy)
+        values = []
+        for champion in available:
+            if order[0] == 'ally':
+                values.append(self.minimax(search, ally + (champion,), enemy, available - {champion}, order[1:]))
+            else:
+                values.append(self.minimax(search, ally, enemy + (champion,), available - {champion}, order[1:]))
+        return max(values) if order[0] == 'ally' else min(values)
+
+    def test_default_pick_order(self):
+        self.assertEqual(default_pick_order(0, 0), ['ally', 'enemy'] * 5)
+        self.assertEqual(default_pick_order(4, 2), ['enemy', 'enemy', 'ally', 'enemy'])
+
+    def test_matches_full_minimax_when_unpruned(self):
+        search = DraftSearch(self.index, beam_width=12, time_budget=10)
+        ally, enemy, available = (1, 2, 3), (5, 6, 7), frozenset([0, 4, 8, 10, 11])
+        order = ['ally', 'enemy', 'ally', 'enemy']
+        champion, value = search.best_pick(ally, enemy, available, order)
+        self.assertAlmostEqual(value, self.minimax(search, ally, enemy, available, order), places=5)
+        self.assertAlmostEqual(value, self.minimax(search, ally + (champion,), enemy, available - {champion}, order[1:]),
+                               places=5)
+        self.assertEqual(search.depth_reached, 4)
+        self.assertTrue(search.table)
+
+    def test_answers_within_zero_budget(self):
+        search = DraftSearch(self.index, beam_width=4, time_budget=0)
+        champion, _ = search.best_pick([1], [], range(12))
+        self.assertIn(champion, range(12))
+        self.assertNotEqual(champion, 1)
+
+    def test_engine_search_mode(self):
+        engine = InferenceEngine(self.index)
+        self.assertIn(engine.search_champion_pick([1], [0, 10, 11], [5], time_budget=0.5), [0, 10, 11])
+        self.assertIsNone(engine.search_champion_pick([1], [1], []))
+
+class TestMatchDataset(unittest.TestCase):
+    ROWS = [(1, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9), (0, 11, 1, 2, 3, 4, 5, 6, 7, 8, 10)]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.directory.name, 'cache')
+        self.csv_path = os.path.join(self.directory.name, 'minified.csv')
+        with open(self.csv_path, 'w') as f:
+            f.write(','.join(MATCH_COLUMNS) + '\n')
+            f.writelines(','.join(map(str, row)) + '\n' for row in self.ROWS)
+        self.db_path = os.path.join(self.directory.name, 'league.db')
+        make_league_db(self.db_path, [(f'NA1_{i}',) + row for i, row in enumerate(self.ROWS)])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_csv_and_db_load_the_same_compact_frame(self):
+        from_csv = load_matches(self.csv_path, self.cache_dir)
+        from_db = load_matches(self.db_path, self.cache_dir)
+        self.assertEqual(from_csv['team1_win'].dtype, np.int8)
+        self.assertEqual(from_csv['team2_support'].dtype, np.int16)
+        self.assertTrue(from_csv.equals(from_db))
+        self.assertEqual(from_csv.values.tolist(), [list(row) for row in self.ROWS])
+
+    def test_arrays_are_memory_mapped(self):
+        team1_win, champions = MatchDataset(self.csv_path, self.cache_dir).arrays()
+        self.assertIsInstance(champions, np.memmap)
+        self.assertEqual(champions.shape, (2, 10))
+
+    def test_cache_invalidated_by_content_not_mtime(self):
+        dataset = MatchDataset(self.csv_path, self.cache_dir)
+        dataset.arrays()
+        os.utime(self.csv_path, ns=(0, 0))
+        self.assertTrue(dataset.is_fresh())
+        with open(self.csv_path, 'a') as f:
+            f.write(','.join(['1'] + ['0'] * 10) + '\n')
+        self.assertFalse(dataset.is_fresh())
+        self.assertEqual(len(dataset.arrays()[0]), 3)
+
+    def test_cache_sees_rows_in_a_wal_file(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('PRAGMA journal_mode=WAL')
+        dataset = MatchDataset(self.db_path, self.cache_dir)
+        dataset.arrays()
+        conn.execute('INSERT INTO Match VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', ('NA1_9',) + self.ROWS[0])
+        conn.commit()
+        self.assertFalse(dataset.is_fresh())
+        self.assertEqual(len(dataset.arrays()[0]), 3)
+        conn.close()
+
+class TestCompositionStats(unittest.TestCase):
+    def setUp(self):
+        self.stats = CompositionStats(TestMatchupIndex.MATCHES)
+
+    def test_keys_ignore_order(self):
+        keys = pack_keys([[4, 0, 2, 1, 3], [0, 1, 2, 3, 4], [0, 1, 2, 3, 5]])
+        self.assertEqual(keys[0], keys[1])
+        self.assertNotEqual(keys[1], keys[2])
+        self.assertEqual(unpack_key(keys[0], 5), (0, 1, 2, 3, 4))
+
+    def test_full_and_partial_compositions(self):
+        self.assertEqual(self.stats.lookup([4, 3, 2, 1, 0]), (2, 2))
+        self.assertEqual(self.stats.lookup([1, 0]), (2, 2))
+        self.assertEqual(self.stats.lookup([1, 2, 3]), (2, 3))
+        self.assertEqual(self.stats.lookup([0, 11]), (0, 0))
+        # Team 2 of the last match is counted from its own side
+        self.assertEqual(self.stats.lookup([11, 1, 2, 3, 4]), (0, 1))
+
+    def test_query_filters(self):
+        duos = self.stats.query(2, min_games=3, containing=[2])
+        self.assertTrue(all(2 in champions for champions in duos['champions']))
+        self.assertTrue((duos['games'] >= 3).all())
+        self.assertEqual(duos['champions'].iloc[0], (0, 2))
+
+class TestStatsStore(unittest.TestCase):
+    DAY = 19723  # 2024-01-01
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.directory.name, 'league.db')
+        self.stats_dir = os.path.join(self.directory.name, 'stats')
+        make_league_db(self.db_path, [('NA1_1', 1, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9)])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def store_matches(self, matches):
+        store = MatchStore(self.db_path)
+        for match_id, day, version in matches:
+            store.add_match(match_id, make_match_info(match_id, CHAMPIONS[:10], game_version=version,
+                                                      game_creation=day * DAY_MS + 1000))
+        store.close()
+
+    def test_sync_applies_only_new_matches(self):
+        stats = StatsStore(self.stats_dir, num_champions=12)
+        self.assertEqual(stats.sync(self.db_path), 1)
+        self.store_matches([('NA1_2', self.DAY, '14.1.1'), ('NA1_3', self.DAY + 1, '14.2.1')])
+        self.assertEqual(stats.sync(self.db_path), 2)
+        self.assertEqual(stats.sync(self.db_path), 0)
+        self.assertEqual(stats._buckets, {})
+        reloaded = StatsStore(self.stats_dir, num_champions=12)
+        self.assertEqual(reloaded.high_water_mark, 3)
+        self.assertEqual(reloaded.total.champion_games[0, 0], 3)
+        self.assertEqual(reloaded.total.synergy_wins[0, 1, 0, 1], 3)
+
+    def test_crash_before_totals_are_saved_does_not_double_count(self):
+        self.store_matches([('NA1_2', self.DAY, '14.1.1')])
+        stats = StatsStore(self.stats_dir, num_champions=12)
+        save = stats._save
+
+        def crash_on_totals(index, path, high_water_mark):
+            if path.endswith('total.npz'):
+                raise OSError('disk full')
+            save(index, path, high_water_mark)
+
+        stats._save = crash_on_totals
+        with self.assertRaises(OSError):
+            stats.sync(self.db_path)
+        reloaded = StatsStore(self.stats_dir, num_champions=12)
+        self.assertEqual(reloaded.high_water_mark, 0)
+        self.assertEqual(reloaded.sync(self.db_path), 2)
+        self.assertEqual(reloaded.total.champion_games[0, 0], 2)
+        self.assertEqual(reloaded.index(patch=1401).champion_games[0, 0], 1)
+
+    def test_windows(self):
+        self.store_matches([('NA1_2', self.DAY - 30, '13.24.1'), ('NA1_3', self.DAY, '14.1.1'),
+                            ('NA1_4', self.DAY, '14.1.1')])
+        StatsStore(self.stats_dir, num_champions=12).sync(self.db_path)
+        stats = StatsStore(self.stats_dir, num_champions=12)
+        now_ms = self.DAY * DAY_MS + 5000
+        self.assertEqual(stats.buckets(days=14, now_ms=now_ms), [(1401, self.DAY)])
+        self.assertEqual(stats.index(days=14, now_ms=now_ms).champion_games[0, 0], 2)
+        self.assertEqual(stats.index(patch=1324).champion_games[0, 0], 1)
+        self.assertEqual(stats.index().champion_games[0, 0], 4)
+
+class TestDataAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.directory.name, 'league.db')
+        make_league_db(self.db_path, [(f'NA1_{i}',) + row for i, row in enumerate(TestMatchDataset.ROWS * 2)])
+        self.analysis = DataAnalysis(self.db_path, os.path.join(self.directory.name, 'cache'), self.db_path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_compute_win_rates(self):
+        win_rates = self.analysis.compute_win_rates().set_index('championName')
+        self.assertEqual(win_rates.loc['Aatrox', 'total_games'], 2)
+        self.assertEqual(win_rates.loc['Aatrox', 'win_rate'], 100)
+        self.assertEqual(win_rates.loc['Lux', 'win_rate'], 0)
+        self.assertEqual(win_rates.loc['Ahri', 'total_games'], 4)
+
+    def test_compute_composition(self):
+        compositions = self.analysis.compute_composition(top_n=1)
+        self.assertEqual(compositions['composition'].tolist(), ['Aatrox / Ahri / Akali / Alistar / Ashe'])
+        self.assertEqual(compositions['total'].tolist(), [2])
+
+    def test_rank_by_lower_bound(self):
+        win_rates = self.analysis.compute_win_rates(rank_by='lower_bound')
+        self.assertTrue((win_rates['win_rate_low'] <= win_rates['win_rate']).all())
+        self.assertTrue(win_rates['win_rate_low'].is_monotonic_decreasing)
+        names = win_rates['championName'].tolist()
+        self.assertLess(names.index('Aatrox'), names.index('Ahri'))
+        self.assertEqual(names[-1], 'Lux')
+        by_role = self.analysis.compute_win_rates(interval='bootstrap', by_role=True)
+        self.assertIn('role', by_role)
+        self.assertTrue(os.listdir(os.path.join(self.directory.name, 'cache', 'intervals')))
+        compositions = self.analysis.compute_composition(top_n=2, interval='wilson', rank_by='lower_bound')
+        self.assertEqual(compositions['total'].tolist(), [2, 2])
+        self.assertIn('win_rate_high', compositions)
+
+    def test_lower_bound_ranking_ignores_bootstrap_of_perfect_records(self):
+        db_path = os.path.join(self.directory.name, 'skewed.db')
+        # Aatrox wins all 3 of its games; Ahri wins 171 of 300 (57%)
+        matches = [(1, 0, 1, 3, 4, 5, 6, 7, 8, 9, 10)] * 3 + [(int(i < 168), 2, 1, 3, 4, 5, 6, 7, 8, 9, 10)
+                                                          for i in range(297)]
+        make_league_db(db_path, [(f'NA1_{i}',) + row for i, row in enumerate(matches)])
+        analysis = DataAnalysis(db_path, os.path.join(self.directory.name, 'skewed'), db_path)
+        win_rates = analysis.compute_win_rates(interval='bootstrap', rank_by='lower_bound')
+        names = win_rates['championName'].tolist()
+        self.assertEqual(win_rates.set_index('championName').loc['Aatrox', 'win_rate_low'], 100)
+        self.assertLess(names.index('Ahri'), names.index('Aatrox'))
+
+    def test_report_without_rendering(self):
+        output_dir = os.path.join(self.directory.name, 'report')
+        results = self.analysis.run_report(output_dir, render=False, processes=1)
+        self.assertEqual(sorted(results), ['composition', 'win_rates'])
+        self.assertEqual(sorted(os.listdir(output_dir)), ['composition.csv', 'win_rates.csv'])
+
+    @unittest.skipUnless(importlib.util.find_spec('matplotlib') and importlib.util.find_spec('seaborn'),
+                         'matplotlib and seaborn are needed to render')
+    def test_report_renders_headless(self):
+        output_dir = os.path.join(self.directory.name, 'report')
+        self.analysis.run_report(output_dir)
+        self.assertIn('win_rates.png', os.listdir(output_dir))
+        self.assertIn('composition.png', os.listdir(output_dir))
+
+class TestWinModel(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.directory.name, 'league.db')
+        # Team 1 wins whenever it has Aatrox top
+        matches = [(f'NA1_{i}', int(i % 2 == 0), 0 if i % 2 == 0 else 11, 1, 2, 3, 4, 5, 6, 7, 8, 9)
+                   for i in range(40)]
+        make_league_db(self.db_path, matches)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_encode_features(self):
+        features = encode_features([[0, 1, 2, 3, 4, 5, 6, 7, 8, 9]], num_champions=12)
+        self.assertEqual(features.tolist(), [[0, 13, 26, 39, 52, 65, 78, 91, 104, 117]])
+
+    def test_feature_cache_rebuilds_when_source_changes(self):
+        cache = FeatureCache(os.path.join(self.directory.name, 'cache'), num_champions=12)
+        self.assertFalse(cache.is_fresh(self.db_path))
+        features, labels = cache.load(self.db_path)
+        self.assertIsInstance(features, np.memmap)
+        self.assertEqual(features.shape, (40, 10))
+        self.assertTrue(cache.is_fresh(self.db_path))
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO Match VALUES ('NA1_40', 1, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9)")
+        conn.commit()
+        conn.close()
+        os.utime(self.db_path, ns=(0, 0))
+        self.assertFalse(cache.is_fresh(self.db_path))
+        self.assertEqual(len(cache.load(self.db_path)[1]), 41)
+
+    def test_train_and_load_latest(self):
+        path = train(self.db_path, cache_dir=os.path.join(self.directory.name, 'cache'),
+                     model_dir=os.path.join(self.directory.name, 'models'), num_champions=12, epochs=100)
+        self.assertTrue(os.path.exists(path))
+        model = load_latest(os.path.join(self.directory.name, 'models'))
+        self.assertEqual(model.metadata['num_matches'], 40)
+        probabilities = model.predict_proba([[0, 1, 2, 3, 4, 5, 6, 7, 8, 9], [11, 1, 2, 3, 4, 5, 6, 7, 8, 9]])
+        self.assertGreater(probabilities[0], 0.8)
+        self.assertLess(probabilities[1], 0.2)
+        engine = InferenceEngine(MatchupIndex(num_champions=12), win_model=model)
+        self.assertTrue(np.allclose(engine.predict_win_probabilities([[0, 1, 2, 3, 4, 5, 6, 7, 8, 9]]), probabilities[0]))
+
+    def test_train_never_overwrites_a_model(self):
+        kwargs = dict(cache_dir=os.path.join(self.directory.name, 'cache'),
+                      model_dir=os.path.join(self.directory.name, 'models'), num_champions=12, epochs=1)
+        with mock.patch('win_model.time.time', return_value=1704067200.5):
+            paths = [train(self.db_path, **kwargs) for _ in range(2)]
+        self.assertNotEqual(paths[0], paths[1])
+        self.assertTrue(all(os.path.exists(path) for path in paths))
+        self.assertEqual(load_latest(kwargs['model_dir']).metadata['version'],
+                         os.path.basename(paths[1])[len('win_model-'):-len('.npz')])
+
+    def test_load_rejects_other_format_versions(self):
+        path = os.path.join(self.directory.name, 'model.npz')
+        np.savez(path, format_version=0, weights=np.zeros(120), bias=0.0, num_champions=12, metadata='{}')
+        with self.assertRaises(ValueError):
+            WinModel.load(path)
+
+class TestRecommendationServer(unittest.TestCase):
+    def setUp(self):
+        index = MatchupIndex(num_champions=12)
+        index.update(TestMatchupIndex.MATCHES)
+        self.service = RecommendationService(InferenceEngine(index), CHAMPIONS)
+        self.service.warm_up()
+        self.server = make_server(self.service, port=0)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_recommend(self):
+        body = json.dumps({'current_team': [1], 'available_champions': [0, 10], 'limit': 1}).encode()
+        with urllib.request.urlopen(urllib.request.Request(f'{self.url}/recommend', data=body)) as response:
+            result = json.load(response)
+        self.assertEqual([pick['name'] for pick in result['ranking']], ['Aatrox'])
+        self.assertEqual(self.service.latency.count, 1)
+
+    def test_recommend_defaults_to_unpicked_champions(self):
+        result = self.service.recommend({'current_team': [1], 'enemy_team': [2], 'limit': 20})
+        picks = [pick['champion_id'] for pick in result['ranking']]
+        self.assertEqual(len(picks), 10)
+        self.assertNotIn(1, picks)
+        self.assertNotIn(2, picks)
+
+    def test_rejects_malformed_requests(self):
+        for body in [[], 1, 'x', {'current_team': [-1]}, {'current_team': [1], 'available_champions': [12]}]:
+            request = urllib.request.Request(f'{self.url}/recommend', data=json.dumps(body).encode())
+            with self.assertRaises(urllib.error.HTTPError) as caught:
+                urllib.request.urlopen(request)
+            self.assertEqual(caught.exception.code, 400)
+            caught.exception.close()
+
+    def test_load_rebuilds_a_stale_index(self):
+        with tempfile.TemporaryDirectory() as directory:
+            db_path, index_path = os.path.join(directory, 'league.db'), os.path.join(directory, 'index.npz')
+            make_league_db(db_path, [('NA1_1',) + tuple(TestMatchupIndex.MATCHES[0])])
+            service = RecommendationService.load(db_path, index_path)
+            self.assertEqual(service.engine.data.champion_games.sum(), 10)
+            conn = sqlite3.connect(db_path)
+            conn.execute('INSERT INTO Match VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         ('NA1_2',) + tuple(TestMatchupIndex.MATCHES[2]))
+            conn.commit()
+            conn.close()
+            self.assertEqual(RecommendationService.load(db_path, index_path).engine.data.champion_games.sum(), 20)
+
+    def test_health_and_metrics(self):
+        with urllib.request.urlopen(f'{self.url}/health') as response:
+            self.assertTrue(json.load(response)['warm'])
+        with urllib.request.urlopen(f'{self.url}/metrics') as response:
+            self.assertIn('p99_ms', json.load(response)['recommend_latency'])
+        with urllib.request.urlopen(f'{self.url}/metrics/prometheus') as response:
+            self.assertIn('# TYPE recommend_latency_ms histogram', response.read().decode())
+
+
+def make_live_players(champion_names):
+    """Build a Live Client Data player list with champions listed in Match table column order."""
+    return [{'championName': name, 'rawChampionName': f'game_character_displayname_{name}',
+             'summonerName': f'player{i}', 'team': 'ORDER' if i < 5 else 'CHAOS', 'position': POSITIONS[i % 5],
+             'level': 1, 'isDead': False, 'scores': {'kills': 0, 'deaths': 0, 'assists': 0, 'creepScore': 0}}
+            for i, name in enumerate(champion_names)]
+
+
+class TestLiveSession(unittest.TestCase):
+    def setUp(self):
+        index = MatchupIndex(num_champions=12)
+        index.update(TestMatchupIndex.MATCHES)
+        self.engine = InferenceEngine(index)
+        self.game = StandInGame(make_live_players(CHAMPIONS[:10]), active_player='player0')
+        self.server = make_stand_in_server(self.game)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        source = LiveClientSource(f'http://127.0.0.1:{self.server.server_address[1]}')
+        self.advice = []
+        self.session = LiveSession(self.engine, {name.lower(): i for i, name in enumerate(CHAMPIONS)}, source,
+                                   on_advice=self.advice.append, metrics=MetricsRegistry())
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_advises_only_on_meaningful_changes(self):
+        first = self.session.step()
+        self.assertEqual(first['team'], 'team1')
+        expected = self.engine.predict_win_probabilities([list(range(10))])[0]
+        self.assertAlmostEqual(first['win_probability'], float(expected), places=6)
+        self.assertIsNotNone(first['pick_score'])
+        # Nothing changed, and creep score alone is not worth advice
+        self.assertIsNone(self.session.step())
+        self.game.players[0]['scores']['creepScore'] = 12
+        self.game.game_time = 60.0
+        self.assertIsNone(self.session.step())
+        self.assertEqual(self.session.state.scores[0, 3], 12)
+
+        self.game.players[7]['scores']['kills'] = 1
+        self.game.add_event('ChampionKill', KillerName='player7', VictimName='player2')
+        self.game.add_event('DragonKill', KillerName='player6', DragonType='Fire')
+        self.game.add_event('TurretKilled', KillerName='Minion_T2L0S1N0', TurretKilled='Turret_T1_L_03_A')
+        advice = self.session.step()
+        self.assertEqual(advice['kills'], [0, 1])
+        self.assertEqual(advice['objectives']['dragons'], [0, 1])
+        self.assertEqual(advice['objectives']['turrets'], [0, 1])
+        self.assertEqual(advice['events'], ['ChampionKill', 'DragonKill', 'TurretKilled'])
+        self.assertEqual(advice['win_probability'], first['win_probability'])
+        # Events already seen are not fetched or counted again
+        self.assertIsNone(self.session.step())
+        self.assertEqual(self.session.state.next_event_id, 3)
+        self.assertEqual(len(self.advice), 2)
+
+    def test_new_game_resets_state(self):
+        self.game.game_time = 600.0
+        self.game.add_event('BaronKill', KillerName='player1')
+        self.session.step()
+        self.assertEqual(self.session.state.objectives.sum(), 1)
+        self.game.game_time, self.game.events = 5.0, []
+        self.game.players = make_live_players(CHAMPIONS[2:12])
+        advice = self.session.step()
+        self.assertIn('roster', advice['changes'])
+        self.assertEqual(self.session.state.objectives.sum(), 0)
+        self.assertEqual(self.session.state.champions.tolist(), list(range(2, 12)))
+
+    def test_only_the_local_client_is_exempt_from_tls_warnings(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            LiveClientSource()
+            for host in ['127.0.0.1', 'americas.api.riotgames.com']:
+                warnings.warn(f"Unverified HTTPS request is being made to host '{host}'. ",
+                              urllib3.exceptions.InsecureRequestWarning)
+        self.assertEqual([str(warning.message) for warning in caught],
+                         ["Unverified HTTPS request is being made to host 'americas.api.riotgames.com'. "])
+
+    def test_cycle_is_cheap(self):
+        self.session.step()
+        for i in range(50):
+            self.game.game_time = float(i)
+            self.session.step()
+        histogram = self.session.metrics.histogram('live_cycle_cpu_ms')
+        self.assertEqual(histogram.count, 51)
+        # Generous for a shared test machine; a cycle is typically around a millisecond
+        self.assertLess(histogram.percentile(50), 20)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
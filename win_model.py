@@ -0,0 +1,220 @@
+import itertools
+import json
+import os
+import sqlite3
+import time
+import numpy as np
+from champion_stats import NUM_CHAMPIONS
+from dataset import iter_match_blocks, source_signature
+
+# Bumped whenever the artifact layout changes; load refuses other versions
+FORMAT_VERSION = 1
+
+
+def _count_rows(source):
+    if source.endswith('.csv'):
+        with open(source, 'rb') as f:
+            return sum(1 for _ in f) - 1
+    conn = sqlite3.connect(source)
+    count = conn.execute('SELECT COUNT(*) FROM Match').fetchone()[0]
+    conn.close()
+    return count
+
+
+def encode_features(champions, num_champions=NUM_CHAMPIONS):
+    """
+    Encode drafts as the indices of their active one-hot features.
+
+    Every (column, champion) pair, where the ten columns are team1_top ... team2_support, is one
+    feature, so each draft has exactly ten active features and is stored as ten int16 indices
+    instead of a 1,660-wide row.
+
+    :param champions: An N x 10 array of Champion IDs in minified.csv's column order.
+    :return: An N x 10 int16 array of feature indices.
+    """
+    champions = np.asarray(champions, dtype=np.int32)
+    return (np.arange(10, dtype=np.int32) * num_champions + champions).astype(np.int16)
+
+
+class FeatureCache:
+    def __init__(self, directory, num_champions=NUM_CHAMPIONS):
+        """
+        Encoded training matrices kept as .npy files next to a note of the source they came from.
+
+        :param directory: Where features.npy, labels.npy and source.json are written.
+        :param num_champions: Number of rows in the Champion table.
+        """
+        self.directory = directory
+        self.num_champions = num_champions
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def is_fresh(self, source):
+        """Return True if the cache was built from source as it is now."""
+        try:
+            with open(self._path('source.json')) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return meta == dict(source_signature(source), num_champions=self.num_champions)
+
+    def build(self, source, chunk_size=100000):
+        """
+        Encode source into the cache, streaming chunk by chunk into memory-mapped files.
+
+        :param source: minified.csv or a SQLite database with a Match table.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        count = _count_rows(source)
+        features = np.lib.format.open_memmap(self._path('features.npy'), mode='w+', dtype=np.int16, shape=(count, 10))
+        labels = np.lib.format.open_memmap(self._path('labels.npy'), mode='w+', dtype=np.int8, shape=(count,))
+        start = 0
+        for block in iter_match_blocks(source, chunk_size):
+            block = block[:count - start]
+            features[start:start + len(block)] = encode_features(block[:, 1:], self.num_champions)
+            labels[start:start + len(block)] = block[:, 0]
+            start += len(block)
+        features.flush()
+        labels.flush()
+        del features, labels
+        with open(self._path('source.json'), 'w') as f:
+            json.dump(dict(source_signature(source), num_champions=self.num_champions), f)
+
+    def load(self, source=None):
+        """
+        Return memory-mapped (features, labels), rebuilding first if source has changed.
+
+        :param source: The data the cache should reflect; None trusts whatever is cached.
+        """
+        if source is not None and not self.is_fresh(source):
+            self.build(source)
+        return (np.load(self._path('features.npy'), mmap_mode='r'),
+                np.load(self._path('labels.npy'), mmap_mode='r'))
+
+
+class WinModel:
+    def __init__(self, weights, bias=0.0, num_champions=NUM_CHAMPIONS, metadata=None):
+        """
+        Logistic-regression win model over one-hot (column, champion) features.
+
+        :param weights: Log-odds contribution of each feature from encode_features.
+        :param bias: Log-odds of team 1 winning with all contributions at zero.
+        :param num_champions: Number of rows in the Champion table.
+        :param metadata: JSON-serializable facts about the training run, saved with the model.
+        """
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = float(bias)
+        self.num_champions = num_champions
+        self.metadata = metadata or {}
+
+    @classmethod
+    def fit(cls, features, labels, num_champions=NUM_CHAMPIONS, epochs=200, learning_rate=0.05, l2=1e-4,
+            chunk_size=1000000):
+        """
+        Fit weights by full-batch Adam on the logistic loss.
+
+        Each gradient step streams the (possibly memory-mapped) matrices in chunks and sums the
+        per-feature gradients with np.bincount, so a step costs one pass over ten indices per match.
+
+        :param features: An N x 10 array from encode_features.
+        :param labels: N team-1 win flags.
+        :param epochs: Gradient steps.
+        :param l2: Weight decay applied to the feature weights.
+        :param chunk_size: Matches per chunk, bounding temporary memory.
+        """
+        num_features = 10 * num_champions
+        count = len(labels)
+        if count == 0:
+            raise ValueError('Cannot fit a win model without any matches')
+        # Parameters are the feature weights followed by the bias
+        params = np.zeros(num_features + 1)
+        moment = np.zeros_like(params)
+        velocity = np.zeros_like(params)
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        for step in range(1, epochs + 1):
+            gradient = np.zeros_like(params)
+            for start in range(0, count, chunk_size):
+                chunk = np.asarray(features[start:start + chunk_size], dtype=np.intp)
+                y = np.asarray(labels[start:start + chunk_size], dtype=np.float64)
+                logits = params[chunk].sum(axis=1) + params[-1]
+                residual = 1 / (1 + np.exp(-logits)) - y
+                gradient[:-1] += np.bincount(chunk.ravel(), weights=np.repeat(residual, 10), minlength=num_features)
+                gradient[-1] += residual.sum()
+            gradient /= count
+            gradient[:-1] += l2 * params[:-1]
+            moment = beta1 * moment + (1 - beta1) * gradient
+            velocity = beta2 * velocity + (1 - beta2) * gradient ** 2
+            params -= learning_rate * (moment / (1 - beta1 ** step)) / (np.sqrt(velocity / (1 - beta2 ** step)) + eps)
+        metadata = {'num_matches': int(count), 'epochs': epochs, 'learning_rate': learning_rate, 'l2': l2}
+        return cls(params[:-1], params[-1], num_champions, metadata)
+
+    def predict_proba(self, drafts):
+        """
+        Predict team 1's win probability for complete drafts.
+
+        :param drafts: An N x 10 array of Champion IDs in minified.csv's column order.
+        :return: A float32 array of N probabilities.
+        """
+        drafts = np.asarray(drafts)
+        if drafts.ndim != 2 or drafts.shape[1] != 10:
+            raise ValueError(f'Expected an N x 10 array of champion IDs, got shape {drafts.shape}')
+        features = encode_features(drafts, self.num_champions).astype(np.intp)
+        logits = self.weights[features].sum(axis=1) + self.bias
+        return (1 / (1 + np.exp(-logits))).astype(np.float32)
+
+    def save(self, path):
+        """Write the model and its metadata to an .npz file, given as a path or a binary file object."""
+        np.savez(path, format_version=FORMAT_VERSION, weights=self.weights, bias=self.bias,
+                 num_champions=self.num_champions, metadata=json.dumps(self.metadata))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if int(data['format_version']) != FORMAT_VERSION:
+                raise ValueError(f"{path} has model format {int(data['format_version'])}, expected {FORMAT_VERSION}")
+            return cls(data['weights'], float(data['bias']), int(data['num_champions']),
+                       json.loads(str(data['metadata'])))
+
+
+def train(source='league.db', cache_dir='feature_cache', model_dir='models', num_champions=NUM_CHAMPIONS, **fit_kwargs):
+    """
+    Train a WinModel on source and save it as a new versioned artifact.
+
+    The encoded matrices are reused from cache_dir unless source has changed since they were
+    built. Each run writes model_dir/win_model-<version>.npz, where the version is the training
+    time to the microsecond (with a -N suffix if that name is taken), and points
+    model_dir/LATEST at it.
+
+    :return: The path of the saved model.
+    """
+    features, labels = FeatureCache(cache_dir, num_champions).load(source)
+    model = WinModel.fit(features, labels, num_champions, **fit_kwargs)
+    os.makedirs(model_dir, exist_ok=True)
+    now = time.time()
+    timestamp = time.strftime('%Y%m%d%H%M%S', time.localtime(now)) + f'{int(now % 1 * 1e6):06d}'
+    # Claim the file name exclusively, so two trainings in the same microsecond can't overwrite each other
+    for attempt in itertools.count():
+        version = f'{timestamp}-{attempt}' if attempt else timestamp
+        path = os.path.join(model_dir, f'win_model-{version}.npz')
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+            break
+        except FileExistsError:
+            continue
+    model.metadata.update(version=version, source=source_signature(source))
+    with os.fdopen(fd, 'wb') as f:
+        model.save(f)
+    with open(os.path.join(model_dir, 'LATEST'), 'w') as f:
+        f.write(os.path.basename(path))
+    return path
+
+
+def load_latest(model_dir='models'):
+    """Load the model most recently written by train."""
+    with open(os.path.join(model_dir, 'LATEST')) as f:
+        return WinModel.load(os.path.join(model_dir, f.read().strip()))
+
+
+if __name__ == '__main__':
+    print(f"Saved {train()}")